@@ -14,33 +14,168 @@ Blueprints registered here handle their respective domains:
   - services_bp: Student services listing and management
   - comment_routes: Comments on resources and events
   - votes_bp: Upvoting/downvoting system
+  - search_bp: Full-text search across events, resources and services
+  - jobs_bp: Status of background jobs (image processing, moderation)
 """
 
 from flask import (
     Flask, render_template, url_for,
     request, redirect, flash, session,
-    send_from_directory
+    send_from_directory, jsonify, abort
 )
+from werkzeug.security import safe_join
+import atexit
+import click
+import mimetypes
 import secrets
 import cs304dbi as dbi
 import os
 
+import asset_utils
+import compression
+import conn_utils
+import image_utils
+import metrics
+import password_utils
+import profiler
+import render_cache
+import throttle
+from db import cache, comment_db, event_db, job_db, purge_db, vote_db
 from resources_routes import resource_bp
 from event_routes import event_bp
 from comment_routes import comment_routes
 from vote_routes import votes_bp
 from services_routes import services_bp
 from login import auth_bp
+from search_routes import search_bp
+from job_routes import jobs_bp
+import worker
 
 app = Flask(__name__)
-app.secret_key = secrets.token_hex()
+# Set CAMPUS_CONNECT_SECRET_KEY to share sessions between processes
+# (several web workers, or this app and async_api.py)
+app.secret_key = os.environ.get('CAMPUS_CONNECT_SECRET_KEY') or secrets.token_hex()
 app.config['TRAP_BAD_REQUEST_ERRORS'] = True
 
 # File upload configuration (TEAM SHARED)
 app.config['UPLOADS'] = '/students/cs304jas/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 8 * 1024 * 1024  # 8MB
 
+# Let the front proxy stream upload bytes instead of a Python worker:
+#   USE_X_SENDFILE: Apache/lighttpd X-Sendfile (built into Flask)
+#   UPLOADS_ACCEL_REDIRECT: nginx internal location mapped to UPLOADS,
+#                           e.g. '/protected-uploads'
+app.config['USE_X_SENDFILE'] = False
+app.config['UPLOADS_ACCEL_REDIRECT'] = None
+
+UPLOAD_IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # hashed filenames never change
+UPLOAD_LEGACY_MAX_AGE = 3600                 # pre-hash names can be overwritten
+
+# Response compression (see compression.py)
+app.config['COMPRESS_MIN_SIZE'] = 1024       # bytes; smaller bodies go out as-is
+app.config['COMPRESS_GZIP_LEVEL'] = 6
+app.config['COMPRESS_BROTLI_QUALITY'] = 4    # used when the brotli package is installed
+
+# Database connection pool (one pooled connection per request)
+app.config['DB_POOL_SIZE'] = 10
+app.config['DB_POOL_WAIT_TIMEOUT'] = 5.0    # seconds to wait for a free connection
+app.config['DB_POOL_IDLE_TIMEOUT'] = 300.0  # close connections idle this long
+
+# Read replica (see db/routing.py); None sends every query to the primary
+app.config['DB_REPLICA_CNF'] = None               # my.cnf-style file for the replica
+app.config['DB_REPLICA_DATABASE'] = 'cs304jas_db'
+app.config['DB_REPLICA_MAX_LAG'] = 2.0            # seconds; more lag = read the primary
+app.config['DB_REPLICA_LAG_CHECK_INTERVAL'] = 5.0
+app.config['DB_READ_YOUR_WRITES_SECONDS'] = 5.0   # a user's reads stay on the primary after a write
+
+# SQL instrumentation (see db/instrument.py)
+app.config['SLOW_QUERY_SECONDS'] = 0.2    # log statements slower than this
+app.config['N_PLUS_ONE_THRESHOLD'] = 5    # same statement this often per request = N+1
+app.config['SQL_SUMMARY_HEADER'] = False  # X-SQL-Summary header (always on in debug)
+
+# Cache for rows looked up by id (get_*_by_id, get_*_owner; see db/cache.py).
+# Writes in this process invalidate it; other processes wait out the TTL.
+app.config['ENTITY_CACHE'] = True          # False (e.g. for tests) always queries
+app.config['ENTITY_CACHE_SIZE'] = 1024     # rows kept
+app.config['ENTITY_CACHE_TTL'] = 30.0      # seconds
+
+# Rendered list-page caches (see render_cache.py): item cards for everyone,
+# whole pages for anonymous visitors (also cacheable by a reverse proxy)
+app.config['FRAGMENT_CACHE'] = True
+app.config['FRAGMENT_CACHE_SIZE'] = 4096   # cards kept
+app.config['FRAGMENT_CACHE_TTL'] = 300.0   # seconds
+app.config['PAGE_CACHE'] = True
+app.config['PAGE_CACHE_SIZE'] = 256        # pages kept
+app.config['PAGE_CACHE_TTL'] = 60.0        # seconds
+app.config['PAGE_CACHE_MAX_AGE'] = 30      # Cache-Control max-age for proxies/browsers
+
+# Write-behind vote counters for viral items (see vote_db.VoteBuffer).
+# Off by default: every vote updates its item's counters immediately.
+app.config['VOTE_BUFFER'] = False
+app.config['VOTE_BUFFER_INTERVAL'] = 2.0     # seconds between flushes
+app.config['VOTE_BUFFER_MAX_PENDING'] = 500  # items pending before an early flush
+
+# Password hashing runs in a bounded process pool (see password_utils.py);
+# logins beyond the queue get a 503 instead of stalling web workers
+app.config['BCRYPT_ROUNDS'] = 12           # changing this re-hashes on next login
+app.config['PASSWORD_HASH_WORKERS'] = 2    # 0 = hash in the request thread
+app.config['PASSWORD_HASH_QUEUE'] = 16     # waiting hashes before 503
+
+# Login throttling (see throttle.py): (attempts, per seconds).
+# CAMPUS_CONNECT_LOGIN_THROTTLE=0 turns it off for `python -m bench compare`.
+app.config['LOGIN_THROTTLE'] = os.environ.get('CAMPUS_CONNECT_LOGIN_THROTTLE', '1') != '0'
+app.config['LOGIN_RATE_PER_IP'] = (20, 60)
+app.config['LOGIN_RATE_PER_EMAIL'] = (5, 300)
+
+# Sampling profiler (see profiler.py). Only these users, or requests with
+# an X-Profile-Token header matching the token, may profile.
+app.config['PROFILER_TOKEN'] = os.environ.get('CAMPUS_CONNECT_PROFILER_TOKEN')  # None = no header access
+app.config['PROFILER_ADMINS'] = ()          # user_ids
+app.config['PROFILER_INTERVAL'] = 0.005     # seconds between stack samples
+app.config['PROFILER_SAMPLE_RATE'] = 0      # profile 1 in N requests in the background (0 = off)
+app.config['PROFILER_KEEP'] = 20            # slowest background profiles kept
+app.config['PROFILER_MAX_ACTIVE'] = 4       # concurrent profiles
+
+# Background job threads in this process (0 = run `python worker.py` instead).
+# Set CAMPUS_CONNECT_JOB_WORKERS only for the web server, not for CLI commands.
+app.config['JOB_WORKERS'] = int(os.environ.get('CAMPUS_CONNECT_JOB_WORKERS', 0))
+# Rows per transaction when purging a deleted item's dependents (purge_db)
+app.config['PURGE_BATCH_SIZE'] = 1000
+# Archival of past events (`flask archive-events`, see db/archive_db.py)
+app.config['ARCHIVE_AFTER_DAYS'] = 365     # events dated longer ago are archived
+app.config['ARCHIVE_BATCH_SIZE'] = 100     # events per transaction
+
 print(dbi.conf('cs304jas_db'))
+# Forks the hashing processes, so it runs before any thread is started
+password_utils.init_app(app)
+throttle.init_app(app)
+# after_request hooks run in reverse order: registered first, compression
+# sees each response after every other hook has finished with it
+compression.init_app(app)
+# Next, so profiles include the other hooks' work
+profiler.init_app(app)
+conn_utils.init_app(app)
+metrics.init_app(app)
+worker.init_app(app)
+asset_utils.init_app(app)
+render_cache.init_app(app)
+
+if app.config['VOTE_BUFFER']:
+    vote_buffer = vote_db.VoteBuffer(
+        app.extensions['db_pool'],
+        interval=app.config['VOTE_BUFFER_INTERVAL'],
+        max_pending=app.config['VOTE_BUFFER_MAX_PENDING'],
+    )
+    vote_buffer.start()
+    atexit.register(vote_buffer.stop)
+    app.extensions['vote_buffer'] = vote_buffer
+
+# Responsive image helpers for templates (see image_utils.py)
+app.jinja_env.globals.update(
+    has_image_variants=image_utils.has_variants,
+    image_variant=image_utils.variant_filename,
+    image_srcset=image_utils.srcset,
+)
 
 # Register blueprints
 app.register_blueprint(auth_bp)
@@ -49,6 +184,8 @@ app.register_blueprint(event_bp)
 app.register_blueprint(comment_routes)
 app.register_blueprint(votes_bp)
 app.register_blueprint(services_bp)
+app.register_blueprint(search_bp)
+app.register_blueprint(jobs_bp)
 
 @app.route('/')
 def index():
@@ -66,9 +203,113 @@ def index():
 def about():
     return render_template('about.html', page_title='About Us')
 
+@app.route('/pool/stats')
+def pool_stats():
+    """Connection pool usage counters for monitoring (profiler users only)."""
+    if not profiler.is_authorized():
+        abort(404)
+    stats = conn_utils.get_pool().stats()
+    replica = conn_utils.get_replica()
+    if replica is not None:
+        stats['replica'] = {**replica.pool.stats(), **replica.stats()}
+    return jsonify(stats)
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Hit/miss/eviction counters of the in-process caches (profiler users only)."""
+    if not profiler.is_authorized():
+        abort(404)
+    return jsonify({
+        'entity': cache.entity_cache.stats(),
+        'calendar': event_db.calendar_cache.stats(),
+        'fragment': render_cache.fragment_cache.stats(),
+        'page': render_cache.page_cache.stats(),
+    })
+
+@app.cli.command('build-assets')
+def build_assets():
+    """Write fingerprinted copies of static files and their manifest."""
+    manifest = asset_utils.build(app.static_folder)
+    app.extensions['asset_manifest'] = manifest
+    for name, hashed in sorted(manifest.items()):
+        print(f"{name} -> {hashed}")
+
+@app.cli.command('reconcile-votes')
+def reconcile_votes():
+    """Recompute item vote counters from the votes table."""
+    conn = conn_utils.get_conn()
+    for item_type in ('event', 'resource'):
+        changed = vote_db.reconcile_vote_counts(conn, item_type)
+        print(f"{item_type}: {changed} counter rows corrected")
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters():
+    """Recompute comment and RSVP counters from their tables."""
+    conn = conn_utils.get_conn()
+    changed = comment_db.reconcile_comment_counts(conn)
+    print(f"comment_count: {changed} rows corrected")
+    changed = event_db.reconcile_rsvp_counts(conn)
+    print(f"rsvp_yes/rsvp_maybe: {changed} rows corrected")
+
+@app.cli.command('purge-orphan-votes')
+def purge_orphan_votes():
+    """Delete votes whose event/resource no longer exists."""
+    conn = conn_utils.get_conn()
+    deleted = purge_db.purge_orphan_votes(conn, batch_size=app.config['PURGE_BATCH_SIZE'])
+    print(f"{deleted} orphaned votes deleted")
+
+@app.cli.command('archive-events')
+@click.option('--days', type=int, default=None,
+              help='Archive events dated more than this many days ago '
+                   '(default: ARCHIVE_AFTER_DAYS).')
+@click.option('--queue', is_flag=True,
+              help='Queue the archival for the job workers instead of running it here.')
+def archive_events(days, queue):
+    """Move past events and their RSVPs, comments and votes to the archive tables."""
+    payload = {} if days is None else {"days": days}
+    conn = conn_utils.get_conn()
+    if queue:
+        job_id = job_db.enqueue(conn, 'archive_events', payload)
+        print(f"queued job {job_id}")
+        return
+    moved = worker.archive_events(conn, payload)
+    for table, rows in moved.items():
+        print(f"{table}: {rows} rows archived")
+
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOADS'], filename)
+    """
+    Serve an uploaded image. Content-addressed files never change, so
+    they are cached as immutable for a year; legacy names get a short
+    max-age and revalidate via ETag/Last-Modified. With
+    UPLOADS_ACCEL_REDIRECT set, nginx streams the file instead of Python
+    (USE_X_SENDFILE does the same for Apache/lighttpd).
+    """
+    path = safe_join(app.config['UPLOADS'], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    if image_utils.is_content_addressed(filename):
+        max_age = UPLOAD_IMMUTABLE_MAX_AGE
+    else:
+        max_age = UPLOAD_LEGACY_MAX_AGE
+
+    accel_prefix = app.config.get('UPLOADS_ACCEL_REDIRECT')
+    if accel_prefix:
+        response = app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + filename
+    else:
+        response = send_from_directory(
+            app.config['UPLOADS'], filename, max_age=max_age, conditional=True
+        )
+
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if max_age == UPLOAD_IMMUTABLE_MAX_AGE:
+        response.cache_control.immutable = True
+    return response
 
 if __name__ == '__main__':
     import sys
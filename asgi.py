@@ -0,0 +1,40 @@
+"""
+ASGI entry point serving the Flask app and the async JSON API together:
+
+    hypercorn asgi:app --bind 0.0.0.0:8080
+
+Requests that async_api.api has a route for (comment, vote and calendar
+JSON) run on the event loop; everything else goes to the Flask app in
+app.py, which hypercorn runs in worker threads through its WSGI adapter.
+Both share the session cookie and event_db.calendar_cache, so calendar
+invalidation from Flask-side event edits reaches the async feed.
+"""
+
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from werkzeug.exceptions import HTTPException
+
+from app import app as flask_app
+from async_api import api
+
+api.secret_key = flask_app.secret_key
+api.config['PROFILER_ADMINS'] = flask_app.config['PROFILER_ADMINS']
+
+_flask = AsyncioWSGIMiddleware(flask_app, max_body_size=flask_app.config['MAX_CONTENT_LENGTH'])
+_async_routes = api.url_map.bind("localhost")
+
+
+def _is_async(scope):
+    """True if the async API has a route for this method and path."""
+    try:
+        _async_routes.match(scope["path"], method=scope["method"])
+    except HTTPException:
+        return False
+    return True
+
+
+async def app(scope, receive, send):
+    # Lifespan events open and close the async tier's database pool
+    if scope["type"] == "lifespan" or (scope["type"] == "http" and _is_async(scope)):
+        await api(scope, receive, send)
+    else:
+        await _flask(scope, receive, send)
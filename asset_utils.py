@@ -0,0 +1,103 @@
+"""
+Fingerprinted static assets.
+
+`flask --app app build-assets` copies every file in static/ to a name
+that includes a hash of its contents (style.css -> style.3f2a9c1b0d4e.css)
+and records the mapping in static/manifest.json. Templates link assets
+through asset_url(), which looks the file up in the manifest:
+
+    <link rel="stylesheet" href="{{ asset_url('style.css') }}">
+
+A changed file gets a new name, so fingerprinted files can be cached for a
+year without revalidation. Files missing from the manifest (or every file,
+before the first build) fall back to the plain url_for('static') URL.
+Older fingerprinted copies are left in place for pages still cached with
+their URLs.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from flask import current_app, request, url_for
+
+MANIFEST_NAME = 'manifest.json'
+ASSET_MAX_AGE = 365 * 24 * 3600  # fingerprinted names never change content
+
+_FINGERPRINTED = re.compile(r'\.[0-9a-f]{12}(\.[^./]+)?$')
+
+
+def is_fingerprinted(filename):
+    """True if filename carries a content hash from build()."""
+    return _FINGERPRINTED.search(filename) is not None
+
+
+def fingerprint(path):
+    """First 12 hex digits of the file's SHA-256."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def build(static_dir):
+    """
+    Write a fingerprinted copy of every static file and the manifest.
+
+    Returns:
+        dict: Relative filename -> fingerprinted filename
+    """
+    manifest = {}
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            if rel == MANIFEST_NAME or is_fingerprinted(name):
+                continue
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{fingerprint(path)}{ext}"
+            target = os.path.join(static_dir, hashed)
+            if not os.path.exists(target):
+                shutil.copy2(path, target)
+            manifest[rel] = hashed
+
+    tmp = os.path.join(static_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(static_dir, MANIFEST_NAME))
+    return manifest
+
+
+def load_manifest(static_dir):
+    """The manifest written by build(), or {} if there isn't one."""
+    try:
+        with open(os.path.join(static_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(filename, **values):
+    """url_for('static', filename=...) for the fingerprinted copy, if built."""
+    manifest = current_app.extensions['asset_manifest']
+    return url_for('static', filename=manifest.get(filename, filename), **values)
+
+
+def init_app(app):
+    """Load the manifest, expose asset_url to templates and cache assets."""
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder)
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.after_request(_cache_fingerprinted)
+
+
+def _cache_fingerprinted(response):
+    if (request.endpoint == 'static' and response.status_code in (200, 304)
+            and is_fingerprinted(request.view_args.get('filename', ''))):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ASSET_MAX_AGE
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,253 @@
+"""
+Campus Connect - Async JSON API
+
+The comment, vote and calendar-feed JSON endpoints, as async handlers on
+Quart with an aiomysql pool (db/async_db.py). They are small and come in
+bursts from the list pages; here a request waiting on MySQL holds a
+coroutine, not a worker thread, so one process can have hundreds of them
+in flight, bounded by ASYNC_DB_POOL_SIZE.
+
+Routes and responses match the Flask versions in comment_routes.py,
+vote_routes.py and event_routes.events_json:
+  - GET  /comments/<item_type>/<item_id>
+  - GET  /comments/batch
+  - POST /comments
+  - POST /votes/<item_type>/<item_id>
+  - GET  /events/api/events
+
+Editing and deleting comments stay on the Flask app. Run this tier behind
+the same host as the Flask app, either together (asgi.py) or on its own:
+
+    hypercorn async_api:api
+
+Sessions are the Flask app's signed cookie: set CAMPUS_CONNECT_SECRET_KEY
+to the same value for both when they run as separate processes.
+Votes are never buffered here (VOTE_BUFFER only applies to the Flask app),
+and these requests are not counted by db/instrument.py.
+"""
+
+import asyncio
+import contextlib
+import hmac
+import os
+import secrets
+
+from quart import Quart, abort, request, jsonify, session
+
+import comment_routes
+import metrics
+from db import async_db, event_db
+from db.pool import PoolTimeout
+
+api = Quart(__name__)
+api.secret_key = os.environ.get('CAMPUS_CONNECT_SECRET_KEY') or secrets.token_hex()
+
+# aiomysql pool (see db/async_db.py)
+api.config['ASYNC_DB_CNF'] = None              # my.cnf-style file; None = ~/.my.cnf
+api.config['ASYNC_DB_DATABASE'] = 'cs304jas_db'
+api.config['ASYNC_DB_POOL_SIZE'] = 50
+api.config['ASYNC_DB_WAIT_TIMEOUT'] = 5.0      # seconds to wait for a free connection
+
+# Who may read /pool/async-stats: as profiler.is_authorized for the Flask app
+api.config['PROFILER_TOKEN'] = os.environ.get('CAMPUS_CONNECT_PROFILER_TOKEN')
+api.config['PROFILER_ADMINS'] = ()             # user_ids
+
+
+@api.before_serving
+async def open_pool():
+    api.extensions['async_db_pool'] = await async_db.create_pool(
+        api.config['ASYNC_DB_CNF'],
+        database=api.config['ASYNC_DB_DATABASE'],
+        maxsize=api.config['ASYNC_DB_POOL_SIZE'],
+    )
+
+
+@api.after_serving
+async def close_pool():
+    pool = api.extensions.pop('async_db_pool', None)
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+
+@contextlib.asynccontextmanager
+async def db_conn():
+    """
+    Borrow a pooled connection for the block. Raises PoolTimeout if none
+    frees up within ASYNC_DB_WAIT_TIMEOUT.
+    """
+    pool = api.extensions['async_db_pool']
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), api.config['ASYNC_DB_WAIT_TIMEOUT'])
+    except asyncio.TimeoutError:
+        raise PoolTimeout("no async database connection available")
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+@api.errorhandler(PoolTimeout)
+async def pool_busy(error):
+    return jsonify({"error": "Server busy, try again"}), 503, {"Retry-After": "1"}
+
+
+@api.route("/comments", methods=["POST"])
+async def create_comment():
+    """Create a comment (see comment_routes.create_comment)."""
+    if "user_id" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    data = await request.get_json() or {}
+
+    content = (data.get("content") or "").strip()
+    event_id = data.get("event_id")
+    resource_id = data.get("resource_id")
+
+    if not content:
+        return jsonify({"error": "Content required"}), 400
+
+    if bool(event_id) == bool(resource_id):
+        return jsonify({"error": "Provide exactly one of event_id or resource_id"}), 400
+
+    async with db_conn() as conn:
+        await async_db.insert_comment(
+            conn,
+            content=content,
+            user_id=session["user_id"],
+            event_id=event_id,
+            resource_id=resource_id
+        )
+    metrics.COMMENTS.labels("create").inc()
+
+    return jsonify({"message": "Comment added!"}), 201
+
+
+@api.route("/comments/<item_type>/<int:item_id>")
+async def get_comments(item_type, item_id):
+    """Comments on an event or resource (see comment_routes.get_comments)."""
+    if item_type not in ["event", "resource"]:
+        return jsonify({"error": "Invalid type"}), 400
+
+    user_id = session.get("user_id", -1)
+
+    async with db_conn() as conn:
+        if item_type == "event":
+            comments = await async_db.list_comments_for_event(conn, item_id, user_id)
+        else:
+            comments = await async_db.list_comments_for_resource(conn, item_id, user_id)
+
+    return jsonify(comments), 200
+
+
+@api.route("/comments/batch")
+async def get_comments_batch():
+    """Comments on many items (see comment_routes.get_comments_batch)."""
+    event_ids = comment_routes.parse_id_list(request.args.get("event_ids"))
+    resource_ids = comment_routes.parse_id_list(request.args.get("resource_ids"))
+
+    if event_ids is None or resource_ids is None:
+        return jsonify({"error": "ids must be comma-separated integers"}), 400
+
+    if not event_ids and not resource_ids:
+        return jsonify({"error": "Provide event_ids or resource_ids"}), 400
+
+    if len(event_ids) + len(resource_ids) > comment_routes.MAX_BATCH_IDS:
+        return jsonify({
+            "error": f"At most {comment_routes.MAX_BATCH_IDS} ids per request"
+        }), 400
+
+    user_id = session.get("user_id", -1)
+
+    result = {}
+    async with db_conn() as conn:
+        if event_ids:
+            result["events"] = await async_db.list_comments_for_events(
+                conn, event_ids, user_id)
+        if resource_ids:
+            result["resources"] = await async_db.list_comments_for_resources(
+                conn, resource_ids, user_id)
+
+    return jsonify(result), 200
+
+
+@api.route("/votes/<item_type>/<int:item_id>", methods=["POST"])
+async def vote(item_type, item_id):
+    """Record an up/down vote (see vote_routes.vote)."""
+    if "user_id" not in session:
+        return jsonify({"error": "login required"}), 403
+
+    data = await request.get_json() or {}
+    vote_type = data.get("vote")
+
+    if vote_type not in ["up", "down"]:
+        return jsonify({"error": "invalid vote"}), 400
+
+    if item_type not in ["event", "resource"]:
+        return jsonify({"error": "invalid item type"}), 400
+
+    async with db_conn() as conn:
+        outcome = await async_db.cast_vote(conn, session["user_id"], item_type,
+                                           item_id, vote_type)
+    metrics.VOTES.labels(item_type, vote_type, outcome["result"]).inc()
+
+    if outcome["result"] == "missing":
+        return jsonify({"error": "item not found"}), 404
+
+    if outcome["result"] == "unchanged":
+        return jsonify({"message": "already voted"}), 200
+
+    if outcome["result"] == "deleted":
+        return jsonify({"message": "item deleted", "deleted": True}), 200
+
+    return jsonify({
+        "message": "vote recorded",
+        "status": outcome["status"],
+        "downvotes": outcome["downvotes"]
+    }), 200
+
+
+@api.route("/events/api/events")
+async def events_json():
+    """Calendar feed with ETag revalidation (see event_routes.events_json)."""
+    try:
+        start = event_db.parse_calendar_bound(request.args.get('start'))
+        end = event_db.parse_calendar_bound(request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start/end must be ISO 8601 dates"}), 400
+
+    key = (start, end)
+    cached = event_db.calendar_cache.get(key)
+    if cached is None:
+        async with db_conn() as conn:
+            records = await async_db.list_events_for_calendar(conn, start=start, end=end)
+        cached = event_db.calendar_feed(records)
+        event_db.calendar_cache.set(key, cached)
+
+    body, etag = cached
+    response = api.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return await response.make_conditional(request)
+
+
+def _is_authorized():
+    """True for PROFILER_ADMINS and requests carrying PROFILER_TOKEN."""
+    token = api.config['PROFILER_TOKEN']
+    offered = request.headers.get('X-Profile-Token')
+    if token and offered and hmac.compare_digest(offered.encode(), token.encode()):
+        return True
+    return session.get('user_id') in api.config['PROFILER_ADMINS']
+
+
+@api.route("/pool/async-stats")
+async def pool_stats():
+    """aiomysql pool usage for monitoring (profiler users only)."""
+    if not _is_authorized():
+        abort(404)
+    pool = api.extensions['async_db_pool']
+    return jsonify({
+        "max_size": pool.maxsize,
+        "open": pool.size,
+        "idle": pool.freesize,
+    })
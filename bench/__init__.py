@@ -0,0 +1,29 @@
+"""
+bench - Load Testing and Benchmarks
+
+Measures Campus Connect at realistic data volumes:
+  - seed: Fill the schema.sql tables with synthetic users, events,
+          resources, services, comments, RSVPs and votes
+  - load: Drive the hot endpoints and report latency percentiles,
+          throughput and SQL statements per request; compare two
+          servers (sync Flask vs asgi.py) at rising concurrency
+  - stress: Concurrent votes on one item, then check its counters
+            against the votes table
+
+Run it against a scratch MySQL database loaded with schema.sql, never a
+real one (seeding can wipe the tables):
+
+    python -m bench seed --db bench_db --events 100000 --votes 1000000
+    python -m bench run --db bench_db --threads 8 --duration 60
+    python -m bench run --url http://127.0.0.1:8080 --duration 60
+    python -m bench compare --db bench_db --sync-url http://127.0.0.1:8080 --async-url http://127.0.0.1:8081
+    python -m bench stress-votes --db bench_db --threads 16 --votes 2000
+
+Every command takes --seed, so the same arguments give the same data and
+the same request mix. For compare, run the app twice against the same
+database (e.g. `gunicorn -w 4 --threads 8 app:app` and `hypercorn -w 4
+asgi:app`); the thread counts in its report are concurrent clients.
+Every client logs in from the same address, so start servers for run
+--url and compare with CAMPUS_CONNECT_LOGIN_THROTTLE=0 (the in-process
+run turns the throttle off itself); compare stops if a login is refused.
+"""
@@ -0,0 +1,153 @@
+"""
+Command line entry point: python -m bench {seed,run,compare,stress-votes} ...
+"""
+
+import argparse
+import json
+import sys
+
+import cs304dbi as dbi
+
+from bench import load, seed, stress
+
+
+def _connect(db_name):
+    dbi.conf(db_name)
+    return dbi.connect()
+
+
+def cmd_seed(args):
+    conn = _connect(args.db)
+    try:
+        if args.reset:
+            seed.reset(conn)
+        scale = {name: getattr(args, name) for name in seed.DEFAULT_SCALE}
+        inserted = seed.seed(conn, scale=scale, seed=args.seed)
+    finally:
+        conn.close()
+    print(json.dumps(inserted))
+
+
+def cmd_run(args):
+    conn = _connect(args.db)
+    try:
+        ids = load.load_ids(conn)
+    finally:
+        conn.close()
+
+    if args.url:
+        def make_session():
+            return load.HttpSession(args.url)
+    else:
+        # Imported late: app.py selects its own database on import, and
+        # starts job workers with CAMPUS_CONNECT_JOB_WORKERS set. Stop them
+        # and drop any pooled connections before switching, so every
+        # request and job uses args.db.
+        from app import app
+        job_worker = app.extensions.pop('job_worker', None)
+        if job_worker is not None:
+            job_worker.stop()
+        app.extensions['db_pool'].close_all()
+        dbi.conf(args.db)
+        app.config['SQL_SUMMARY_HEADER'] = True
+        # Every worker logs in from the same address
+        app.extensions['login_throttle'].enabled = False
+
+        def make_session():
+            return load.TestClientSession(app)
+
+    scenarios = None
+    if args.only:
+        unknown = set(args.only) - set(load.SCENARIOS)
+        if unknown:
+            sys.exit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = {name: load.SCENARIOS[name] for name in args.only}
+
+    report = load.run(make_session, ids, threads=args.threads, duration=args.duration,
+                      warmup=args.warmup, seed=args.seed, scenarios=scenarios)
+    print(json.dumps(report, indent=2) if args.json else load.format_report(report))
+    if report["login_failures"]:
+        sys.exit("some workers could not log in")
+
+
+def cmd_compare(args):
+    conn = _connect(args.db)
+    try:
+        ids = load.load_ids(conn)
+    finally:
+        conn.close()
+
+    targets = {
+        "sync": lambda: load.HttpSession(args.sync_url),
+        "async": lambda: load.HttpSession(args.async_url),
+    }
+    scenarios = {name: load.SCENARIOS[name] for name in args.only}
+    try:
+        result = load.compare(targets, ids, levels=args.levels, duration=args.duration,
+                              warmup=args.warmup, seed=args.seed, scenarios=scenarios)
+    except RuntimeError as err:
+        sys.exit(str(err))
+    print(json.dumps(result, indent=2) if args.json else load.format_comparison(result))
+
+
+def cmd_stress_votes(args):
+    report = stress.vote_stress(lambda: _connect(args.db), threads=args.threads,
+                                votes=args.votes, users=args.users, seed=args.seed)
+    print(json.dumps(report, indent=2))
+    if not report["ok"]:
+        sys.exit("vote counters differ from the votes table")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    parser.add_argument("--db", default="cs304jas_db", help="database name (from ~/.my.cnf)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("seed", help="insert synthetic data")
+    p.add_argument("--reset", action="store_true",
+                   help="TRUNCATE every table first (destroys existing data)")
+    for name, default in seed.DEFAULT_SCALE.items():
+        p.add_argument(f"--{name}", type=int, default=default, help=f"rows (default {default})")
+    p.set_defaults(func=cmd_seed)
+
+    p = commands.add_parser("run", help="drive the hot endpoints and report latency")
+    p.add_argument("--url", help="base URL of a running server (default: in-process test client)")
+    p.add_argument("--threads", type=int, default=4)
+    p.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    p.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds first")
+    p.add_argument("--only", nargs="+", metavar="SCENARIO",
+                   help=f"subset of: {', '.join(load.SCENARIOS)}")
+    p.add_argument("--json", action="store_true", help="print the report as JSON")
+    p.set_defaults(func=cmd_run)
+
+    p = commands.add_parser(
+        "compare", help="sync vs async JSON endpoints at increasing concurrency")
+    p.add_argument("--sync-url", required=True,
+                   help="the Flask app under a WSGI server, e.g. gunicorn app:app")
+    p.add_argument("--async-url", required=True,
+                   help="the same app under hypercorn asgi:app")
+    p.add_argument("--levels", nargs="+", type=int, default=[10, 50, 100, 200],
+                   metavar="THREADS", help="concurrency levels (default 10 50 100 200)")
+    p.add_argument("--duration", type=float, default=20.0, help="measured seconds per run")
+    p.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds per run")
+    p.add_argument("--only", nargs="+", metavar="SCENARIO", default=list(load.ASYNC_SCENARIOS),
+                   choices=list(load.SCENARIOS),
+                   help=f"scenarios (default: {' '.join(load.ASYNC_SCENARIOS)})")
+    p.add_argument("--json", action="store_true", help="print the result as JSON")
+    p.set_defaults(func=cmd_compare)
+
+    p = commands.add_parser(
+        "stress-votes", help="concurrent votes on one item; check counters match the votes table")
+    p.add_argument("--threads", type=int, default=16)
+    p.add_argument("--votes", type=int, default=2000, help="votes cast in total")
+    p.add_argument("--users", type=int, default=40,
+                   help="distinct voters (capped below the auto-removal threshold)")
+    p.set_defaults(func=cmd_stress_votes)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
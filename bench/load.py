@@ -0,0 +1,391 @@
+"""
+Load generator.
+
+Worker threads each log in as a different seeded user and replay a
+weighted mix of the hot endpoints until the run ends. Requests go either
+through Flask's test client (in-process, no server needed) or over HTTP
+to a running server. Per-request SQL statement counts come from the
+X-SQL-Summary header (see conn_utils); over HTTP the server needs
+SQL_SUMMARY_HEADER enabled to report them.
+"""
+
+import json as json_module
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import date, timedelta
+
+from bench.seed import BENCH_PASSWORD, WORDS
+from db import instrument
+from event_routes import EVENT_CATEGORIES
+from resources_routes import RESOURCE_CATEGORIES
+
+SQL_HEADER = "X-SQL-Summary"
+
+
+# ---------------------------------------------------------------------------
+# Scenarios: each returns (method, path, options) for one request
+# ---------------------------------------------------------------------------
+
+def _events_list(rng, ids):
+    params = {}
+    if rng.random() < 0.3:
+        params["category"] = rng.choice(EVENT_CATEGORIES)
+    if rng.random() < 0.2:
+        params["q"] = rng.choice(WORDS)
+    return "GET", "/events/?" + urllib.parse.urlencode(params), {}
+
+
+def _resources_list(rng, ids):
+    params = {}
+    if rng.random() < 0.3:
+        params["category"] = rng.choice(RESOURCE_CATEGORIES)
+    return "GET", "/resources/?" + urllib.parse.urlencode(params), {}
+
+
+def _calendar_feed(rng, ids):
+    # A month-sized window like FullCalendar's month view asks for
+    start = date.today().replace(day=1) + timedelta(days=30 * rng.randint(-3, 3))
+    end = start + timedelta(days=42)
+    return "GET", f"/events/api/events?start={start.isoformat()}&end={end.isoformat()}", {}
+
+
+def _event_detail(rng, ids):
+    return "GET", f"/events/{rng.randint(*ids['events'])}", {}
+
+
+def _comment_thread(rng, ids):
+    return "GET", f"/comments/event/{rng.randint(*ids['events'])}", {}
+
+
+def _comment_batch(rng, ids):
+    event_ids = ",".join(str(rng.randint(*ids["events"])) for _ in range(20))
+    return "GET", f"/comments/batch?event_ids={event_ids}", {}
+
+
+def _comment_post(rng, ids):
+    body = {"content": " ".join(rng.choice(WORDS) for _ in range(12)),
+            "event_id": rng.randint(*ids["events"])}
+    return "POST", "/comments", {"json": body}
+
+
+def _vote(rng, ids):
+    item_type = rng.choice(["event", "resource"])
+    item_id = rng.randint(*ids["events" if item_type == "event" else "resources"])
+    vote = "up" if rng.random() < 0.85 else "down"
+    return "POST", f"/votes/{item_type}/{item_id}", {"json": {"vote": vote}}
+
+
+def _login(rng, ids):
+    email = rng.choice(ids["emails"])
+    return "POST", "/login/", {"data": {"email": email, "password": BENCH_PASSWORD}}
+
+
+# name -> (weight, scenario)
+SCENARIOS = {
+    "events_list": (20, _events_list),
+    "resources_list": (10, _resources_list),
+    "calendar_feed": (15, _calendar_feed),
+    "event_detail": (10, _event_detail),
+    "comment_thread": (10, _comment_thread),
+    "comment_batch": (10, _comment_batch),
+    "comment_post": (5, _comment_post),
+    "vote": (15, _vote),
+    "login": (5, _login),
+}
+
+# Scenarios where a 4xx is an error too: the write endpoints need the
+# worker's login, and a 4xx on the login scenario is the throttle's 429
+FAIL_ON_4XX = ("comment_post", "vote", "login")
+
+# The endpoints async_api.py also serves (see compare)
+ASYNC_SCENARIOS = ("calendar_feed", "comment_thread", "comment_batch", "comment_post", "vote")
+
+
+# ---------------------------------------------------------------------------
+# Sessions: one per worker thread, each keeps its own login cookie
+# ---------------------------------------------------------------------------
+
+class TestClientSession:
+    """Sends requests through app.test_client() (no server needed)."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, data=None):
+        response = self.client.open(path, method=method, json=json, data=data)
+        response.close()
+        return response.status_code, response.headers
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report 3xx responses instead of following them (one request = one sample)."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class HttpSession:
+    """Sends requests to a running server, keeping cookies between calls."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            _NoRedirect, urllib.request.HTTPCookieProcessor()
+        )
+
+    def request(self, method, path, json=None, data=None):
+        body = None
+        headers = {}
+        if json is not None:
+            body = json_module.dumps(json).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        req = urllib.request.Request(self.base_url + path, data=body,
+                                     method=method, headers=headers)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                response.read()
+                return response.status, response.headers
+        except urllib.error.HTTPError as err:
+            err.read()
+            return err.code, err.headers
+
+
+# ---------------------------------------------------------------------------
+# Running and reporting
+# ---------------------------------------------------------------------------
+
+def load_ids(conn, max_users=1000):
+    """
+    Id ranges and login emails for the scenarios, read from the seeded DB.
+    """
+    curs = instrument.cursor(conn)
+    ids = {}
+    for table, col in [("events", "event_id"), ("resources", "resource_id")]:
+        curs.execute(f"SELECT MIN({col}), MAX({col}) FROM {table}")
+        ids[table] = curs.fetchone()
+        if ids[table][0] is None:
+            raise ValueError(f"no rows in {table}; run `python -m bench seed` first")
+
+    curs.execute(
+        "SELECT email FROM users WHERE email LIKE 'bench%%' ORDER BY user_id LIMIT %s",
+        [max_users]
+    )
+    ids["emails"] = [row[0] for row in curs.fetchall()]
+    if not ids["emails"]:
+        raise ValueError("no bench users; run `python -m bench seed` first")
+    return ids
+
+
+def logged_in(status, headers):
+    """True if a POST /login/ response is a successful login."""
+    # A failed login redirects too, but back to the login page
+    return status == 302 and "/user/" in (headers.get("Location") or "")
+
+
+def run(make_session, ids, threads=4, duration=30.0, warmup=5.0, seed=1, scenarios=None):
+    """
+    Drive the app from several threads and collect one sample per request.
+
+    Args:
+        make_session (callable): Returns a new TestClientSession/HttpSession
+        ids (dict): From load_ids()
+        threads (int): Concurrent workers
+        duration (float): Seconds of measured load
+        warmup (float): Seconds of load before measuring starts
+        seed (int): Random seed for the request mix
+        scenarios (dict): Subset of SCENARIOS to run (default: all)
+
+    Returns:
+        dict: Report (see summarize); workers whose login fails send
+              nothing and are counted in "login_failures"
+    """
+    scenarios = scenarios or SCENARIOS
+    names = list(scenarios)
+    weights = [scenarios[name][0] for name in names]
+
+    samples = defaultdict(list)
+    login_failures = []
+    lock = threading.Lock()
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        session = make_session()
+        # Every worker is a different logged-in user
+        try:
+            status, headers = session.request("POST", "/login/", data={
+                "email": ids["emails"][n % len(ids["emails"])], "password": BENCH_PASSWORD
+            })
+        except Exception:
+            status, headers = None, {}
+        if not logged_in(status, headers):
+            with lock:
+                login_failures.append(status)
+            return
+
+        local = defaultdict(list)
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            name = rng.choices(names, weights)[0]
+            method, path, options = scenarios[name][1](rng, ids)
+
+            t0 = time.perf_counter()
+            try:
+                status, headers = session.request(method, path, **options)
+            except Exception:
+                status, headers = None, {}
+            elapsed = time.perf_counter() - t0
+
+            if now >= measure_from:
+                local[name].append((elapsed, status, _sql_statements(headers)))
+
+        with lock:
+            for name, rows in local.items():
+                samples[name].extend(rows)
+
+    workers = [threading.Thread(target=worker, args=(n,), name=f"bench-{n}")
+               for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    return summarize(samples, duration, threads, login_failures=len(login_failures))
+
+
+def _sql_statements(headers):
+    """Statement count from an X-SQL-Summary header, or None."""
+    summary = headers.get(SQL_HEADER) if headers else None
+    if not summary:
+        return None
+    for part in summary.split(";"):
+        key, _, value = part.strip().partition("=")
+        if key == "statements":
+            return int(value)
+    return None
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already-sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize(samples, duration, threads, login_failures=0):
+    """
+    Build the report: per scenario request count, errors (5xx or no
+    response; 4xx too for FAIL_ON_4XX), p50/p95/p99 latency in ms and mean
+    SQL statements per request; plus overall throughput, errors, p50/p99
+    and the number of workers that could not log in.
+    """
+    report = {"threads": threads, "duration": duration, "scenarios": {},
+              "login_failures": login_failures}
+    total = 0
+    all_latencies = []
+    all_errors = 0
+    for name in sorted(samples):
+        rows = samples[name]
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in rows)
+        lowest_error = 400 if name in FAIL_ON_4XX else 500
+        errors = sum(1 for _, status, _ in rows if status is None or status >= lowest_error)
+        statements = [n for _, _, n in rows if n is not None]
+        report["scenarios"][name] = {
+            "requests": len(rows),
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "sql_per_request": round(sum(statements) / len(statements), 2) if statements else None,
+        }
+        total += len(rows)
+        all_latencies.extend(latencies)
+        all_errors += errors
+
+    all_latencies.sort()
+    report["requests"] = total
+    report["errors"] = all_errors
+    report["p50_ms"] = round(percentile(all_latencies, 50), 2)
+    report["p99_ms"] = round(percentile(all_latencies, 99), 2)
+    report["throughput_rps"] = round(total / duration, 1) if duration else 0.0
+    return report
+
+
+def format_report(report):
+    """Render a report as a plain-text table."""
+    lines = [
+        f"{'scenario':<16}{'reqs':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'sql/req':>9}"
+    ]
+    for name, row in report["scenarios"].items():
+        sql = "-" if row["sql_per_request"] is None else f"{row['sql_per_request']:.1f}"
+        lines.append(
+            f"{name:<16}{row['requests']:>8}{row['errors']:>8}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{sql:>9}"
+        )
+    lines.append(
+        f"\n{report['requests']} requests in {report['duration']:g}s "
+        f"with {report['threads']} threads: {report['throughput_rps']} req/s"
+    )
+    if report["login_failures"]:
+        lines.append(f"{report['login_failures']} of {report['threads']} workers could not log in")
+    return "\n".join(lines)
+
+
+def compare(targets, ids, levels, duration=30.0, warmup=5.0, seed=1, scenarios=None):
+    """
+    Run the same request mix against several servers at each concurrency
+    level in turn, to find where each one stops scaling.
+
+    Args:
+        targets (dict): label -> make_session (see run)
+        levels (list): Thread counts, e.g. [10, 50, 100, 200]
+        (other args as for run)
+
+    Returns:
+        dict: {"levels": levels, "targets": {label: [report per level]}}
+
+    Raises:
+        RuntimeError: A target refused some workers' logins; the numbers
+                      would only measure the logged-out error path
+    """
+    result = {"levels": list(levels), "targets": {label: [] for label in targets}}
+    for threads in levels:
+        for label, make_session in targets.items():
+            report = run(make_session, ids, threads=threads, duration=duration,
+                         warmup=warmup, seed=seed, scenarios=scenarios)
+            if report["login_failures"]:
+                raise RuntimeError(
+                    f"{label}: {report['login_failures']} of {threads} workers could not "
+                    "log in; is the server running with CAMPUS_CONNECT_LOGIN_THROTTLE=0?"
+                )
+            result["targets"][label].append(report)
+    return result
+
+
+def format_comparison(result):
+    """Render a compare() result: one row per concurrency level and target."""
+    lines = [f"{'threads':>8}  {'target':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}"]
+    for i, threads in enumerate(result["levels"]):
+        for label, reports in result["targets"].items():
+            report = reports[i]
+            lines.append(
+                f"{threads:>8}  {label:<10}{report['throughput_rps']:>10.1f}"
+                f"{report['p50_ms']:>10.1f}{report['p99_ms']:>10.1f}{report['errors']:>8}"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,262 @@
+"""
+Synthetic data generator.
+
+Rows are generated from a seeded random.Random and inserted in batches
+with executemany (PyMySQL turns each batch into one multi-row INSERT).
+All users share the password BENCH_PASSWORD so the load test can log in
+as any of them.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import bcrypt
+
+from db import comment_db, event_db, instrument, vote_db
+from event_routes import EVENT_CATEGORIES
+from resources_routes import RESOURCE_CATEGORIES
+
+BENCH_PASSWORD = "bench-password"
+BENCH_EMAIL = "bench{}@example.edu"
+
+DEFAULT_SCALE = {
+    "users": 10000,
+    "events": 100000,
+    "resources": 20000,
+    "services": 10000,
+    "comments": 300000,
+    "rsvps": 300000,
+    "votes": 1000000,
+}
+
+BATCH_SIZE = 5000
+
+TABLES = ["jobs", "votes_archive", "rsvp_archive", "comments_archive", "events_archive",
+          "votes", "rsvp", "comments", "services", "resources", "events", "users"]
+
+SERVICE_CATEGORIES = ["Tutoring", "Beauty", "Tech Help", "Photography", "Moving", "Food"]
+LOCATION_TYPES = ["on-campus", "off-campus", "mobile", "dorm"]
+
+WORDS = (
+    "study group workshop tutoring math physics chemistry biology writing "
+    "career resume interview internship research lab community garden food "
+    "pantry wellness yoga meditation music concert art gallery film club "
+    "volunteer housing scholarship library coffee lecture panel alumni"
+).split()
+
+
+def reset(conn):
+    """Empty the benchmark tables and restart their ids at 1."""
+    curs = instrument.cursor(conn)
+    curs.execute("SET FOREIGN_KEY_CHECKS = 0")
+    try:
+        for table in TABLES:
+            curs.execute(f"TRUNCATE TABLE {table}")
+    finally:
+        curs.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+def seed(conn, scale=None, seed=1, progress=print):
+    """
+    Insert synthetic rows at the given scale.
+
+    Args:
+        conn: Database connection
+        scale (dict): Row counts per table (missing keys use DEFAULT_SCALE)
+        seed (int): Random seed; the same seed gives the same data
+        progress (callable): Called with a status line after each table
+
+    Returns:
+        dict: Number of rows inserted per table
+    """
+    scale = {**DEFAULT_SCALE, **(scale or {})}
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    inserted = {}
+
+    # One bcrypt hash for everybody: hashing 10k passwords would dominate seeding
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    before = _max_id(conn, "users", "user_id")
+    inserted["users"] = _insert(conn, """
+        INSERT INTO users (full_name, email, password_hash, role)
+        VALUES (%s, %s, %s, 'student')
+    """, (
+        [f"Bench User {n}", BENCH_EMAIL.format(n), password_hash]
+        for n in range(before + 1, before + 1 + scale["users"])
+    ))
+    progress(f"users: {inserted['users']}")
+    users = _new_ids(conn, "users", "user_id", before)
+
+    before = _max_id(conn, "events", "event_id")
+    inserted["events"] = _insert(conn, """
+        INSERT INTO events (title, date_of_event, category, created_by, created_at,
+                            description, contact_info, city, state, status)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, 'Wellesley', 'MA', 'active')
+    """, (
+        [
+            _title(rng),
+            now + timedelta(days=rng.uniform(-180, 180)),
+            rng.choice(EVENT_CATEGORIES),
+            rng.randint(*users),
+            now - timedelta(days=rng.uniform(0, 365)),
+            _text(rng, 40),
+            "events@example.edu",
+        ]
+        for _ in range(scale["events"])
+    ))
+    progress(f"events: {inserted['events']}")
+    events = _new_ids(conn, "events", "event_id", before)
+
+    before = _max_id(conn, "resources", "resource_id")
+    inserted["resources"] = _insert(conn, """
+        INSERT INTO resources (title, description, category, contact_info, status,
+                               created_by, created_at)
+        VALUES (%s, %s, %s, %s, 'active', %s, %s)
+    """, (
+        [
+            _title(rng),
+            _text(rng, 40),
+            rng.choice(RESOURCE_CATEGORIES),
+            "help@example.edu",
+            rng.randint(*users),
+            now - timedelta(days=rng.uniform(0, 365)),
+        ]
+        for _ in range(scale["resources"])
+    ))
+    progress(f"resources: {inserted['resources']}")
+    resources = _new_ids(conn, "resources", "resource_id", before)
+
+    inserted["services"] = _insert(conn, """
+        INSERT INTO services (service_name, description, category, price_range,
+                              service_location_type, availability, contact_method,
+                              created_by, created_at)
+        VALUES (%s, %s, %s, '$10-20', %s, 'Weekends', 'email', %s, %s)
+    """, (
+        [
+            _title(rng),
+            _text(rng, 30),
+            rng.choice(SERVICE_CATEGORIES),
+            rng.choice(LOCATION_TYPES),
+            rng.randint(*users),
+            now - timedelta(days=rng.uniform(0, 365)),
+        ]
+        for _ in range(scale["services"])
+    ))
+    progress(f"services: {inserted['services']}")
+
+    inserted["comments"] = _insert(conn, """
+        INSERT INTO comments (content, event_id, resource_id, created_by, created_at)
+        VALUES (%s, %s, %s, %s, %s)
+    """, (
+        _comment_row(rng, now, users, events, resources)
+        for _ in range(scale["comments"])
+    ))
+    progress(f"comments: {inserted['comments']}")
+
+    # At most one RSVP per (event, user) (uq_rsvp_event_user)
+    inserted["rsvps"] = _insert(conn, """
+        INSERT INTO rsvp (status, event_id, created_by, created_at)
+        VALUES (%s, %s, %s, %s)
+    """, (
+        [
+            rng.choice(["yes", "yes", "maybe", "no"]),
+            event_id,
+            user_id,
+            now - timedelta(days=rng.uniform(0, 90)),
+        ]
+        for event_id, user_id in _distinct_pairs(rng, events, users, scale["rsvps"])
+    ))
+    progress(f"rsvps: {inserted['rsvps']}")
+
+    # Mostly upvotes, so few items cross the moderation thresholds
+    inserted["votes"] = _insert(conn, """
+        INSERT IGNORE INTO votes (user_id, item_type, item_id, vote)
+        VALUES (%s, %s, %s, %s)
+    """, (
+        _vote_row(rng, users, events, resources)
+        for _ in range(scale["votes"])
+    ))
+    for item_type in ("event", "resource"):
+        vote_db.reconcile_vote_counts(conn, item_type)
+    progress(f"votes: {inserted['votes']}")
+
+    # Bulk inserts bypass the counter upkeep in comment_db/event_db
+    comment_db.reconcile_comment_counts(conn)
+    event_db.reconcile_rsvp_counts(conn)
+
+    return inserted
+
+
+def _insert(conn, sql, rows):
+    """executemany rows in BATCH_SIZE chunks, committing each; returns the row count."""
+    curs = instrument.cursor(conn)
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            curs.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        curs.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+    return total
+
+
+def _max_id(conn, table, col):
+    curs = instrument.cursor(conn)
+    curs.execute(f"SELECT COALESCE(MAX({col}), 0) FROM {table}")
+    return curs.fetchone()[0]
+
+
+def _new_ids(conn, table, col, before):
+    """(min, max) id of the rows inserted after id before."""
+    curs = instrument.cursor(conn)
+    curs.execute(f"SELECT MIN({col}), MAX({col}) FROM {table} WHERE {col} > %s", [before])
+    return curs.fetchone()
+
+
+def _title(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(words // 2, words)))
+
+
+def _comment_row(rng, now, users, events, resources):
+    event_id = resource_id = None
+    if rng.random() < 0.7:
+        event_id = rng.randint(*events)
+    else:
+        resource_id = rng.randint(*resources)
+    return [
+        _text(rng, 20),
+        event_id,
+        resource_id,
+        rng.randint(*users),
+        now - timedelta(days=rng.uniform(0, 365)),
+    ]
+
+
+def _vote_row(rng, users, events, resources):
+    if rng.random() < 0.7:
+        item_type, item_id = "event", rng.randint(*events)
+    else:
+        item_type, item_id = "resource", rng.randint(*resources)
+    vote = "up" if rng.random() < 0.85 else "down"
+    return [rng.randint(*users), item_type, item_id, vote]
+
+
+def _distinct_pairs(rng, items, users, count):
+    """Yield up to count distinct (item_id, user_id) pairs."""
+    count = min(count, (items[1] - items[0] + 1) * (users[1] - users[0] + 1))
+    seen = set()
+    while len(seen) < count:
+        pair = (rng.randint(*items), rng.randint(*users))
+        if pair not in seen:
+            seen.add(pair)
+            yield pair
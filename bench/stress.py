@@ -0,0 +1,111 @@
+"""
+Concurrency stress test for vote_db.cast_vote.
+
+Many threads, each with its own connection, cast up, down and switched
+votes at one fresh event. Afterwards the event's upvotes/downvotes must
+equal SUM(vote = 'up') / SUM(vote = 'down') over its rows in votes; any
+difference means concurrent votes lost or double-counted an update.
+
+The event is created for the run and deleted with its votes afterwards.
+At most DELETE_THRESHOLD - 1 users vote, so auto-removal never hides it
+mid-run (flagging is fine).
+
+tests/test_vote_stress.py runs it under pytest against
+CAMPUS_CONNECT_TEST_DB.
+"""
+
+import random
+import threading
+from datetime import datetime
+
+from db import event_db, instrument, vote_db
+
+
+def vote_stress(connect, threads=16, votes=2000, users=40, seed=1):
+    """
+    Run the stress test.
+
+    Args:
+        connect (callable): Returns a new database connection
+        threads (int): Concurrent voters, each with its own connection
+        votes (int): Votes cast in total
+        users (int): Distinct bench users voting (capped below
+                     vote_db.DELETE_THRESHOLD)
+        seed (int): Random seed for the vote sequence
+
+    Returns:
+        dict: counters, aggregates, outcomes per result, errors and "ok"
+    """
+    users = min(users, vote_db.DELETE_THRESHOLD - 1)
+    conn = connect()
+    try:
+        curs = instrument.cursor(conn)
+        curs.execute("SELECT user_id FROM users ORDER BY user_id LIMIT %s", [users])
+        user_ids = [row[0] for row in curs.fetchall()]
+        if not user_ids:
+            raise ValueError("no users; run `python -m bench seed` first")
+
+        event_id = event_db.insert_event(
+            conn, "Vote stress test", datetime.now(), None, user_ids[0],
+            datetime.now(), "Created by python -m bench stress-votes", None,
+            None, None, None, None, None
+        )
+
+        outcomes = {}
+        errors = []
+        lock = threading.Lock()
+        rng = random.Random(seed)
+        # Each user votes repeatedly, so later votes switch or repeat earlier ones
+        plan = [(rng.choice(user_ids), rng.choice(["up", "down"])) for _ in range(votes)]
+        chunks = [plan[n::threads] for n in range(threads)]
+
+        def voter(chunk):
+            voter_conn = connect()
+            try:
+                for user_id, vote in chunk:
+                    result = vote_db.cast_vote(voter_conn, user_id, "event", event_id, vote)
+                    with lock:
+                        outcomes[result["result"]] = outcomes.get(result["result"], 0) + 1
+            except Exception as err:
+                with lock:
+                    errors.append(repr(err))
+            finally:
+                voter_conn.close()
+
+        workers = [threading.Thread(target=voter, args=(chunk,)) for chunk in chunks]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+        curs.execute(
+            "SELECT upvotes, downvotes FROM events WHERE event_id = %s", [event_id]
+        )
+        upvotes, downvotes = curs.fetchone()
+        curs.execute("""
+            SELECT COALESCE(SUM(vote = 'up'), 0), COALESCE(SUM(vote = 'down'), 0)
+            FROM votes
+            WHERE item_type = 'event' AND item_id = %s
+        """, [event_id])
+        up_votes, down_votes = (int(n) for n in curs.fetchone())
+        conn.commit()
+
+        curs.execute(
+            "DELETE FROM votes WHERE item_type = 'event' AND item_id = %s", [event_id]
+        )
+        curs.execute("DELETE FROM events WHERE event_id = %s", [event_id])
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "event_id": event_id,
+        "threads": threads,
+        "votes": votes,
+        "users": len(user_ids),
+        "outcomes": outcomes,
+        "errors": errors,
+        "counters": {"upvotes": upvotes, "downvotes": downvotes},
+        "aggregates": {"up": up_votes, "down": down_votes},
+        "ok": not errors and (upvotes, downvotes) == (up_votes, down_votes),
+    }
@@ -1,13 +1,17 @@
 from flask import Blueprint, request, jsonify, session
-import cs304dbi as dbi
+import conn_utils
 from db import comment_db
+import metrics
 
 comment_routes = Blueprint("comment_routes", __name__)
 
+# Upper bound on items per /comments/batch call (keeps the IN list sane)
+MAX_BATCH_IDS = 200
+
 
 def get_conn():
-    """Return a database connection."""
-    return dbi.connect()
+    """Return this request's pooled database connection."""
+    return conn_utils.get_conn()
 
 
 @comment_routes.route("/comments", methods=["POST"])
@@ -46,6 +50,7 @@ def create_comment():
         event_id=event_id,
         resource_id=resource_id
     )
+    metrics.COMMENTS.labels("create").inc()
 
     return jsonify({"message": "Comment added!"}), 201
 
@@ -74,6 +79,47 @@ def get_comments(item_type, item_id):
     return jsonify(comments), 200
 
 
+def parse_id_list(raw):
+    """Parse a comma-separated id list ("1,2,3"); returns None if malformed."""
+    if not raw:
+        return []
+    try:
+        return list(dict.fromkeys(int(part) for part in raw.split(",") if part.strip()))
+    except ValueError:
+        return None
+
+
+@comment_routes.route("/comments/batch")
+def get_comments_batch():
+    """
+    Return comments for many events and/or resources in one call.
+    Query args: event_ids and/or resource_ids, comma-separated.
+    Response: {"events": {id: [...]}, "resources": {id: [...]}}
+    """
+    event_ids = parse_id_list(request.args.get("event_ids"))
+    resource_ids = parse_id_list(request.args.get("resource_ids"))
+
+    if event_ids is None or resource_ids is None:
+        return jsonify({"error": "ids must be comma-separated integers"}), 400
+
+    if not event_ids and not resource_ids:
+        return jsonify({"error": "Provide event_ids or resource_ids"}), 400
+
+    if len(event_ids) + len(resource_ids) > MAX_BATCH_IDS:
+        return jsonify({"error": f"At most {MAX_BATCH_IDS} ids per request"}), 400
+
+    conn = get_conn()
+    user_id = session.get("user_id", -1)
+
+    result = {}
+    if event_ids:
+        result["events"] = comment_db.list_comments_for_events(conn, event_ids, user_id)
+    if resource_ids:
+        result["resources"] = comment_db.list_comments_for_resources(conn, resource_ids, user_id)
+
+    return jsonify(result), 200
+
+
 @comment_routes.route("/comments/<int:comment_id>", methods=["DELETE"])
 def delete_comment(comment_id):
     """
@@ -95,6 +141,7 @@ def delete_comment(comment_id):
         return jsonify({"error": "Unauthorized"}), 403
 
     comment_db.delete_comment(conn, comment_id)
+    metrics.COMMENTS.labels("delete").inc()
     return jsonify({"message": "Comment deleted"}), 200
 
 
@@ -126,4 +173,5 @@ def edit_comment(comment_id):
         return jsonify({"error": "Unauthorized"}), 403
 
     comment_db.update_comment(conn, comment_id, new_content)
+    metrics.COMMENTS.labels("edit").inc()
     return jsonify({"message": "Comment updated"}), 200
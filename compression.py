@@ -0,0 +1,117 @@
+"""
+gzip/brotli compression of text responses.
+
+The events and resources list pages carry their scripts inline and the
+stylesheet is served as-is, so a page view ships every byte uncompressed.
+An after_request hook compresses responses when:
+  - the client accepts br or gzip (brotli is preferred when installed)
+  - the mimetype is text-like (COMPRESS_MIMETYPES)
+  - the body is at least COMPRESS_MIN_SIZE bytes (smaller bodies gain
+    less than the header and CPU cost)
+  - it is a plain 200 (not a 304, a range, or already encoded)
+
+Static files are read into memory to compress them, and the compressed
+bytes are kept in a small LRU keyed by ETag and encoding, so each
+version of style.css is compressed once per process.
+
+Compressed responses get a weak ETag, which still matches the plain
+ETag for If-None-Match revalidation (a weak comparison).
+"""
+
+import gzip
+
+from flask import current_app, request
+
+from db import cache
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/xml',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+}
+
+# Compressed static files: (etag, encoding) -> bytes
+_static_cache = cache.LRUCache(maxsize=64, ttl=3600.0)
+
+
+def choose_encoding(accept_encodings):
+    """The encoding to use for a request's Accept-Encoding, or None."""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    """Return data compressed with encoding ('br' or 'gzip')."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def init_app(app):
+    """Register the compression hook; settings come from COMPRESS_* config."""
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)   # 4-5: fast, close to gzip -9
+    app.config.setdefault('COMPRESS_MIMETYPES', COMPRESS_MIMETYPES)
+    app.after_request(_compress_response)
+
+
+def _compress_response(response):
+    config = current_app.config
+
+    if response.mimetype not in config['COMPRESS_MIMETYPES']:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if (response.status_code != 200
+            # send_file responses stream a file but have a known length
+            or (response.is_streamed and not response.direct_passthrough)
+            or 'Content-Encoding' in response.headers
+            or 'X-Sendfile' in response.headers
+            or 'Content-Range' in response.headers):
+        return response
+
+    length = response.content_length
+    if length is not None and length < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    etag, _ = response.get_etag()
+    key = (etag, encoding) if response.direct_passthrough and etag else None
+    body = _static_cache.get(key) if key else None
+    if body is None:
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        body = compress(data, encoding,
+                        gzip_level=config['COMPRESS_GZIP_LEVEL'],
+                        brotli_quality=config['COMPRESS_BROTLI_QUALITY'])
+        if key:
+            _static_cache.set(key, body)
+    else:
+        # Drop the open file behind a cached static response
+        response.close()
+
+    response.direct_passthrough = False
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
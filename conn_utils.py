@@ -0,0 +1,165 @@
+"""
+Request-scoped database connections.
+
+Each request borrows at most one connection from the shared ConnectionPool
+(db/pool.py). The connection is cached on flask.g so every getConn() call
+in the same request reuses it, and it is returned to the pool on teardown.
+
+With a read replica configured (DB_REPLICA_CNF), the request's handle is
+a RoutingConnection (db/routing.py): read-only db functions use the
+replica while it is within DB_REPLICA_MAX_LAG, everything else uses the
+primary. After a user's request writes, their requests for the next
+DB_READ_YOUR_WRITES_SECONDS read from the primary too.
+
+Every request also collects SQL statistics (db/instrument.py). Repeated
+statement shapes are logged as likely N+1 patterns, and in debug mode (or
+with SQL_SUMMARY_HEADER) responses carry an X-SQL-Summary header.
+
+ENTITY_CACHE* configure db.cache.entity_cache, which serves get_*_by_id
+and get_*_owner lookups (set ENTITY_CACHE = False to always query).
+"""
+
+import json
+import time
+
+import cs304dbi as dbi
+from flask import g, current_app, request, session, has_request_context
+
+from db import cache, instrument
+from db.pool import ConnectionPool
+from db.routing import ReplicaMonitor, RoutingConnection
+
+
+def init_app(app, replica_factory=None):
+    """
+    Create the app-wide connection pool(s) and register the request hooks.
+    Pool settings come from DB_POOL_* config keys, replica settings from
+    DB_REPLICA_*. replica_factory (a no-argument function returning a
+    connection) overrides DB_REPLICA_CNF, e.g. to point at a stub.
+    """
+    app.config.setdefault('DB_POOL_SIZE', 10)
+    app.config.setdefault('DB_POOL_WAIT_TIMEOUT', 5.0)
+    app.config.setdefault('DB_POOL_IDLE_TIMEOUT', 300.0)
+
+    app.extensions['db_pool'] = ConnectionPool(
+        max_size=app.config['DB_POOL_SIZE'],
+        wait_timeout=app.config['DB_POOL_WAIT_TIMEOUT'],
+        idle_timeout=app.config['DB_POOL_IDLE_TIMEOUT'],
+    )
+    app.teardown_appcontext(release_conn)
+
+    app.config.setdefault('DB_REPLICA_CNF', None)
+    app.config.setdefault('DB_REPLICA_DATABASE', None)
+    app.config.setdefault('DB_REPLICA_POOL_SIZE', app.config['DB_POOL_SIZE'])
+    app.config.setdefault('DB_REPLICA_MAX_LAG', 2.0)
+    app.config.setdefault('DB_REPLICA_LAG_CHECK_INTERVAL', 5.0)
+    app.config.setdefault('DB_READ_YOUR_WRITES_SECONDS', 5.0)
+
+    if replica_factory is None and app.config['DB_REPLICA_CNF']:
+        dsn = dbi.read_cnf(app.config['DB_REPLICA_CNF'])
+        if app.config['DB_REPLICA_DATABASE']:
+            dsn['database'] = app.config['DB_REPLICA_DATABASE']
+        replica_factory = lambda: dbi.connect(dsn)
+
+    if replica_factory is not None:
+        replica_pool = ConnectionPool(
+            max_size=app.config['DB_REPLICA_POOL_SIZE'],
+            wait_timeout=app.config['DB_POOL_WAIT_TIMEOUT'],
+            idle_timeout=app.config['DB_POOL_IDLE_TIMEOUT'],
+            factory=replica_factory,
+        )
+        app.extensions['db_replica'] = ReplicaMonitor(
+            replica_pool,
+            max_lag=app.config['DB_REPLICA_MAX_LAG'],
+            check_interval=app.config['DB_REPLICA_LAG_CHECK_INTERVAL'],
+        )
+    app.after_request(_remember_writes)
+
+    app.config.setdefault('SLOW_QUERY_SECONDS', instrument.SLOW_QUERY_SECONDS)
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', instrument.N_PLUS_ONE_THRESHOLD)
+    app.config.setdefault('SQL_SUMMARY_HEADER', False)
+    instrument.SLOW_QUERY_SECONDS = app.config['SLOW_QUERY_SECONDS']
+    instrument.N_PLUS_ONE_THRESHOLD = app.config['N_PLUS_ONE_THRESHOLD']
+
+    app.before_request(_start_sql_stats)
+    app.after_request(_finish_sql_stats)
+
+    app.config.setdefault('ENTITY_CACHE', True)
+    app.config.setdefault('ENTITY_CACHE_SIZE', cache.entity_cache.maxsize)
+    app.config.setdefault('ENTITY_CACHE_TTL', cache.entity_cache.ttl)
+    cache.entity_cache.configure(
+        enabled=app.config['ENTITY_CACHE'],
+        maxsize=app.config['ENTITY_CACHE_SIZE'],
+        ttl=app.config['ENTITY_CACHE_TTL'],
+    )
+
+
+def get_pool():
+    """Return the connection pool for the current app."""
+    return current_app.extensions['db_pool']
+
+
+def get_replica():
+    """Return the ReplicaMonitor for the current app, or None."""
+    return current_app.extensions.get('db_replica')
+
+
+def get_conn():
+    """
+    Return this request's database handle (a RoutingConnection).
+    Connections are borrowed from the pools on first use.
+    """
+    if 'db_conn' not in g:
+        g.db_conn = RoutingConnection(
+            get_pool(), get_replica(), use_replica=not _reads_pinned_to_primary()
+        )
+    return g.db_conn
+
+
+def read_from_replica():
+    """True if this request has read anything from the replica so far."""
+    conn = g.get('db_conn')
+    return conn is not None and conn.read_replica
+
+
+def release_conn(exc=None):
+    """Teardown hook: give the request's connections back to their pools."""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.release()
+
+
+def _reads_pinned_to_primary():
+    """True for a while after this user's last write (read-your-writes)."""
+    if not has_request_context():
+        return False
+    return session.get('db_primary_until', 0) > time.time()
+
+
+def _remember_writes(response):
+    conn = g.get('db_conn')
+    if conn is not None and conn.wrote and get_replica() is not None:
+        session['db_primary_until'] = time.time() + current_app.config['DB_READ_YOUR_WRITES_SECONDS']
+    return response
+
+
+def _start_sql_stats():
+    instrument.start_request(f"{request.method} {request.path}")
+
+
+def _finish_sql_stats(response):
+    stats = instrument.finish_request()
+    if stats is None:
+        return response
+
+    for shape, count in stats.repeated_shapes().items():
+        instrument.slow_log.warning(json.dumps({
+            "event": "repeated_statement",
+            "request": stats.label,
+            "count": count,
+            "statement": shape,
+        }))
+
+    if current_app.debug or current_app.config['SQL_SUMMARY_HEADER']:
+        response.headers['X-SQL-Summary'] = stats.summary()
+    return response
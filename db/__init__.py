@@ -10,7 +10,20 @@ Each module provides functions for CRUD operations on a specific entity:
   - services_db: Service management (create, list, update, delete)
   - comment_db: Comments on events and resources
   - vote_db: Voting/rating system for events and resources
+  - purge_db: Soft deletes and batched background purges of events/resources
+  - archive_db: Batched moves of past events into the archive tables
+  - job_db: Persistent queue for background jobs (see worker.py)
+  - search_db: Full-text search across events, resources and services
+  - pool: Bounded connection pool shared by all requests
+  - routing: Read/write splitting between the primary and a read replica
+  - pagination: Keyset (cursor) pagination helpers for list pages
+  - cache: In-process LRU/TTL caches, including the by-id row cache
+  - instrument: Timed cursors and per-request SQL statistics
+  - async_db: aiomysql versions of the comment, vote and calendar
+    queries for the async JSON tier (async_api.py)
 
-All functions accept a database connection as their first parameter.
+All functions accept a database connection as their first parameter and
+get their cursors from instrument.cursor / instrument.dict_cursor
+(async_db's coroutines take an aiomysql connection instead).
 Using parameterized queries prevents SQL injection attacks.
 """
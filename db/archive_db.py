@@ -0,0 +1,108 @@
+"""
+archive_db - Cold Storage for Past Events
+
+Events, their RSVPs and their comments otherwise stay in the live tables
+forever, and every list scan and index carries them. archive_events()
+moves events whose date_of_event is older than a horizon, with their
+RSVPs, comments and votes, into the *_archive tables (schema.sql):
+  - a batch of events is locked (FOR UPDATE), copied with
+    INSERT ... SELECT, then deleted, all in one short transaction, so
+    an event is always in exactly one of events/events_archive
+  - batches repeat until nothing older than the horizon is left
+
+Removed events are skipped; purge_db deletes them. Events without a
+date_of_event are never archived.
+
+Archived events are only read when a caller asks for them:
+event_db.get_event_by_id(include_archived=True) and
+event_db.list_rsvps_yes_maybe(archived=True).
+"""
+
+from db import cache, event_db, instrument
+
+ARCHIVE_BATCH_SIZE = 100   # events per transaction
+
+# (live table, archive table, columns, WHERE clause on the batch's ids)
+# in copy order; deleted in reverse order, the events last
+ARCHIVED_TABLES = [
+    ("events", "events_archive", event_db.EVENT_FIELDS, "event_id IN ({ids})"),
+    ("rsvp", "rsvp_archive",
+     "rsvp_id, status, event_id, created_by, created_at",
+     "event_id IN ({ids})"),
+    ("comments", "comments_archive",
+     "comment_id, content, event_id, created_by, created_at",
+     "event_id IN ({ids})"),
+    ("votes", "votes_archive",
+     "vote_id, user_id, item_type, item_id, vote",
+     "item_type = 'event' AND item_id IN ({ids})"),
+]
+
+
+def archive_events(conn, before, batch_size=ARCHIVE_BATCH_SIZE, max_batches=None):
+    """
+    Move events dated before `before` (a datetime) and everything that
+    references them into the archive tables, batch_size events per
+    transaction.
+
+    Args:
+        max_batches (int, optional): Stop after this many batches
+
+    Returns:
+        dict: Rows moved per live table
+    """
+    totals = {table: 0 for table, _, _, _ in ARCHIVED_TABLES}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(conn, before, batch_size)
+        if not moved["events"]:
+            break
+        for table, rows in moved.items():
+            totals[table] += rows
+        batches += 1
+    return totals
+
+
+def archive_batch(conn, before, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archive up to batch_size of the oldest events dated before `before`
+    in one transaction. Returns rows moved per live table.
+    """
+    curs = instrument.cursor(conn)
+    moved = {table: 0 for table, _, _, _ in ARCHIVED_TABLES}
+    try:
+        # Oldest first along idx_events_date_of_event; the row locks keep
+        # votes, RSVPs and comment inserts off these events until commit
+        curs.execute("""
+            SELECT event_id
+            FROM events
+            WHERE date_of_event < %s AND NOT (status <=> 'removed')
+            ORDER BY date_of_event, event_id
+            LIMIT %s
+            FOR UPDATE
+        """, [before, batch_size])
+        event_ids = [row[0] for row in curs.fetchall()]
+        if not event_ids:
+            conn.rollback()
+            return moved
+
+        ids = ", ".join(["%s"] * len(event_ids))
+        for table, archive, columns, where in ARCHIVED_TABLES:
+            curs.execute(f"""
+                INSERT INTO {archive} ({columns})
+                SELECT {columns}
+                FROM {table}
+                WHERE {where.format(ids=ids)}
+            """, event_ids)
+            moved[table] = curs.rowcount
+
+        for table, _, _, where in reversed(ARCHIVED_TABLES):
+            curs.execute(f"DELETE FROM {table} WHERE {where.format(ids=ids)}", event_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for event_id in event_ids:
+        cache.invalidate_item("event", event_id)
+    event_db.calendar_cache.clear()
+    return moved
@@ -0,0 +1,166 @@
+"""
+async_db - Async Database Layer for the JSON API Tier
+
+Coroutine versions of the hot JSON endpoints' queries, on aiomysql, for
+async_api.py:
+  - create_pool: aiomysql pool from a my.cnf-style file
+  - transaction: Run a block on a pool connection in one transaction
+  - list_comments_for_event / list_comments_for_resource
+  - list_comments_for_events / list_comments_for_resources
+  - insert_comment: Add a comment and bump its target's comment_count
+  - cast_vote: Same contract as vote_db.cast_vote
+  - list_events_for_calendar
+
+The SQL is shared with the sync modules (comment_db.comments_sql,
+vote_db.vote_counter_sql, event_db.calendar_sql,
+purge_db.removal_statements), so both tiers read and write the same rows the same way.
+
+Pool connections run in autocommit mode: reads need no COMMIT round
+trip, and writes open an explicit transaction with transaction(conn).
+"""
+
+import contextlib
+
+import aiomysql
+import cs304dbi as dbi
+
+from db import cache, comment_db, event_db, purge_db, vote_db
+
+
+async def create_pool(cnf_file=None, database=None, maxsize=50, pool_recycle=300):
+    """
+    Open an aiomysql pool using the credentials in cnf_file
+    (default ~/.my.cnf, as read by cs304dbi).
+
+    Args:
+        cnf_file (str, optional): my.cnf-style credentials file
+        database (str, optional): Overrides the file's database
+        maxsize (int): Connections open at once
+        pool_recycle (float): Reconnect connections older than this (seconds)
+    """
+    dsn = dbi.read_cnf(cnf_file) if cnf_file else dbi.read_cnf()
+    return await aiomysql.create_pool(
+        host=dsn.get('host', 'localhost'),
+        port=int(dsn.get('port', 3306)),
+        user=dsn.get('user'),
+        password=dsn.get('password', ''),
+        db=database or dsn.get('database'),
+        charset='utf8mb4',
+        autocommit=True,
+        minsize=1,
+        maxsize=maxsize,
+        pool_recycle=pool_recycle,
+    )
+
+
+@contextlib.asynccontextmanager
+async def transaction(conn):
+    """Run the block in one transaction; roll back if it raises."""
+    await conn.begin()
+    try:
+        yield
+    except BaseException:
+        await conn.rollback()
+        raise
+    await conn.commit()
+
+
+async def _fetchall(conn, sql, params):
+    async with conn.cursor(aiomysql.DictCursor) as curs:
+        await curs.execute(sql, params)
+        return await curs.fetchall()
+
+
+async def list_comments_for_event(conn, event_id, current_user_id):
+    """Comments on an event (see comment_db.list_comments_for_event)."""
+    return await _fetchall(conn, comment_db.comments_sql("event_id"),
+                           [current_user_id, event_id])
+
+
+async def list_comments_for_resource(conn, resource_id, current_user_id):
+    """Comments on a resource (see comment_db.list_comments_for_resource)."""
+    return await _fetchall(conn, comment_db.comments_sql("resource_id"),
+                           [current_user_id, resource_id])
+
+
+async def _list_comments_for_targets(conn, target_col, target_ids, current_user_id):
+    grouped = {target_id: [] for target_id in target_ids}
+    if not grouped:
+        return grouped
+    rows = await _fetchall(conn, comment_db.comments_sql(target_col, len(grouped)),
+                           [current_user_id, *grouped])
+    for row in rows:
+        grouped[row.pop("target_id")].append(row)
+    return grouped
+
+
+async def list_comments_for_events(conn, event_ids, current_user_id):
+    """event_id -> comments (see comment_db.list_comments_for_events)."""
+    return await _list_comments_for_targets(conn, "event_id", event_ids, current_user_id)
+
+
+async def list_comments_for_resources(conn, resource_ids, current_user_id):
+    """resource_id -> comments (see comment_db.list_comments_for_resources)."""
+    return await _list_comments_for_targets(conn, "resource_id", resource_ids, current_user_id)
+
+
+async def insert_comment(conn, content, user_id, event_id=None, resource_id=None):
+    """Insert a comment and count it on its target, in one transaction."""
+    count_sql, count_params = comment_db.comment_count_sql(event_id, resource_id)
+    async with transaction(conn):
+        async with conn.cursor() as curs:
+            await curs.execute(comment_db.INSERT_COMMENT_SQL,
+                               [content, event_id, resource_id, user_id])
+            if count_sql is not None:
+                await curs.execute(count_sql, [1, *count_params])
+    comment_db.invalidate_target(event_id, resource_id)
+
+
+async def cast_vote(conn, user_id, item_type, item_id, vote_type):
+    """
+    Record a vote and update the item's counters in one transaction.
+    Same statements and return value as vote_db.cast_vote, including
+    removing the item (and queueing its purge) at DELETE_THRESHOLD.
+    """
+    await conn.begin()
+    try:
+        async with conn.cursor() as curs:
+            await curs.execute(vote_db.VOTE_UPSERT_SQL,
+                               [user_id, item_type, item_id, vote_type])
+            if curs.rowcount == 0:
+                await conn.rollback()
+                return {"result": "unchanged"}
+
+            up_delta, down_delta = vote_db._vote_deltas(
+                vote_type, switched=(curs.rowcount == 2)
+            )
+            await curs.execute(
+                vote_db.vote_counter_sql(item_type),
+                [up_delta, down_delta, vote_db.FLAG_THRESHOLD, item_id]
+            )
+            if curs.rowcount == 0:
+                await conn.rollback()
+                return {"result": "missing"}
+
+            downvotes = curs.lastrowid
+
+            if downvotes >= vote_db.DELETE_THRESHOLD:
+                for sql, params in purge_db.removal_statements(item_type, [item_id]):
+                    await curs.execute(sql, params)
+                await conn.commit()
+                purge_db.invalidate_removed(item_type, [item_id])
+                return {"result": "deleted", "downvotes": downvotes}
+
+        await conn.commit()
+    except BaseException:
+        await conn.rollback()
+        raise
+    cache.invalidate_item(item_type, item_id)
+
+    status = "flagged" if downvotes >= vote_db.FLAG_THRESHOLD else "active"
+    return {"result": "recorded", "status": status, "downvotes": downvotes}
+
+
+async def list_events_for_calendar(conn, start=None, end=None):
+    """Calendar rows for a window (see event_db.list_events_for_calendar)."""
+    return await _fetchall(conn, *event_db.calendar_sql(start, end))
@@ -0,0 +1,174 @@
+"""
+cache - In-Process Caching
+
+Small thread-safe caches for data that is read far more often than it
+changes:
+  - LRUCache: bounded least-recently-used cache with a per-entry TTL,
+    hit/miss/eviction counters and an on/off switch
+  - entity_cache: single rows looked up by primary key (get_*_by_id,
+    get_*_owner), shared by the db modules
+  - cached_row / invalidate_item: read through and invalidate entity_cache
+  - item_version / type_generation: write counters that invalidate_item
+    bumps, for caches keyed by them (render_cache.py)
+
+Each web process has its own caches. Writers invalidate the caches in
+their own process; other processes see the change once the TTL expires,
+so TTLs should be short enough to tolerate that staleness.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from db import routing
+
+
+class LRUCache:
+    """
+    A bounded mapping that evicts the least recently used entry when full
+    and treats entries older than ttl seconds as missing.
+
+    Args:
+        maxsize (int): Maximum number of entries
+        ttl (float): Seconds an entry stays valid
+        enabled (bool): False makes every get a miss and every set a no-op
+    """
+
+    def __init__(self, maxsize=128, ttl=60.0, enabled=True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+        # Monitoring counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing/expired."""
+        with self._lock:
+            entry = self._data.get(key) if self.enabled else None
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store value under key, evicting the oldest entry if full."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop one entry, if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def configure(self, enabled=None, maxsize=None, ttl=None):
+        """Change settings (from app config); always empties the cache."""
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._data.clear()
+
+    def stats(self):
+        """Return cache counters for monitoring."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        """Drop every entry (used for write invalidation)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+# Rows by primary key, keyed by (kind, id) where kind is e.g. "event" for
+# get_event_by_id or "event_owner" for get_event_owner. Rows carry vote,
+# comment and RSVP counters, so every write to an item invalidates it.
+entity_cache = LRUCache(maxsize=1024, ttl=30.0)
+
+
+def cached_row(kind, row_id, load):
+    """
+    Return a copy of the cached row for (kind, row_id), calling load()
+    on a miss. None (no such row) is not cached, nor is a row load() read
+    from a replica: it may predate a write this process just invalidated,
+    and would then be served for the whole TTL. Callers get their own
+    copy, so changing it can't change what other requests see.
+    """
+    row = entity_cache.get((kind, row_id))
+    if row is None:
+        with routing.ReplicaReads() as reads:
+            row = load()
+        if row is None:
+            return None
+        if not reads.used:
+            entity_cache.set((kind, row_id), row)
+    return dict(row)
+
+
+# Writes seen by this process: (item_type, id) -> count, and
+# item_type -> count of writes to any item of that type (inserts too)
+_item_versions = {}
+_type_generations = {}
+_versions_lock = threading.Lock()
+
+
+def item_version(item_type, item_id):
+    """How many times this process has seen the item written."""
+    return _item_versions.get((item_type, int(item_id)), 0)
+
+
+def type_generation(item_type):
+    """How many times this process has seen any item_type item written."""
+    return _type_generations.get(item_type, 0)
+
+
+def type_generations():
+    """Snapshot of type_generation() for every item type written so far."""
+    with _versions_lock:
+        return dict(_type_generations)
+
+
+def invalidate_item(item_type, item_id):
+    """
+    Drop an item's cached row and owner and bump its write counters
+    (after it was inserted, updated, voted or commented on, or deleted).
+    """
+    item_id = int(item_id)
+    entity_cache.invalidate((item_type, item_id))
+    entity_cache.invalidate((item_type + "_owner", item_id))
+    with _versions_lock:
+        key = (item_type, item_id)
+        _item_versions[key] = _item_versions.get(key, 0) + 1
+        _type_generations[item_type] = _type_generations.get(item_type, 0) + 1
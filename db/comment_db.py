@@ -5,13 +5,51 @@ Provides database operations for managing comments on events and resources:
   - insert_comment: Add a new comment
   - list_comments_for_event: Retrieve all comments on an event
   - list_comments_for_resource: Retrieve all comments on a resource
+  - list_comments_for_events / list_comments_for_resources: Batch versions
+    that fetch the threads of many items in one query
   - get_comment_owner: Check who created a comment (for delete authorization)
+  - reconcile_comment_counts: Recompute the comment_count columns in bulk
 
 Comments are always tied to a user and exactly one target (event or resource).
 Timestamps are managed by the database (NOW() at insertion).
+Inserts and deletes keep the target's comment_count column in step within
+the same transaction.
 """
 
-import cs304dbi as dbi
+from db import cache, instrument, routing
+
+
+def comments_sql(target_col, count=None):
+    """
+    SELECT for the comment threads of one target (count=None; params:
+    current_user_id, target id) or of `count` targets, with each row's
+    target_id (params: current_user_id, *target ids). target_col is
+    "event_id" or "resource_id", never user input. Shared with async_db.
+    """
+    if count is None:
+        target, where = "", f"c.{target_col} = %s"
+    else:
+        placeholders = ", ".join(["%s"] * count)
+        target, where = f"c.{target_col} AS target_id,", f"c.{target_col} IN ({placeholders})"
+    return f"""
+        SELECT
+            {target}
+            c.comment_id,
+            c.content,
+            c.created_at,
+            u.full_name AS author,
+            (c.created_by = %s) AS owned
+        FROM comments c
+        JOIN users u ON c.created_by = u.user_id
+        WHERE {where}
+        ORDER BY c.created_at DESC
+    """
+
+
+INSERT_COMMENT_SQL = """
+    INSERT INTO comments (content, event_id, resource_id, created_by, created_at)
+    VALUES (%s, %s, %s, %s, NOW())
+"""
 
 
 def insert_comment(conn, content, user_id, event_id=None, resource_id=None):
@@ -28,17 +66,14 @@ def insert_comment(conn, content, user_id, event_id=None, resource_id=None):
 
     Note: Routes enforce that exactly one target is provided.
     """
-    curs = dbi.cursor(conn)
-    curs.execute(
-        """
-        INSERT INTO comments (content, event_id, resource_id, created_by, created_at)
-        VALUES (%s, %s, %s, %s, NOW())
-        """,
-        [content, event_id, resource_id, user_id]
-    )
+    curs = instrument.cursor(conn)
+    curs.execute(INSERT_COMMENT_SQL, [content, event_id, resource_id, user_id])
+    _adjust_comment_count(curs, event_id, resource_id, 1)
     conn.commit()
+    invalidate_target(event_id, resource_id)
 
 
+@routing.read_only
 def list_comments_for_event(conn, event_id, current_user_id):
     """
     Return comments for an event as dict rows.
@@ -52,25 +87,12 @@ def list_comments_for_event(conn, event_id, current_user_id):
     Returns:
         list: Comment dicts with keys: comment_id, content, created_at, author, owned
     """
-    curs = dbi.dict_cursor(conn)
-    curs.execute(
-        """
-        SELECT
-            c.comment_id,
-            c.content,
-            c.created_at,
-            u.full_name AS author,
-            (c.created_by = %s) AS owned
-        FROM comments c
-        JOIN users u ON c.created_by = u.user_id
-        WHERE c.event_id = %s
-        ORDER BY c.created_at DESC
-        """,
-        [current_user_id, event_id]
-    )
+    curs = instrument.dict_cursor(conn)
+    curs.execute(comments_sql("event_id"), [current_user_id, event_id])
     return curs.fetchall()
 
 
+@routing.read_only
 def list_comments_for_resource(conn, resource_id, current_user_id):
     """
     Return comments for a resource as dict rows.
@@ -84,25 +106,62 @@ def list_comments_for_resource(conn, resource_id, current_user_id):
     Returns:
         list: Comment dicts with keys: comment_id, content, created_at, author, owned
     """
-    curs = dbi.dict_cursor(conn)
-    curs.execute(
-        """
-        SELECT
-            c.comment_id,
-            c.content,
-            c.created_at,
-            u.full_name AS author,
-            (c.created_by = %s) AS owned
-        FROM comments c
-        JOIN users u ON c.created_by = u.user_id
-        WHERE c.resource_id = %s
-        ORDER BY c.created_at DESC
-        """,
-        [current_user_id, resource_id]
-    )
+    curs = instrument.dict_cursor(conn)
+    curs.execute(comments_sql("resource_id"), [current_user_id, resource_id])
     return curs.fetchall()
 
 
+def _list_comments_for_targets(conn, target_col, target_ids, current_user_id):
+    """
+    Fetch comments for many events or resources with one IN (...) query
+    and group them by target id. Every requested id gets a (possibly
+    empty) list. target_col is a fixed column name, never user input.
+    """
+    grouped = {target_id: [] for target_id in target_ids}
+    if not grouped:
+        return grouped
+
+    curs = instrument.dict_cursor(conn)
+    curs.execute(comments_sql(target_col, len(grouped)), [current_user_id, *grouped])
+    for row in curs.fetchall():
+        grouped[row.pop("target_id")].append(row)
+    return grouped
+
+
+@routing.read_only
+def list_comments_for_events(conn, event_ids, current_user_id):
+    """
+    Return comments for several events at once.
+
+    Args:
+        conn: Database connection
+        event_ids (list): Events to fetch comments for
+        current_user_id (int): The logged-in user (for ownership flags)
+
+    Returns:
+        dict: event_id -> list of comment dicts (same keys as
+              list_comments_for_event)
+    """
+    return _list_comments_for_targets(conn, "event_id", event_ids, current_user_id)
+
+
+@routing.read_only
+def list_comments_for_resources(conn, resource_ids, current_user_id):
+    """
+    Return comments for several resources at once.
+
+    Args:
+        conn: Database connection
+        resource_ids (list): Resources to fetch comments for
+        current_user_id (int): The logged-in user (for ownership flags)
+
+    Returns:
+        dict: resource_id -> list of comment dicts (same keys as
+              list_comments_for_resource)
+    """
+    return _list_comments_for_targets(conn, "resource_id", resource_ids, current_user_id)
+
+
 def get_comment_owner(conn, comment_id):
     """
     Return the user_id who created a comment (used for delete authorization).
@@ -115,7 +174,12 @@ def get_comment_owner(conn, comment_id):
         dict: Single row with 'created_by' field (int user_id)
               Returns None if the comment does not exist
     """
-    curs = dbi.dict_cursor(conn)
+    return cache.cached_row("comment_owner", comment_id,
+                            lambda: _load_comment_owner(conn, comment_id))
+
+
+def _load_comment_owner(conn, comment_id):
+    curs = instrument.dict_cursor(conn)
     curs.execute(
         "SELECT created_by FROM comments WHERE comment_id = %s",
         [comment_id]
@@ -124,15 +188,80 @@ def get_comment_owner(conn, comment_id):
 
 
 def delete_comment(conn, comment_id):
-    """Delete a comment by id."""
-    curs = dbi.cursor(conn)
+    """Delete a comment by id and uncount it on its event/resource."""
+    curs = instrument.cursor(conn)
+    curs.execute(
+        "SELECT event_id, resource_id FROM comments WHERE comment_id = %s FOR UPDATE",
+        [comment_id]
+    )
+    row = curs.fetchone()
+    if row is None:
+        conn.rollback()
+        return
+
     curs.execute("DELETE FROM comments WHERE comment_id = %s", [comment_id])
+    _adjust_comment_count(curs, row[0], row[1], -1)
+    conn.commit()
+    cache.invalidate_item("comment", comment_id)
+    invalidate_target(row[0], row[1])
+
+
+def comment_count_sql(event_id, resource_id):
+    """
+    UPDATE adding a delta to comment_count on a comment's target, with
+    its params after the delta, or (None, None) if it has no target.
+    """
+    if event_id:
+        table, id_col, item_id = "events", "event_id", event_id
+    elif resource_id:
+        table, id_col, item_id = "resources", "resource_id", resource_id
+    else:
+        return None, None
+    sql = f"UPDATE {table} SET comment_count = comment_count + %s WHERE {id_col} = %s"
+    return sql, [item_id]
+
+
+def _adjust_comment_count(curs, event_id, resource_id, delta):
+    """Add delta to comment_count on the comment's target."""
+    sql, params = comment_count_sql(event_id, resource_id)
+    if sql is not None:
+        curs.execute(sql, [delta, *params])
+
+
+def invalidate_target(event_id, resource_id):
+    """Drop the cached row of a comment's event/resource (its comment_count moved)."""
+    if event_id:
+        cache.invalidate_item("event", event_id)
+    elif resource_id:
+        cache.invalidate_item("resource", resource_id)
+
+
+def reconcile_comment_counts(conn):
+    """
+    Recompute comment_count on every event and resource from the comments
+    table. Returns the number of item rows whose counter changed.
+    """
+    curs = instrument.cursor(conn)
+    changed = 0
+    for table, id_col in [("events", "event_id"), ("resources", "resource_id")]:
+        curs.execute(f"""
+            UPDATE {table} t
+            LEFT JOIN (
+                SELECT {id_col}, COUNT(*) AS n
+                FROM comments
+                WHERE {id_col} IS NOT NULL
+                GROUP BY {id_col}
+            ) c ON c.{id_col} = t.{id_col}
+            SET t.comment_count = COALESCE(c.n, 0)
+        """)
+        changed += curs.rowcount
     conn.commit()
+    return changed
 
 
 def update_comment(conn, comment_id, new_content):
     """Update a comment's content by id."""
-    curs = dbi.cursor(conn)
+    curs = instrument.cursor(conn)
     curs.execute(
         "UPDATE comments SET content=%s WHERE comment_id=%s",
         [new_content, comment_id]
@@ -1,5 +1,9 @@
 # db/event_db.py
-import cs304dbi as dbi
+import datetime
+import hashlib
+import json
+
+from db import cache, instrument, pagination, routing, search_db
 
 # Explicit list of event fields to avoid using SELECT *
 # Keeps queries clear and resilient to schema changes
@@ -20,41 +24,128 @@ EVENT_FIELDS = """
     postal_code,
     upvotes,
     downvotes,
+    comment_count,
+    rsvp_yes,
+    rsvp_maybe,
     status
 """
 
+# Calendar feed payloads keyed by (start, end) window. Cleared by every
+# event insert/update/delete in this process; the TTL bounds staleness
+# in other worker processes.
+calendar_cache = cache.LRUCache(maxsize=64, ttl=60.0)
+
+# Descriptions are cut to this many characters in the calendar feed
+CALENDAR_DESCRIPTION_LENGTH = 140
+
+# Values of rsvp.status, in schema order
+RSVP_STATUSES = ('yes', 'no', 'maybe')
+
+# list_events orders: name -> (column, newest/latest first)
+EVENT_SORTS = {
+    'created': ('created_at', True),
+    'date': ('date_of_event', False),
+}
+
+# Date windows of the events list (see event_window)
+EVENT_WINDOWS = ('upcoming', 'week', 'range', 'all')
+
 
-def list_events(conn, q="", category=""):
+@routing.read_only
+def list_events(conn, q="", category="", after=None, before=None,
+                limit=pagination.DEFAULT_PAGE_SIZE, start=None, end=None,
+                sort='created'):
     """
-    Return a list of events, optionally filtered by
-    a search query and/or category.
+    Return one page of events, optionally filtered by a search query,
+    category and/or date_of_event window (start inclusive, end exclusive;
+    see event_window).
+
+    sort is a key of EVENT_SORTS: 'created' (newest first) or 'date'
+    (soonest first, events without a date before the rest). Pages are
+    keyset-paginated on (sort column, event_id): pass the
+    next_cursor/prev_cursor of the current page as after/before.
+    Returns a page dict (see db/pagination.py).
     """
-    curs = dbi.dict_cursor(conn)
+    sort_col, descending = EVENT_SORTS[sort]
+    curs = instrument.dict_cursor(conn)
 
-    # Base query; WHERE 1=1 allows conditional filters to be appended cleanly
+    # Base query; removed events wait for purge_db and are never listed
     sql = f"""
         SELECT {EVENT_FIELDS}
         FROM events
-        WHERE 1=1
+        WHERE NOT (status <=> 'removed')
     """
     params = []
 
-    # Apply text search filter if provided
+    # Apply full-text search filter if provided (FULLTEXT index, prefix match)
     if q:
-        sql += " AND (title LIKE %s OR description LIKE %s)"
-        like = f"%{q}%"
-        params.extend([like, like])
+        match_sql, match_params = search_db.match_clause(search_db.EVENT_TEXT_COLUMNS, q)
+        sql += match_sql
+        params.extend(match_params)
 
     # Apply category filter if provided
     if category:
         sql += " AND category = %s"
         params.append(category)
 
-    # Show most recently created events first
-    sql += " ORDER BY created_at DESC"
+    # Date window (idx_events_date_of_event / idx_events_category_date)
+    if start is not None:
+        sql += " AND date_of_event >= %s"
+        params.append(start)
+    if end is not None:
+        sql += " AND date_of_event < %s"
+        params.append(end)
+
+    # Seek past the cursor in the chosen order
+    after = pagination.decode_cursor(after)
+    before = pagination.decode_cursor(before)
+    seek_sql, seek_params, order_sql = pagination.keyset_clause(
+        sort_col, "event_id", after=after, before=before,
+        descending=descending, nullable=sort_col == "date_of_event"
+    )
+    sql += seek_sql + order_sql + " LIMIT %s"
+    params.extend(seek_params)
+    params.append(limit + 1)
 
     curs.execute(sql, params)
-    return curs.fetchall()
+    return pagination.build_page(
+        curs.fetchall(), limit, sort_col, "event_id", after=after, before=before
+    )
+
+
+def event_window(when, start=None, end=None, today=None):
+    """
+    The (start, end) date_of_event bounds list_events takes for a window
+    of the events list, as datetimes (start inclusive, end exclusive):
+      - upcoming: from the start of today on
+      - week: this Monday through Sunday
+      - range: the dates start through end (either may be None)
+      - all: unbounded
+
+    Args:
+        when (str): One of EVENT_WINDOWS
+        start, end (datetime.date): Inclusive dates, for 'range'
+        today (datetime.date): Defaults to the current date
+
+    Raises:
+        ValueError: If when is not in EVENT_WINDOWS
+    """
+    today = today or datetime.date.today()
+    midnight = datetime.time()
+    if when == 'upcoming':
+        return datetime.datetime.combine(today, midnight), None
+    if when == 'week':
+        monday = today - datetime.timedelta(days=today.weekday())
+        start = datetime.datetime.combine(monday, midnight)
+        return start, start + datetime.timedelta(days=7)
+    if when == 'range':
+        return (
+            datetime.datetime.combine(start, midnight) if start else None,
+            datetime.datetime.combine(end + datetime.timedelta(days=1), midnight) if end else None,
+        )
+    if when == 'all':
+        return None, None
+    raise ValueError(f"unknown event window: {when!r}")
 
 
 def insert_event(conn, title, date_of_event, category, created_by, created_at,
@@ -62,7 +153,7 @@ def insert_event(conn, title, date_of_event, category, created_by, created_at,
     """
     Insert a new event into the database and return its event_id.
     """
-    curs = dbi.cursor(conn)
+    curs = instrument.cursor(conn)
 
     curs.execute("""
         INSERT INTO events (
@@ -80,35 +171,80 @@ def insert_event(conn, title, date_of_event, category, created_by, created_at,
     ])
 
     conn.commit()
+    calendar_cache.clear()
 
     # Retrieve the auto-generated event_id
     curs.execute("SELECT LAST_INSERT_ID()")
-    return curs.fetchone()[0]
+    event_id = curs.fetchone()[0]
+    cache.invalidate_item("event", event_id)
+    return event_id
 
 
-def get_event_by_id(conn, event_id):
+def get_event_by_id(conn, event_id, include_archived=False):
     """
-    Return a single event row by event_id, or None if not found.
+    Return a single event row by event_id, or None if not found
+    (or removed). Served from cache.entity_cache when possible.
+
+    With include_archived, an event moved to events_archive
+    (db/archive_db.py) is returned too, with its archived_at set;
+    live rows have no archived_at key.
     """
-    curs = dbi.dict_cursor(conn)
+    event = cache.cached_row("event", event_id, lambda: _load_event(conn, event_id))
+    if event is None and include_archived:
+        event = cache.cached_row("event_archived", event_id,
+                                 lambda: _load_archived_event(conn, event_id))
+    return event
+
+
+@routing.read_only
+def _load_event(conn, event_id):
+    curs = instrument.dict_cursor(conn)
     curs.execute(f"""
         SELECT {EVENT_FIELDS}
         FROM events
-        WHERE event_id = %s
+        WHERE event_id = %s AND NOT (status <=> 'removed')
+    """, [event_id])
+    return curs.fetchone()
+
+
+@routing.read_only
+def _load_archived_event(conn, event_id):
+    curs = instrument.dict_cursor(conn)
+    curs.execute(f"""
+        SELECT {EVENT_FIELDS}, archived_at
+        FROM events_archive
+        WHERE event_id = %s AND NOT (status <=> 'removed')
     """, [event_id])
     return curs.fetchone()
 
 
+def event_exists(conn, event_id):
+    """
+    True if the event exists. Reads only the primary key, unlike
+    get_event_by_id which fetches the whole row (description included).
+    """
+    curs = instrument.cursor(conn)
+    curs.execute(
+        "SELECT 1 FROM events WHERE event_id = %s AND NOT (status <=> 'removed')",
+        [event_id]
+    )
+    return curs.fetchone() is not None
+
+
 def get_event_owner(conn, event_id):
     """
     Return the creator (created_by) of an event.
-    Used for ownership/permission checks.
+    Used for ownership/permission checks (cached like get_event_by_id).
     """
-    curs = dbi.dict_cursor(conn)
+    return cache.cached_row("event_owner", event_id, lambda: _load_event_owner(conn, event_id))
+
+
+def _load_event_owner(conn, event_id):
+    curs = instrument.dict_cursor(conn)
     curs.execute("""
         SELECT created_by
         FROM events
-        WHERE event_id = %s
+        WHERE event_id = %s AND NOT (status <=> 'removed')
     """, [event_id])
     return curs.fetchone()
 
@@ -118,7 +254,7 @@ def update_event(conn, event_id, title, date_of_event, category, description, co
     """
     Update editable fields for an existing event.
     """
-    curs = dbi.cursor(conn)
+    curs = instrument.cursor(conn)
     curs.execute("""
         UPDATE events
         SET
@@ -138,47 +274,67 @@ def update_event(conn, event_id, title, date_of_event, category, description, co
         address1, address2, city, state, postal_code, event_id
     ])
     conn.commit()
+    cache.invalidate_item("event", event_id)
+    calendar_cache.clear()
 
 
-def delete_event_and_rsvps(conn, event_id):
+def set_event_image(conn, event_id, image_filename):
     """
-    Delete an event and all associated dependent rows
-    (comments and RSVPs).
-    """
-    curs = dbi.cursor(conn)
+    Record the uploaded image for an event.
 
-    # 1. delete comments FIRST (FK dependency)
-    curs.execute(
-        "DELETE FROM comments WHERE event_id=%s",
-        [event_id]
-    )
+    Returns the row as it was before ({"image_filename": ...}), read under
+    a row lock on the primary rather than from the entity cache, or None
+    if the event is gone or removed (nothing is changed).
+    """
+    curs = instrument.dict_cursor(conn)
+    curs.execute("""
+        SELECT image_filename
+        FROM events
+        WHERE event_id = %s AND NOT (status <=> 'removed')
+        FOR UPDATE
+    """, [event_id])
+    before = curs.fetchone()
+    if before is None:
+        conn.rollback()
+        return None
 
-    # 2. delete RSVPs
-    curs.execute(
-        "DELETE FROM rsvp WHERE event_id=%s",
-        [event_id]
-    )
+    curs.execute("""
+        UPDATE events
+        SET image_filename=%s
+        WHERE event_id=%s
+    """, [image_filename, event_id])
+    conn.commit()
+    cache.invalidate_item("event", event_id)
+    return before
 
-    # 3. delete the event LAST
-    curs.execute(
-        "DELETE FROM events WHERE event_id=%s",
-        [event_id]
-    )
 
-    conn.commit()
+def event_image_in_use(conn, event_id, image_filename):
+    """
+    True if the event (live or archived) currently shows image_filename.
+    Reads the primary, never the cache.
+    """
+    curs = instrument.cursor(conn)
+    curs.execute("""
+        SELECT 1 FROM events WHERE event_id = %s AND image_filename = %s
+        UNION ALL
+        SELECT 1 FROM events_archive WHERE event_id = %s AND image_filename = %s
+    """, [event_id, image_filename, event_id, image_filename])
+    return curs.fetchone() is not None
 
 
-def list_rsvps_yes_maybe(conn, event_id):
+def list_rsvps_yes_maybe(conn, event_id, archived=False):
     """
     Return YES and MAYBE RSVPs for an event,
     ordered by status and submission time.
+    Pass archived=True for an archived event (reads rsvp_archive).
     """
-    curs = dbi.dict_cursor(conn)
-    curs.execute("""
+    table = "rsvp_archive" if archived else "rsvp"
+    curs = instrument.dict_cursor(conn)
+    curs.execute(f"""
         SELECT rsvp.status,
                rsvp.created_at,
                users.full_name AS name
-        FROM rsvp
+        FROM {table} AS rsvp
         JOIN users ON rsvp.created_by = users.user_id
         WHERE rsvp.event_id = %s
           AND rsvp.status IN ('yes', 'maybe')
@@ -199,7 +355,7 @@ def get_user_rsvp(conn, event_id, user_id):
     """
     Return the current user's RSVP status for an event, if it exists.
     """
-    curs = dbi.dict_cursor(conn)
+    curs = instrument.dict_cursor(conn)
     curs.execute("""
         SELECT status
         FROM rsvp
@@ -208,53 +364,193 @@ def get_user_rsvp(conn, event_id, user_id):
     return curs.fetchone()
 
 
-def get_existing_rsvp(conn, event_id, user_id):
+def upsert_rsvp(conn, event_id, user_id, status, created_at):
     """
-    Check whether an RSVP already exists for a user and event.
-    Used to decide between INSERT vs UPDATE.
+    Create or change a user's RSVP for an event in one statement
+    (relies on UNIQUE(event_id, created_by)), then move the event's
+    rsvp_yes/rsvp_maybe counters in the same transaction.
+
+    The previous status comes back through LAST_INSERT_ID(expr): the
+    first SET assignment stores its position in RSVP_STATUSES before
+    status is overwritten (MySQL applies SET assignments left to right).
     """
-    curs = dbi.dict_cursor(conn)
-    curs.execute("""
-        SELECT event_id, created_by, status, created_at
-        FROM rsvp
-        WHERE event_id=%s AND created_by=%s
-    """, [event_id, user_id])
-    return curs.fetchone()
+    curs = instrument.cursor(conn)
+    try:
+        # rowcount: 1 = new RSVP, 2 = existing RSVP changed, 0 = identical
+        curs.execute("""
+            INSERT INTO rsvp (event_id, created_by, status, created_at)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                created_at = IF(LAST_INSERT_ID(FIELD(status, 'yes', 'no', 'maybe')) >= 0,
+                                VALUES(created_at), VALUES(created_at)),
+                status = VALUES(status)
+        """, [event_id, user_id, status, created_at])
+
+        if curs.rowcount == 1:
+            _adjust_rsvp_counts(curs, event_id, None, status)
+        elif curs.rowcount == 2:
+            old_status = _status_at(curs.lastrowid)
+            _adjust_rsvp_counts(curs, event_id, old_status, status)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    cache.invalidate_item("event", event_id)
+
+
+def upsert_rsvps(conn, event_id, rsvps, created_at):
+    """
+    Create or change many users' RSVPs for one event in one transaction.
 
+    Args:
+        conn: Database connection
+        event_id (int): The event
+        rsvps (list): (user_id, status) pairs, one per user
+        created_at (datetime): Timestamp recorded on every row
 
-def update_rsvp(conn, event_id, user_id, status, created_at):
+    Returns:
+        dict: The event's new rsvp_yes and rsvp_maybe counts
     """
-    Update an existing RSVP for a user and event.
+    curs = instrument.cursor(conn)
+    try:
+        curs.executemany("""
+            INSERT INTO rsvp (event_id, created_by, status, created_at)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                status = VALUES(status),
+                created_at = VALUES(created_at)
+        """, [[event_id, user_id, status, created_at] for user_id, status in rsvps])
+
+        # Per-row old statuses aren't available from a multi-row upsert,
+        # so recount this one event (a range scan of uq_rsvp_event_user)
+        curs.execute("""
+            UPDATE events
+            SET rsvp_yes = (SELECT COUNT(*) FROM rsvp
+                            WHERE event_id = %s AND status = 'yes'),
+                rsvp_maybe = (SELECT COUNT(*) FROM rsvp
+                              WHERE event_id = %s AND status = 'maybe')
+            WHERE event_id = %s
+        """, [event_id, event_id, event_id])
+
+        curs.execute(
+            "SELECT rsvp_yes, rsvp_maybe FROM events WHERE event_id = %s",
+            [event_id]
+        )
+        rsvp_yes, rsvp_maybe = curs.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    cache.invalidate_item("event", event_id)
+    return {"rsvp_yes": rsvp_yes, "rsvp_maybe": rsvp_maybe}
+
+
+def _status_at(position):
+    """Inverse of FIELD(status, 'yes', 'no', 'maybe'); 0 means NULL."""
+    if 1 <= position <= len(RSVP_STATUSES):
+        return RSVP_STATUSES[position - 1]
+    return None
+
+
+def _adjust_rsvp_counts(curs, event_id, old_status, new_status):
+    """Move one RSVP from old_status to new_status in the event's counters."""
+    yes = (new_status == 'yes') - (old_status == 'yes')
+    maybe = (new_status == 'maybe') - (old_status == 'maybe')
+    if yes or maybe:
+        curs.execute("""
+            UPDATE events
+            SET rsvp_yes = rsvp_yes + %s,
+                rsvp_maybe = rsvp_maybe + %s
+            WHERE event_id=%s
+        """, [yes, maybe, event_id])
+
+
+def reconcile_rsvp_counts(conn):
     """
-    curs = dbi.cursor(conn)
+    Recompute rsvp_yes/rsvp_maybe for every event from the rsvp table.
+    Returns the number of event rows whose counters changed.
+    """
+    curs = instrument.cursor(conn)
     curs.execute("""
-        UPDATE rsvp
-        SET status=%s, created_at=%s
-        WHERE event_id=%s AND created_by=%s
-    """, [status, created_at, event_id, user_id])
+        UPDATE events e
+        LEFT JOIN (
+            SELECT event_id,
+                   SUM(status = 'yes') AS yes,
+                   SUM(status = 'maybe') AS maybe
+            FROM rsvp
+            GROUP BY event_id
+        ) r ON r.event_id = e.event_id
+        SET e.rsvp_yes = COALESCE(r.yes, 0),
+            e.rsvp_maybe = COALESCE(r.maybe, 0)
+    """)
     conn.commit()
+    return curs.rowcount
 
 
-def insert_rsvp(conn, event_id, user_id, status, created_at):
+def parse_calendar_bound(value):
     """
-    Insert a new RSVP for a user and event.
+    Parse a FullCalendar start/end parameter (ISO 8601, with or without
+    time and UTC offset) into a naive datetime. Returns None if absent.
+    Raises ValueError if malformed.
     """
-    curs = dbi.cursor(conn)
-    curs.execute("""
-        INSERT INTO rsvp(event_id, created_by, status, created_at)
-        VALUES (%s, %s, %s, %s)
-    """, [event_id, user_id, status, created_at])
-    conn.commit()
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed.replace(tzinfo=None)
 
 
-def list_events_for_calendar(conn):
+def calendar_sql(start=None, end=None):
     """
-    Return lightweight event data for the calendar view.
+    The calendar feed SELECT for a window and its params. Shared by
+    list_events_for_calendar and async_db.
     """
-    curs = dbi.dict_cursor(conn)
-    curs.execute("""
-        SELECT event_id, title, date_of_event, description
+    sql = f"""
+        SELECT event_id, title, date_of_event,
+               LEFT(description, {CALENDAR_DESCRIPTION_LENGTH}) AS description
         FROM events
-        ORDER BY date_of_event ASC
-    """)
+        WHERE NOT (status <=> 'removed')
+    """
+    params = []
+
+    # Range seek on idx_events_date_of_event
+    if start is not None:
+        sql += " AND date_of_event >= %s"
+        params.append(start)
+    if end is not None:
+        sql += " AND date_of_event < %s"
+        params.append(end)
+
+    sql += " ORDER BY date_of_event ASC"
+    return sql, params
+
+
+def calendar_feed(records):
+    """
+    Serialize calendar rows for FullCalendar.
+
+    Returns:
+        tuple: (JSON body, ETag for the body), as stored in calendar_cache
+    """
+    body = json.dumps([
+        {
+            "id": r["event_id"],
+            "title": r["title"],
+            "start": r["date_of_event"].isoformat() if r["date_of_event"] else None,
+            "description": r["description"]
+        }
+        for r in records
+    ])
+    return body, hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+@routing.read_only
+def list_events_for_calendar(conn, start=None, end=None):
+    """
+    Return lightweight event data for the calendar view.
+    Only events with start <= date_of_event < end are returned when a
+    window is given (FullCalendar's visible range), and descriptions are
+    truncated to CALENDAR_DESCRIPTION_LENGTH characters.
+    """
+    curs = instrument.dict_cursor(conn)
+    curs.execute(*calendar_sql(start, end))
     return curs.fetchall()
@@ -0,0 +1,169 @@
+"""
+instrument - SQL Instrumentation
+
+Drop-in replacements for dbi.cursor / dbi.dict_cursor that time every
+statement. The db modules get their cursors from here, so all SQL issued
+through the db package is measured (and routed, see db/routing.py):
+  - cursor / dict_cursor: Instrumented cursors (same API as the dbi ones)
+  - start_request / finish_request: Per-request statistics (see conn_utils)
+  - statement_shape: Normalized SQL used to spot N+1 query patterns
+
+Statements slower than SLOW_QUERY_SECONDS are written to the
+"campus_connect.sql" logger as one JSON object per line, and every
+statement is passed to the functions in statement_hooks (see metrics.py).
+"""
+
+import contextvars
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+import cs304dbi as dbi
+
+from db import routing
+
+slow_log = logging.getLogger("campus_connect.sql")
+
+# Tunables (conn_utils.init_app copies these from app.config)
+SLOW_QUERY_SECONDS = 0.2
+N_PLUS_ONE_THRESHOLD = 5
+
+# Called as hook(shape, seconds) after every statement
+statement_hooks = []
+
+_current = contextvars.ContextVar("sql_request_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"IN \((?:%s,\s*)*%s\)", re.IGNORECASE)
+
+
+def statement_shape(sql):
+    """Collapse whitespace and IN (%s, %s, ...) lists so similar statements compare equal."""
+    shape = _WHITESPACE.sub(" ", sql).strip()
+    return _IN_LIST.sub("IN (...)", shape)
+
+
+class RequestStats:
+    """Statement count, rows returned and wall time for one request."""
+
+    def __init__(self, label=""):
+        self.label = label
+        self.statements = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, shape, seconds):
+        self.statements += 1
+        self.seconds += seconds
+        self.shapes[shape] += 1
+
+    def repeated_shapes(self, threshold=None):
+        """Statement shapes run at least threshold times (likely N+1 loops)."""
+        threshold = threshold or N_PLUS_ONE_THRESHOLD
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+    def summary(self):
+        """Compact one-line summary, used for the debug response header."""
+        return (
+            f"statements={self.statements}; rows={self.rows}; "
+            f"time_ms={self.seconds * 1000:.1f}; "
+            f"repeated={len(self.repeated_shapes())}"
+        )
+
+
+def start_request(label=""):
+    """Begin collecting statistics for the current request/context."""
+    stats = RequestStats(label)
+    _current.set(stats)
+    return stats
+
+
+def finish_request():
+    """Stop collecting and return the RequestStats (or None)."""
+    stats = _current.get()
+    _current.set(None)
+    return stats
+
+
+def current_stats():
+    """Return the RequestStats being collected, or None."""
+    return _current.get()
+
+
+class InstrumentedCursor:
+    """Wraps a DB-API cursor; everything not overridden is delegated."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, args)
+        finally:
+            self._record(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, args)
+        finally:
+            self._record(sql, time.perf_counter() - started)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._count_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count_rows(len(rows))
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    @staticmethod
+    def _count_rows(n):
+        stats = _current.get()
+        if stats is not None:
+            stats.rows += n
+
+    def _record(self, sql, seconds):
+        shape = statement_shape(sql)
+        stats = _current.get()
+        if stats is not None:
+            stats.record(shape, seconds)
+        for hook in statement_hooks:
+            hook(shape, seconds)
+
+        if seconds >= SLOW_QUERY_SECONDS:
+            slow_log.warning(json.dumps({
+                "event": "slow_query",
+                "seconds": round(seconds, 4),
+                "statement": shape,
+                "rowcount": getattr(self._cursor, "rowcount", None),
+                "request": stats.label if stats is not None else None,
+            }))
+
+
+def cursor(conn):
+    """Instrumented equivalent of dbi.cursor(conn)."""
+    return InstrumentedCursor(dbi.cursor(routing.resolve(conn)))
+
+
+def dict_cursor(conn):
+    """Instrumented equivalent of dbi.dict_cursor(conn)."""
+    return InstrumentedCursor(dbi.dict_cursor(routing.resolve(conn)))
@@ -0,0 +1,176 @@
+"""
+job_db - Background Job Queue Database Layer
+
+Persistent queue for work that should not run inside a web request
+(image processing, moderation cascades). Workers live in worker.py.
+  - enqueue: Add a job (committed with the caller's transaction if commit=False),
+    optionally delayed
+  - enqueue_params: ENQUEUE_SQL's params, for callers running it themselves
+    (async_db)
+  - claim_next: Atomically take the oldest runnable job
+  - mark_done / mark_failed: Record the outcome (failed jobs retry with backoff)
+  - requeue_stale: Recover jobs left 'running' by a crashed worker
+  - get_job: Job status for the status endpoint
+
+Payloads are stored as JSON text.
+"""
+
+import json
+
+from db import instrument
+
+JOB_FIELDS = """
+    job_id,
+    kind,
+    payload,
+    status,
+    attempts,
+    max_attempts,
+    last_error,
+    created_by,
+    run_after,
+    created_at,
+    updated_at
+"""
+
+
+# Attempts before a job is marked failed, unless enqueue() is told otherwise
+DEFAULT_MAX_ATTEMPTS = 5
+
+ENQUEUE_SQL = """
+    INSERT INTO jobs
+        (kind, payload, status, max_attempts, created_by,
+         run_after, created_at, updated_at)
+    VALUES
+        (%s, %s, 'queued', %s, %s, NOW() + INTERVAL %s SECOND, NOW(), NOW())
+"""
+
+
+def enqueue_params(kind, payload, created_by=None, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                   delay=0):
+    """ENQUEUE_SQL's params for a job (arguments as for enqueue)."""
+    return [kind, json.dumps(payload), max_attempts, created_by, int(delay)]
+
+
+def enqueue(conn, kind, payload, created_by=None, max_attempts=DEFAULT_MAX_ATTEMPTS,
+            commit=True, delay=0):
+    """
+    Add a job to the queue and return its job_id.
+
+    Args:
+        conn: Database connection
+        kind (str): Task name registered in worker.py
+        payload (dict): JSON-serializable task arguments
+        created_by (int, optional): User who caused the job (for status checks)
+        max_attempts (int): Attempts before the job is marked failed
+        commit (bool): Pass False to enqueue inside the caller's transaction
+        delay (int): Seconds before the job may run
+    """
+    curs = instrument.cursor(conn)
+    curs.execute(ENQUEUE_SQL, enqueue_params(kind, payload, created_by=created_by,
+                                             max_attempts=max_attempts, delay=delay))
+    job_id = curs.lastrowid
+    if commit:
+        conn.commit()
+    return job_id
+
+
+def claim_next(conn):
+    """
+    Take the oldest runnable job and mark it running.
+    SKIP LOCKED lets several workers poll without blocking each other.
+    Returns the job dict (payload decoded) or None if the queue is empty.
+    """
+    curs = instrument.dict_cursor(conn)
+    try:
+        curs.execute(f"""
+            SELECT {JOB_FIELDS}
+            FROM jobs
+            WHERE status = 'queued' AND run_after <= NOW()
+            ORDER BY run_after, job_id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """)
+        job = curs.fetchone()
+        if job is None:
+            conn.rollback()
+            return None
+
+        curs.execute("""
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, updated_at = NOW()
+            WHERE job_id = %s
+        """, [job["job_id"]])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    job["attempts"] += 1
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def mark_done(conn, job_id):
+    """Record that a job finished successfully."""
+    curs = instrument.cursor(conn)
+    curs.execute("""
+        UPDATE jobs
+        SET status = 'done', last_error = NULL, updated_at = NOW()
+        WHERE job_id = %s
+    """, [job_id])
+    conn.commit()
+
+
+def mark_failed(conn, job_id, error, retry_in=None):
+    """
+    Record a failed attempt. With retry_in (seconds) the job is queued
+    again after that delay; without it (or once max_attempts is reached)
+    it is marked failed for good.
+    """
+    curs = instrument.cursor(conn)
+    if retry_in is not None:
+        curs.execute("""
+            UPDATE jobs
+            SET status = IF(attempts < max_attempts, 'queued', 'failed'),
+                run_after = NOW() + INTERVAL %s SECOND,
+                last_error = %s,
+                updated_at = NOW()
+            WHERE job_id = %s
+        """, [int(retry_in), error, job_id])
+    else:
+        curs.execute("""
+            UPDATE jobs
+            SET status = 'failed', last_error = %s, updated_at = NOW()
+            WHERE job_id = %s
+        """, [error, job_id])
+    conn.commit()
+
+
+def requeue_stale(conn, older_than_seconds):
+    """
+    Put jobs stuck in 'running' (their worker died) back in the queue.
+    Returns the number of jobs requeued.
+    """
+    curs = instrument.cursor(conn)
+    curs.execute("""
+        UPDATE jobs
+        SET status = IF(attempts < max_attempts, 'queued', 'failed'),
+            last_error = 'worker lost',
+            updated_at = NOW()
+        WHERE status = 'running'
+          AND updated_at < NOW() - INTERVAL %s SECOND
+    """, [int(older_than_seconds)])
+    conn.commit()
+    return curs.rowcount
+
+
+def get_job(conn, job_id):
+    """Return a job row (payload still JSON text), or None."""
+    curs = instrument.dict_cursor(conn)
+    curs.execute(f"""
+        SELECT {JOB_FIELDS}
+        FROM jobs
+        WHERE job_id = %s
+    """, [job_id])
+    return curs.fetchone()
@@ -4,12 +4,14 @@ login_db - User Authentication Database Layer
 Provides database operations for user management and authentication:
   - insert_user: Create new user account with hashed password
   - get_login_row_by_email: Retrieve user for authentication
+  - update_password_hash: Replace a hash (re-hash at a new bcrypt cost)
+  - missing_user_ids: Find which of a list of user ids don't exist
 
 Note: Passwords are always stored as bcrypt hashes (never plaintext).
 All queries use parameterized statements to prevent SQL injection.
 """
 
-import cs304dbi as dbi
+from db import instrument
 
 
 def insert_user(conn, full_name, email, password_hash, role):
@@ -29,7 +31,7 @@ def insert_user(conn, full_name, email, password_hash, role):
     Raises:
         Exception: If email already exists (duplicate entry error)
     """
-    curs = dbi.cursor(conn)
+    curs = instrument.cursor(conn)
 
     # Insert a new user record with a hashed password
     curs.execute("""
@@ -57,7 +59,7 @@ def get_login_row_by_email(conn, email):
         dict: User info with keys: user_id, password_hash, full_name
               Returns None if no user with that email exists
     """
-    curs = dbi.dict_cursor(conn)
+    curs = instrument.dict_cursor(conn)
 
     # Explicitly select only required fields (no SELECT *)
     curs.execute("""
@@ -67,3 +69,45 @@ def get_login_row_by_email(conn, email):
     """, [email])
 
     return curs.fetchone()
+
+
+def update_password_hash(conn, user_id, password_hash):
+    """
+    Store a new bcrypt hash for a user (e.g. after BCRYPT_ROUNDS changes).
+
+    Args:
+        conn: Database connection
+        user_id (int): The user's id
+        password_hash (str): New bcrypt hash
+    """
+    curs = instrument.cursor(conn)
+    curs.execute("""
+        UPDATE users
+        SET password_hash = %s
+        WHERE user_id = %s
+    """, [password_hash, user_id])
+    conn.commit()
+
+
+def missing_user_ids(conn, user_ids):
+    """
+    Return the ids in user_ids that have no users row (e.g. to validate
+    a bulk request before inserting rows that reference them).
+
+    Args:
+        conn: Database connection
+        user_ids (list): User ids to check
+
+    Returns:
+        list: The unknown ids, in the order given
+    """
+    if not user_ids:
+        return []
+    curs = instrument.cursor(conn)
+    placeholders = ", ".join(["%s"] * len(user_ids))
+    curs.execute(
+        f"SELECT user_id FROM users WHERE user_id IN ({placeholders})",
+        list(user_ids)
+    )
+    found = {row[0] for row in curs.fetchall()}
+    return [uid for uid in user_ids if uid not in found]
@@ -0,0 +1,118 @@
+"""
+pagination - Keyset (cursor) Pagination Helpers
+
+List pages are paged by seeking on (sort column, primary key) instead of
+OFFSET, so every page costs one index range scan no matter how deep it is:
+  - encode_cursor / decode_cursor: opaque, URL-safe page tokens
+  - keyset_clause: SQL condition and ORDER BY for the next/previous page
+  - build_page: trim the extra look-ahead row and compute neighbour cursors
+
+A page is returned as a dict with keys: items, next_cursor, prev_cursor.
+"""
+
+import base64
+import datetime
+
+DEFAULT_PAGE_SIZE = 20
+
+
+def encode_cursor(sort_value, item_id):
+    """Encode a (sort value, id) position as an opaque URL-safe token."""
+    if isinstance(sort_value, datetime.datetime):
+        value = sort_value.isoformat()
+    else:
+        value = "" if sort_value is None else str(sort_value)
+    raw = f"{value}|{item_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, parse=datetime.datetime.fromisoformat):
+    """
+    Decode a cursor token back to (sort value, id), converting the sort
+    value with parse (datetimes by default). A NULL sort value (encoded
+    as "") decodes to None.
+    Returns None for missing or malformed tokens so a bad link just
+    falls back to the first page.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        value, item_id = base64.urlsafe_b64decode(padded).decode("utf-8").rsplit("|", 1)
+        return (parse(value) if value else None), int(item_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_clause(sort_col, id_col, after=None, before=None, descending=True,
+                  nullable=False):
+    """
+    Build the seek condition and ORDER BY for one page.
+
+    Args:
+        sort_col (str): Column the list is ordered by (e.g. created_at)
+        id_col (str): Primary key used as the tie-breaker
+        after: Decoded cursor of the last row on the previous page
+        before: Decoded cursor of the first row on the following page
+        descending (bool): Natural order of the list
+        nullable (bool): sort_col may be NULL. MySQL sorts NULLs before
+                         every value, so seeking towards smaller values
+                         must also take the NULL rows
+
+    Returns:
+        tuple: (where_sql, params, order_sql). where_sql is "" on the first page.
+    """
+    # Walking backwards (prev page) flips the comparison and the scan order;
+    # build_page() reverses the rows again afterwards.
+    backwards = before is not None and after is None
+    position = before if backwards else after
+    scan_desc = descending != backwards
+
+    direction = "DESC" if scan_desc else "ASC"
+    order_sql = f" ORDER BY {sort_col} {direction}, {id_col} {direction}"
+
+    if position is None:
+        return "", [], order_sql
+
+    op = "<" if scan_desc else ">"
+    value, item_id = position
+    if value is None:
+        # Among the NULL rows only the id orders; every value sorts after them
+        where_sql = f" AND (({sort_col} IS NULL AND {id_col} {op} %s)"
+        where_sql += ")" if scan_desc else f" OR {sort_col} IS NOT NULL)"
+        return where_sql, [item_id], order_sql
+
+    where_sql = f" AND ({sort_col} {op} %s OR ({sort_col} = %s AND {id_col} {op} %s)"
+    where_sql += f" OR {sort_col} IS NULL)" if nullable and scan_desc else ")"
+    return where_sql, [value, value, item_id], order_sql
+
+
+def build_page(rows, limit, sort_key, id_key, after=None, before=None):
+    """
+    Turn the rows of a limit+1 query into a page dict.
+
+    The query fetches one extra row to learn whether another page exists
+    in the scan direction without a separate COUNT(*).
+    """
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    backwards = before is not None and after is None
+    if backwards:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(rows[-1][sort_key], rows[-1][id_key])
+    if rows and has_prev:
+        prev_cursor = encode_cursor(rows[0][sort_key], rows[0][id_key])
+
+    return {
+        "items": rows,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
@@ -0,0 +1,192 @@
+"""
+pool - Database Connection Pool
+
+Keeps a bounded set of open MySQL connections so request handlers can
+borrow one instead of paying a fresh TCP + auth handshake per request:
+  - ConnectionPool: thread-safe pool with a hard size limit
+  - PoolTimeout: raised when no connection frees up within the wait timeout
+
+Connections are health-checked (ping) when checked out and closed when they
+have sat idle longer than idle_timeout. Any transaction left open by the
+borrower is rolled back on return so the next request starts clean.
+"""
+
+import threading
+import time
+
+import cs304dbi as dbi
+
+
+class PoolTimeout(Exception):
+    """Raised when the pool is exhausted for longer than the wait timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of database connections.
+
+    Args:
+        max_size (int): Maximum number of connections open at once
+        wait_timeout (float): Seconds to wait for a free connection
+        idle_timeout (float): Seconds an unused connection may stay open
+        factory (callable): Opens a new connection (defaults to dbi.connect)
+    """
+
+    def __init__(self, max_size=10, wait_timeout=5.0, idle_timeout=300.0, factory=None):
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.idle_timeout = idle_timeout
+        self._factory = factory or dbi.connect
+
+        self._cond = threading.Condition()
+        self._idle = []          # list of (conn, returned_at), most recent last
+        self._open = 0           # connections currently open (idle + in use)
+        self._in_use = 0
+
+        # Monitoring counters
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._evicted = 0
+        self._failed_checks = 0
+
+    def acquire(self):
+        """
+        Borrow a connection, opening a new one if under max_size.
+        Blocks up to wait_timeout seconds, then raises PoolTimeout.
+        """
+        deadline = None
+        waited_since = None
+
+        with self._cond:
+            while True:
+                self._evict_idle_locked()
+
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    self._in_use += 1
+                    break
+
+                if self._open < self.max_size:
+                    # Reserve the slot now; the connection is opened outside the lock
+                    self._open += 1
+                    self._in_use += 1
+                    conn = None
+                    break
+
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    deadline = waited_since + self.wait_timeout
+                    self._waits += 1
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._wait_time += time.monotonic() - waited_since
+                    raise PoolTimeout(
+                        f"no database connection available after {self.wait_timeout}s"
+                    )
+                self._cond.wait(remaining)
+
+            if waited_since is not None:
+                self._wait_time += time.monotonic() - waited_since
+            self._checkouts += 1
+
+        if conn is None:
+            return self._open_new()
+
+        # Health check outside the lock; replace dead connections transparently
+        if not self._is_alive(conn):
+            with self._cond:
+                self._failed_checks += 1
+            self._close_quietly(conn)
+            return self._open_new()
+
+        return conn
+
+    def release(self, conn):
+        """Return a borrowed connection to the pool."""
+        try:
+            conn.rollback()
+        except Exception:
+            # Broken connection: drop it rather than hand it to someone else
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (in-use connections close on release)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Return a snapshot of pool usage counters for monitoring."""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total": round(self._wait_time, 6),
+                "timeouts": self._timeouts,
+                "evicted_idle": self._evicted,
+                "failed_health_checks": self._failed_checks,
+            }
+
+    def _open_new(self):
+        """Open a connection for a slot that has already been reserved."""
+        try:
+            return self._factory()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _discard(self, conn):
+        """Drop an in-use connection and free its slot."""
+        self._close_quietly(conn)
+        with self._cond:
+            self._open -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def _evict_idle_locked(self):
+        """Close connections idle past idle_timeout (caller holds the lock)."""
+        if not self._idle:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        fresh = [(c, t) for c, t in self._idle if t >= cutoff]
+        stale = [c for c, t in self._idle if t < cutoff]
+        if stale:
+            self._idle = fresh
+            self._open -= len(stale)
+            self._evicted += len(stale)
+            for conn in stale:
+                self._close_quietly(conn)
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,163 @@
+"""
+purge_db - Deferred Deletion of Events and Resources
+
+Deleting a popular item in one transaction (thousands of comments, RSVPs
+and votes) holds row locks for seconds. Deletion is split in two instead:
+  - remove_item / remove_items: Hide items at once (status='removed') and
+    queue a "delete_item" job for each, in the caller's transaction
+    (removal_statements is the SQL, shared with async_db)
+  - purge_item: Run by the job worker; deletes the item's votes, RSVPs
+    and comments a batch at a time, each batch its own short
+    transaction, then the item itself
+  - purge_orphan_votes: Clean up votes left behind by items deleted
+    before purging existed
+
+Removed items are filtered out of every list/get query in the db package.
+The comments and rsvp foreign keys are ON DELETE CASCADE, so the final
+item delete also catches rows added while the purge was running.
+"""
+
+from db import cache, event_db, instrument, job_db
+
+# item_type -> (table, id column)
+ITEM_TABLES = {
+    "event": ("events", "event_id"),
+    "resource": ("resources", "resource_id"),
+}
+
+# item_type -> dependent (table, column) pairs, deleted in this order
+DEPENDENTS = {
+    "event": [("rsvp", "event_id"), ("comments", "event_id")],
+    "resource": [("comments", "resource_id")],
+}
+
+PURGE_BATCH_SIZE = 1000
+
+
+def removal_statements(item_type, item_ids, created_by=None):
+    """
+    (sql, params) pairs that soft-delete items and queue their purge, to
+    run in one transaction; follow the commit with invalidate_removed().
+    """
+    table, id_col = ITEM_TABLES[item_type]
+    placeholders = ", ".join(["%s"] * len(item_ids))
+    statements = [(
+        f"UPDATE {table} SET status = 'removed' WHERE {id_col} IN ({placeholders})",
+        list(item_ids)
+    )]
+    for item_id in item_ids:
+        statements.append((job_db.ENQUEUE_SQL, job_db.enqueue_params(
+            "delete_item", {"item_type": item_type, "item_id": item_id},
+            created_by=created_by
+        )))
+    return statements
+
+
+def invalidate_removed(item_type, item_ids):
+    """Drop removed items from the caches (after their removal commits)."""
+    for item_id in item_ids:
+        cache.invalidate_item(item_type, item_id)
+    if item_type == "event":
+        event_db.calendar_cache.clear()
+
+
+def remove_items(conn, item_type, item_ids, created_by=None, commit=True):
+    """
+    Soft-delete items and queue their purge.
+
+    Args:
+        conn: Database connection
+        item_type (str): "event" or "resource"
+        item_ids (list): Items to remove
+        created_by (int, optional): User who asked (recorded on the jobs)
+        commit (bool): Commit here, or leave it to the caller's
+                       transaction; the caller then runs
+                       invalidate_removed() after its own commit
+    """
+    if not item_ids:
+        return
+
+    curs = instrument.cursor(conn)
+    for sql, params in removal_statements(item_type, item_ids, created_by=created_by):
+        curs.execute(sql, params)
+
+    if commit:
+        conn.commit()
+        invalidate_removed(item_type, item_ids)
+
+
+def remove_item(conn, item_type, item_id, created_by=None):
+    """Soft-delete one item, queue its purge and commit."""
+    remove_items(conn, item_type, [item_id], created_by=created_by)
+
+
+def purge_item(conn, item_type, item_id, batch_size=PURGE_BATCH_SIZE):
+    """
+    Hard-delete a removed item and everything that references it, at
+    most batch_size rows per statement and committing after each batch.
+    Items that are not marked removed are left alone.
+
+    Returns:
+        dict: Rows deleted per table, or None if the item wasn't removed
+    """
+    table, id_col = ITEM_TABLES[item_type]
+    curs = instrument.cursor(conn)
+
+    curs.execute(f"SELECT status FROM {table} WHERE {id_col} = %s", [item_id])
+    row = curs.fetchone()
+    if row is not None and row[0] != "removed":
+        return None
+
+    deleted = {}
+    deleted["votes"] = _delete_in_batches(
+        conn, "DELETE FROM votes WHERE item_type = %s AND item_id = %s LIMIT %s",
+        [item_type, item_id], batch_size
+    )
+    for dep_table, dep_col in DEPENDENTS[item_type]:
+        deleted[dep_table] = _delete_in_batches(
+            conn, f"DELETE FROM {dep_table} WHERE {dep_col} = %s LIMIT %s",
+            [item_id], batch_size
+        )
+
+    curs.execute(f"DELETE FROM {table} WHERE {id_col} = %s", [item_id])
+    deleted[table] = curs.rowcount
+    conn.commit()
+    return deleted
+
+
+def purge_orphan_votes(conn, batch_size=PURGE_BATCH_SIZE):
+    """
+    Delete votes whose event/resource no longer exists, in batches.
+    Returns the number of votes deleted.
+    """
+    curs = instrument.cursor(conn)
+    total = 0
+    for item_type, (table, id_col) in ITEM_TABLES.items():
+        while True:
+            curs.execute(f"""
+                SELECT v.vote_id
+                FROM votes v
+                LEFT JOIN {table} t ON t.{id_col} = v.item_id
+                WHERE v.item_type = %s AND t.{id_col} IS NULL
+                LIMIT %s
+            """, [item_type, batch_size])
+            vote_ids = [r[0] for r in curs.fetchall()]
+            if not vote_ids:
+                break
+            placeholders = ", ".join(["%s"] * len(vote_ids))
+            curs.execute(f"DELETE FROM votes WHERE vote_id IN ({placeholders})", vote_ids)
+            conn.commit()
+            total += len(vote_ids)
+    return total
+
+
+def _delete_in_batches(conn, sql, params, batch_size):
+    """Run a DELETE ... LIMIT repeatedly, one transaction per batch."""
+    curs = instrument.cursor(conn)
+    total = 0
+    while True:
+        curs.execute(sql, [*params, batch_size])
+        conn.commit()
+        total += curs.rowcount
+        if curs.rowcount < batch_size:
+            return total
@@ -1,5 +1,5 @@
 # db/resources_db.py
-import cs304dbi as dbi
+from db import cache, instrument, pagination, routing, search_db
 
 # Explicit list of resource fields to avoid SELECT *
 # Includes vote counts to match what templates expect
@@ -13,48 +13,64 @@ RESOURCE_FIELDS = """
     created_by,
     created_at,
     upvotes,
-    downvotes
+    downvotes,
+    comment_count
 """
 
 
-def list_resources(conn, q="", category=""):
+@routing.read_only
+def list_resources(conn, q="", category="", after=None, before=None,
+                   limit=pagination.DEFAULT_PAGE_SIZE):
     """
-    Return a list of resources, optionally filtered by
+    Return one page of resources, optionally filtered by
     a search query and/or category.
+
+    Pages are keyset-paginated on (created_at, resource_id): pass the
+    next_cursor/prev_cursor of the current page as after/before.
+    Returns a page dict (see db/pagination.py).
     """
-    curs = dbi.dict_cursor(conn)
+    curs = instrument.dict_cursor(conn)
 
-    # Base query; WHERE 1=1 allows optional filters to be appended
+    # Base query; removed resources wait for purge_db and are never listed
     sql = f"""
         SELECT {RESOURCE_FIELDS}
         FROM resources
-        WHERE 1=1
+        WHERE NOT (status <=> 'removed')
     """
     params = []
 
-    # Apply text search filter if provided
+    # Apply full-text search filter if provided (FULLTEXT index, prefix match)
     if q:
-        sql += " AND (title LIKE %s OR description LIKE %s OR category LIKE %s)"
-        like = f"%{q}%"
-        params.extend([like, like, like])
+        match_sql, match_params = search_db.match_clause(search_db.RESOURCE_TEXT_COLUMNS, q)
+        sql += match_sql
+        params.extend(match_params)
 
     # Apply category filter if provided
     if category:
         sql += " AND category = %s"
         params.append(category)
 
-    # Show most recently created resources first
-    sql += " ORDER BY created_at DESC"
+    # Seek past the cursor; most recently created resources first
+    after = pagination.decode_cursor(after)
+    before = pagination.decode_cursor(before)
+    seek_sql, seek_params, order_sql = pagination.keyset_clause(
+        "created_at", "resource_id", after=after, before=before
+    )
+    sql += seek_sql + order_sql + " LIMIT %s"
+    params.extend(seek_params)
+    params.append(limit + 1)
 
     curs.execute(sql, params)
-    return curs.fetchall()
+    return pagination.build_page(
+        curs.fetchall(), limit, "created_at", "resource_id", after=after, before=before
+    )
 
 
 def insert_resource(conn, title, category, description, contact_info, status, created_by):
     """
     Insert a new resource into the database and return its resource_id.
     """
-    curs = dbi.cursor(conn)
+    curs = instrument.cursor(conn)
 
     curs.execute("""
         INSERT INTO resources
@@ -67,18 +83,26 @@ def insert_resource(conn, title, category, description, contact_info, status, cr
 
     # Retrieve the auto-generated resource_id
     curs.execute("SELECT LAST_INSERT_ID()")
-    return curs.fetchone()[0]
+    resource_id = curs.fetchone()[0]
+    cache.invalidate_item("resource", resource_id)
+    return resource_id
 
 
 def get_resource_by_id(conn, resource_id):
     """
-    Return a single resource by resource_id, or None if not found.
+    Return a single resource by resource_id, or None if not found
+    (or removed). Served from cache.entity_cache when possible.
     """
-    curs = dbi.dict_cursor(conn)
+    return cache.cached_row("resource", resource_id, lambda: _load_resource(conn, resource_id))
+
+
+@routing.read_only
+def _load_resource(conn, resource_id):
+    curs = instrument.dict_cursor(conn)
     curs.execute(f"""
         SELECT {RESOURCE_FIELDS}
         FROM resources
-        WHERE resource_id = %s
+        WHERE resource_id = %s AND NOT (status <=> 'removed')
     """, [resource_id])
     return curs.fetchone()
 
@@ -86,13 +110,18 @@ def get_resource_by_id(conn, resource_id):
 def get_resource_owner(conn, resource_id):
     """
     Return the creator (created_by) of a resource.
-    Used for ownership and permission checks.
+    Used for ownership and permission checks (cached like get_resource_by_id).
     """
-    curs = dbi.dict_cursor(conn)
+    return cache.cached_row("resource_owner", resource_id,
+                            lambda: _load_resource_owner(conn, resource_id))
+
+
+def _load_resource_owner(conn, resource_id):
+    curs = instrument.dict_cursor(conn)
     curs.execute("""
         SELECT created_by
         FROM resources
-        WHERE resource_id = %s
+        WHERE resource_id = %s AND NOT (status <=> 'removed')
     """, [resource_id])
     return curs.fetchone()
 
@@ -101,7 +130,7 @@ def update_resource(conn, resource_id, title, category, description, contact_inf
     """
     Update editable fields for an existing resource.
     """
-    curs = dbi.cursor(conn)
+    curs = instrument.cursor(conn)
     curs.execute("""
         UPDATE resources
         SET title=%s,
@@ -113,15 +142,4 @@ def update_resource(conn, resource_id, title, category, description, contact_inf
     """, [title, category, description, contact_info, status, resource_id])
 
     conn.commit()
-
-
-def delete_resource(conn, resource_id):
-    """
-    Delete a resource by resource_id.
-    """
-    curs = dbi.cursor(conn)
-    curs.execute("""
-        DELETE FROM resources
-        WHERE resource_id=%s
-    """, [resource_id])
-    conn.commit()
+    cache.invalidate_item("resource", resource_id)
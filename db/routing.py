@@ -0,0 +1,214 @@
+"""
+routing - Read/Write Splitting
+
+Sends read-only db functions to a replica and everything else to the
+primary, without changing how routes call the db layer:
+  - read_only: Decorator marking a db function as safe to run on a replica
+  - RoutingConnection: What conn_utils.get_conn() hands out; borrows a
+    primary and/or replica connection lazily and picks one per cursor
+  - ReplicaMonitor: Tracks replica lag and takes the replica out of
+    rotation while it is too far behind
+  - ReplicaReads: Notes whether a block of code read from the replica,
+    so caches can refuse rows that may predate a recent write
+
+instrument.cursor / instrument.dict_cursor resolve a RoutingConnection to
+the right underlying connection. Once a request writes (or opens any
+non-read-only cursor) it stays on the primary, so it reads its own
+writes; conn_utils extends that to the user's next few requests.
+Plain connections (workers, scripts) are used as-is.
+"""
+
+import contextvars
+import functools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_read_only = contextvars.ContextVar("db_read_only", default=False)
+# The ReplicaReads blocks open in this context, outermost first
+_replica_reads = contextvars.ContextVar("db_replica_reads", default=())
+
+
+def read_only(fn):
+    """Mark a db function as read-only (its cursors may use the replica)."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _read_only.set(True)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+    return wrapper
+
+
+class ReplicaReads:
+    """
+    Context manager: .used turns True if any cursor opened inside the
+    block (or a block nested in it) was given the replica.
+    """
+
+    def __init__(self):
+        self.used = False
+        self._token = None
+
+    def __enter__(self):
+        self._token = _replica_reads.set(_replica_reads.get() + (self,))
+        return self
+
+    def __exit__(self, *exc):
+        _replica_reads.reset(self._token)
+
+
+def _note_replica_read():
+    for reads in _replica_reads.get():
+        reads.used = True
+
+
+def resolve(conn):
+    """The connection a new cursor on conn should use."""
+    if isinstance(conn, RoutingConnection):
+        return conn.for_cursor()
+    return conn
+
+
+def mysql_replica_lag(conn):
+    """
+    Seconds the replica is behind its source, or None if replication
+    isn't running. Needs the REPLICATION CLIENT privilege.
+    """
+    curs = conn.cursor()
+    try:
+        curs.execute("SHOW REPLICA STATUS")
+    except Exception:
+        # MySQL before 8.0.22
+        curs.execute("SHOW SLAVE STATUS")
+    row = curs.fetchone()
+    if row is None:
+        return None
+    status = dict(zip([d[0] for d in curs.description], row))
+    lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+
+class ReplicaMonitor:
+    """
+    Decides whether the replica may serve reads, re-checking its lag at
+    most every check_interval seconds.
+
+    Args:
+        pool: ConnectionPool for the replica
+        max_lag (float): Seconds of lag beyond which reads go to the primary
+        check_interval (float): Seconds between lag checks
+        lag_probe (callable): conn -> lag seconds or None (default: MySQL)
+    """
+
+    def __init__(self, pool, max_lag=2.0, check_interval=5.0, lag_probe=None):
+        self.pool = pool
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag_probe = lag_probe or mysql_replica_lag
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self.lag = None
+        self.healthy = False
+        self.fallbacks = 0
+
+    def usable(self):
+        """True if the replica is currently within max_lag."""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            # One thread re-checks; the others use the last known answer
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._check()
+                finally:
+                    self._lock.release()
+        if not self.healthy:
+            self.fallbacks += 1
+        return self.healthy
+
+    def _check(self):
+        try:
+            conn = self.pool.acquire()
+            try:
+                self.lag = self.lag_probe(conn)
+            finally:
+                self.pool.release(conn)
+        except Exception:
+            logger.warning("replica lag check failed", exc_info=True)
+            self.lag = None
+        self.healthy = self.lag is not None and self.lag <= self.max_lag
+        self._checked_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "healthy": self.healthy,
+            "fallbacks": self.fallbacks,
+        }
+
+
+class RoutingConnection:
+    """
+    A request's database handle: a primary connection and, for
+    read-only work, a replica connection, each borrowed on first use.
+
+    Args:
+        primary_pool: ConnectionPool for the primary
+        replica_monitor (ReplicaMonitor): None when there is no replica
+        use_replica (bool): False pins the whole request to the primary
+    """
+
+    def __init__(self, primary_pool, replica_monitor=None, use_replica=True):
+        self.primary_pool = primary_pool
+        self.replica_monitor = replica_monitor
+        self.use_replica = use_replica and replica_monitor is not None
+        self.wrote = False
+        self.read_replica = False
+        self._primary = None
+        self._replica = None
+
+    def for_cursor(self):
+        """Pick the connection for a cursor opened now."""
+        if _read_only.get() and self.use_replica:
+            if self._replica is None and self.replica_monitor.usable():
+                self._replica = self.replica_monitor.pool.acquire()
+            if self._replica is not None:
+                self.read_replica = True
+                _note_replica_read()
+                return self._replica
+        else:
+            # Anything not marked read-only may write: stay on the primary
+            # for the rest of the request so later reads see it
+            self.use_replica = False
+        return self.primary()
+
+    def primary(self):
+        if self._primary is None:
+            self._primary = self.primary_pool.acquire()
+        return self._primary
+
+    def commit(self):
+        if self._primary is not None:
+            self._primary.commit()
+            self.wrote = True
+
+    def rollback(self):
+        if self._primary is not None:
+            self._primary.rollback()
+
+    def release(self):
+        """Return whatever was borrowed to its pool."""
+        if self._primary is not None:
+            self.primary_pool.release(self._primary)
+            self._primary = None
+        if self._replica is not None:
+            self.replica_monitor.pool.release(self._replica)
+            self._replica = None
+
+    def __getattr__(self, name):
+        # Anything else (cursor(), ping(), ...) goes to the primary
+        return getattr(self.primary(), name)
@@ -0,0 +1,120 @@
+"""
+search_db - Full-Text Search Database Layer
+
+Replaces leading-wildcard LIKE scans with MySQL FULLTEXT indexes
+(see schema.sql) across events, resources and services:
+  - boolean_query: Turn free text into a prefix-matching BOOLEAN MODE query
+  - match_clause: Filter fragment used by the list_* functions
+  - search_all: Relevance-ranked search across all three tables in one query
+
+Every word the user types must appear (as a word or word prefix), so
+"tut math" matches "Tutoring for Mathematics".
+"""
+
+import re
+
+from db import instrument, routing
+
+# Columns covered by each table's FULLTEXT index (must match schema.sql)
+EVENT_TEXT_COLUMNS = "title, description"
+RESOURCE_TEXT_COLUMNS = "title, description, category"
+SERVICE_TEXT_COLUMNS = "service_name, description"
+
+# InnoDB ignores words shorter than innodb_ft_min_token_size (default 3),
+# so shorter words are kept optional instead of required.
+MIN_REQUIRED_LENGTH = 3
+
+SNIPPET_LENGTH = 200
+
+
+def boolean_query(q):
+    """
+    Build a BOOLEAN MODE search string from user input.
+    Operator characters are stripped so input can't change the query meaning.
+    Returns "" when nothing searchable is left.
+    """
+    words = re.findall(r"\w+", q.lower())
+    terms = []
+    for word in words:
+        if len(word) >= MIN_REQUIRED_LENGTH:
+            terms.append(f"+{word}*")
+        else:
+            terms.append(f"{word}*")
+    return " ".join(terms)
+
+
+def match_clause(columns, q):
+    """
+    Return (sql, params) for an AND-able FULLTEXT filter on columns,
+    or ("", []) when q has no searchable words.
+    """
+    query = boolean_query(q)
+    if not query:
+        return "", []
+    return f" AND MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)", [query]
+
+
+@routing.read_only
+def search_all(conn, q, limit=20):
+    """
+    Search events, resources and services in a single round trip.
+
+    Args:
+        conn: Database connection
+        q (str): Free-text search
+        limit (int): Maximum number of results overall
+
+    Returns:
+        list: Dicts with keys item_type, item_id, title, snippet,
+              category, created_at, score; best matches first
+    """
+    query = boolean_query(q)
+    if not query:
+        return []
+
+    curs = instrument.dict_cursor(conn)
+
+    # Each branch is limited on its own so MySQL never ranks more rows
+    # than can make the final cut.
+    curs.execute(f"""
+        (SELECT 'event' AS item_type,
+                event_id AS item_id,
+                title,
+                LEFT(description, {SNIPPET_LENGTH}) AS snippet,
+                category,
+                created_at,
+                MATCH({EVENT_TEXT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE) AS score
+         FROM events
+         WHERE MATCH({EVENT_TEXT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)
+           AND NOT (status <=> 'removed')
+         ORDER BY score DESC
+         LIMIT %s)
+        UNION ALL
+        (SELECT 'resource',
+                resource_id,
+                title,
+                LEFT(description, {SNIPPET_LENGTH}),
+                category,
+                created_at,
+                MATCH({RESOURCE_TEXT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE) AS score
+         FROM resources
+         WHERE MATCH({RESOURCE_TEXT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)
+           AND NOT (status <=> 'removed')
+         ORDER BY score DESC
+         LIMIT %s)
+        UNION ALL
+        (SELECT 'service',
+                service_id,
+                service_name,
+                LEFT(description, {SNIPPET_LENGTH}),
+                category,
+                created_at,
+                MATCH({SERVICE_TEXT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE) AS score
+         FROM services
+         WHERE MATCH({SERVICE_TEXT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)
+         ORDER BY score DESC
+         LIMIT %s)
+        ORDER BY score DESC, created_at DESC
+        LIMIT %s
+    """, [query, query, limit] * 3 + [limit])
+    return curs.fetchall()
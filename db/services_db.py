@@ -1,5 +1,5 @@
 # db/services_db.py
-import cs304dbi as dbi
+from db import cache, instrument, pagination, routing, search_db
 
 # Keep this list in sync with your schema and templates
 SERVICE_FIELDS = """
@@ -15,11 +15,15 @@ SERVICE_FIELDS = """
     created_at
 """
 
-def list_services(conn, q="", category=""):
+@routing.read_only
+def list_services(conn, q="", category="", after=None, before=None,
+                  limit=pagination.DEFAULT_PAGE_SIZE):
     """
-    Returns a list of services (dict rows), optionally filtered by keyword and category.
+    Returns one page of services (dict rows), optionally filtered by keyword and category.
+    Keyset-paginated on (created_at, service_id); after/before take the
+    cursors of the current page. Returns a page dict (see db/pagination.py).
     """
-    curs = dbi.dict_cursor(conn)
+    curs = instrument.dict_cursor(conn)
 
     sql = f"""
         SELECT {SERVICE_FIELDS}
@@ -29,25 +33,34 @@ def list_services(conn, q="", category=""):
     params = []
 
     if q:
-        sql += " AND (service_name LIKE %s OR description LIKE %s)"
-        like = f"%{q}%"
-        params.extend([like, like])
+        match_sql, match_params = search_db.match_clause(search_db.SERVICE_TEXT_COLUMNS, q)
+        sql += match_sql
+        params.extend(match_params)
 
     if category:
         sql += " AND category = %s"
         params.append(category)
 
-    sql += " ORDER BY created_at DESC"
+    after = pagination.decode_cursor(after)
+    before = pagination.decode_cursor(before)
+    seek_sql, seek_params, order_sql = pagination.keyset_clause(
+        "created_at", "service_id", after=after, before=before
+    )
+    sql += seek_sql + order_sql + " LIMIT %s"
+    params.extend(seek_params)
+    params.append(limit + 1)
 
     curs.execute(sql, params)
-    return curs.fetchall()
+    return pagination.build_page(
+        curs.fetchall(), limit, "created_at", "service_id", after=after, before=before
+    )
 
 def insert_service(conn, service_name, category, description, price_range,
                    location_type, availability, contact_method, created_by):
     """
     Inserts a service row. Returns new service_id.
     """
-    curs = dbi.cursor(conn)
+    curs = instrument.cursor(conn)
     curs.execute("""
         INSERT INTO services (
             service_name, category, description, price_range,
@@ -60,13 +73,20 @@ def insert_service(conn, service_name, category, description, price_range,
     conn.commit()
 
     curs.execute("SELECT LAST_INSERT_ID()")
-    return curs.fetchone()[0]
+    service_id = curs.fetchone()[0]
+    cache.invalidate_item("service", service_id)
+    return service_id
 
 def get_service_by_id(conn, service_id):
     """
     Returns one service dict row (explicit fields), or None.
+    Served from cache.entity_cache when possible.
     """
-    curs = dbi.dict_cursor(conn)
+    return cache.cached_row("service", service_id, lambda: _load_service(conn, service_id))
+
+@routing.read_only
+def _load_service(conn, service_id):
+    curs = instrument.dict_cursor(conn)
     curs.execute(f"""
         SELECT {SERVICE_FIELDS}
         FROM services
@@ -79,7 +99,7 @@ def update_service(conn, service_id, service_name, category, description, price_
     """
     Updates a service row by id.
     """
-    curs = dbi.cursor(conn)
+    curs = instrument.cursor(conn)
     curs.execute("""
         UPDATE services
         SET service_name=%s,
@@ -93,12 +113,17 @@ def update_service(conn, service_id, service_name, category, description, price_
     """, [service_name, category, description, price_range,
           location_type, availability, contact_method, service_id])
     conn.commit()
+    cache.invalidate_item("service", service_id)
 
 def get_service_owner(conn, service_id):
     """
-    Returns created_by for a service, or None.
+    Returns created_by for a service, or None (cached like get_service_by_id).
     """
-    curs = dbi.dict_cursor(conn)
+    return cache.cached_row("service_owner", service_id,
+                            lambda: _load_service_owner(conn, service_id))
+
+def _load_service_owner(conn, service_id):
+    curs = instrument.dict_cursor(conn)
     curs.execute("""
         SELECT created_by
         FROM services
@@ -110,9 +135,10 @@ def delete_service(conn, service_id):
     """
     Deletes a service by id.
     """
-    curs = dbi.cursor(conn)
+    curs = instrument.cursor(conn)
     curs.execute("""
         DELETE FROM services
         WHERE service_id = %s
     """, [service_id])
     conn.commit()
+    cache.invalidate_item("service", service_id)
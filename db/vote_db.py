@@ -4,12 +4,25 @@ vote_db - Voting/Rating System Database Layer
 Handles upvotes/downvotes for events and resources.
 Supports:
 - vote tracking per user
+- atomic vote casting (cast_vote: vote row + counters in one transaction)
 - aggregate vote counts
 - auto-flagging
-- auto-deletion with dependency cleanup (comments, RSVPs)
+- auto-removal: items are soft-deleted and purged by a background job
+  (see purge_db)
+- optional write-behind counter buffering for hot items (VoteBuffer)
+- counter reconciliation from the votes table
 """
 
-import cs304dbi as dbi
+import logging
+import threading
+
+from db import cache, instrument, purge_db
+
+logger = logging.getLogger(__name__)
+
+# Moderation thresholds (downvotes)
+FLAG_THRESHOLD = 20
+DELETE_THRESHOLD = 50
 
 
 def _table_for_item_type(item_type):
@@ -22,140 +35,386 @@ def _table_for_item_type(item_type):
 
 
 def item_exists(conn, item_type, item_id):
+    """True if the item exists and has not been removed."""
     table, id_col = _table_for_item_type(item_type)
-    curs = dbi.dict_cursor(conn)
+    curs = instrument.dict_cursor(conn)
     curs.execute(
-        f"SELECT {id_col} FROM {table} WHERE {id_col}=%s",
+        f"SELECT {id_col} FROM {table} WHERE {id_col}=%s AND NOT (status <=> 'removed')",
         [item_id]
     )
     return curs.fetchone() is not None
 
 
-def get_previous_vote(conn, user_id, item_type, item_id):
-    curs = dbi.dict_cursor(conn)
+# rowcount: 1 = new vote, 2 = vote switched, 0 = same vote again
+VOTE_UPSERT_SQL = """
+    INSERT INTO votes (user_id, item_type, item_id, vote)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE vote = VALUES(vote)
+"""
+
+
+def vote_counter_sql(item_type):
+    """
+    The UPDATE that applies a vote to its item's counters and flag
+    status and leaves the new downvote count in LAST_INSERT_ID().
+    Params: up delta, down delta, FLAG_THRESHOLD, item id.
+    """
+    table, id_col = _table_for_item_type(item_type)
+    # MySQL applies SET assignments left to right, so the status CASE
+    # sees the already-updated downvotes.
+    return f"""
+        UPDATE {table}
+        SET upvotes = upvotes + %s,
+            downvotes = LAST_INSERT_ID(downvotes + %s),
+            status = CASE
+                WHEN downvotes >= %s THEN 'flagged'
+                WHEN status = 'flagged' THEN 'active'
+                ELSE status
+            END
+        WHERE {id_col} = %s AND NOT (status <=> 'removed')
+    """
+
+
+def _vote_deltas(vote_type, switched):
+    """
+    Return the (upvotes, downvotes) change for a recorded vote.
+    A switched vote moves one count from the old side to the new side.
+    """
+    if vote_type == "up":
+        return (1, -1) if switched else (1, 0)
+    return (-1, 1) if switched else (0, 1)
+
+
+def cast_vote(conn, user_id, item_type, item_id, vote_type):
+    """
+    Record a user's vote and update the item's counters in one transaction.
+
+    The vote row is upserted, then a single UPDATE applies the counter
+    deltas, re-evaluates the flag threshold and hands back the new
+    downvote count via LAST_INSERT_ID(expr). The UPDATE takes the item's
+    row lock, so concurrent votes on the same item serialize there and
+    the counters can't drift from the votes table.
+
+    Returns:
+        dict: {"result": "recorded" | "unchanged" | "deleted" | "missing",
+               "status": new status (when recorded),
+               "downvotes": new downvote count (when recorded/deleted)}
+    """
+    curs = instrument.cursor(conn)
+
+    try:
+        curs.execute(VOTE_UPSERT_SQL, [user_id, item_type, item_id, vote_type])
+        if curs.rowcount == 0:
+            conn.rollback()
+            return {"result": "unchanged"}
+
+        up_delta, down_delta = _vote_deltas(vote_type, switched=(curs.rowcount == 2))
+
+        curs.execute(
+            vote_counter_sql(item_type),
+            [up_delta, down_delta, FLAG_THRESHOLD, item_id]
+        )
+        if curs.rowcount == 0:
+            # Item doesn't exist (or is removed): undo the vote we just wrote
+            conn.rollback()
+            return {"result": "missing"}
+
+        downvotes = curs.lastrowid
+
+        if downvotes >= DELETE_THRESHOLD:
+            # Hide the item now; the purge job is queued in this same
+            # transaction (see purge_db)
+            purge_db.remove_items(conn, item_type, [item_id], commit=False)
+            conn.commit()
+            purge_db.invalidate_removed(item_type, [item_id])
+            return {"result": "deleted", "downvotes": downvotes}
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    cache.invalidate_item(item_type, item_id)
+
+    status = "flagged" if downvotes >= FLAG_THRESHOLD else "active"
+    return {"result": "recorded", "status": status, "downvotes": downvotes}
+
+
+def _apply_thresholds_many(conn, item_type, item_ids):
+    """
+    Remove items past DELETE_THRESHOLD, then flag/unflag the rest
+    with one UPDATE. Returns the ids that were removed. The caller commits,
+    then passes them to purge_db.invalidate_removed.
+    """
+    table, id_col = _table_for_item_type(item_type)
+    if not item_ids:
+        return []
+
+    curs = instrument.cursor(conn)
+    placeholders = ", ".join(["%s"] * len(item_ids))
     curs.execute(
-        """
-        SELECT vote
-        FROM votes
-        WHERE user_id=%s AND item_type=%s AND item_id=%s
+        f"""
+        SELECT {id_col} FROM {table}
+        WHERE {id_col} IN ({placeholders})
+          AND downvotes >= %s
+          AND NOT (status <=> 'removed')
         """,
-        [user_id, item_type, item_id]
+        [*item_ids, DELETE_THRESHOLD]
     )
-    return curs.fetchone()
-
+    removed = [row[0] for row in curs.fetchall()]
+    purge_db.remove_items(conn, item_type, removed, commit=False)
 
-def insert_vote(conn, user_id, item_type, item_id, vote_type):
-    curs = dbi.cursor(conn)
     curs.execute(
-        """
-        INSERT INTO votes (user_id, item_type, item_id, vote)
-        VALUES (%s, %s, %s, %s)
+        f"""
+        UPDATE {table}
+        SET status = CASE
+            WHEN downvotes >= %s THEN 'flagged'
+            WHEN status = 'flagged' THEN 'active'
+            ELSE status
+        END
+        WHERE {id_col} IN ({placeholders})
+          AND NOT (status <=> 'removed')
         """,
-        [user_id, item_type, item_id, vote_type]
+        [FLAG_THRESHOLD, *item_ids]
     )
+    return removed
 
 
-def update_vote(conn, user_id, item_type, item_id, vote_type):
-    curs = dbi.cursor(conn)
-    curs.execute(
+class VoteBuffer:
+    """
+    Write-behind buffer for vote counters.
+
+    Votes are still written to the votes table immediately (see
+    cast_vote_buffered); only the upvotes/downvotes deltas are held in
+    memory per (item_type, item_id) and applied in one UPDATE per table
+    on flush. Flushes happen every `interval` seconds, or as soon as
+    `max_pending` items have pending deltas. Moderation thresholds are
+    evaluated for every flushed item.
+
+    If the process dies with deltas still pending, the counters lag the
+    votes table until reconcile_vote_counts() is run.
+
+    Args:
+        pool: ConnectionPool used by the background flusher
+        interval (float): Seconds between flushes
+        max_pending (int): Pending items that trigger an early flush
+    """
+
+    def __init__(self, pool, interval=2.0, max_pending=500):
+        self.pool = pool
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # Monitoring counters
+        self.flushes = 0
+        self.flushed_items = 0
+        self.flush_errors = 0
+
+    def add(self, item_type, item_id, up_delta, down_delta):
+        """Queue a counter change; wakes the flusher when the buffer is full."""
+        with self._lock:
+            counts = self._pending.setdefault((item_type, item_id), [0, 0])
+            counts[0] += up_delta
+            counts[1] += down_delta
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        """Return how many items have unflushed deltas."""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, conn):
         """
-        UPDATE votes
-        SET vote=%s
-        WHERE user_id=%s AND item_type=%s AND item_id=%s
-        """,
-        [vote_type, user_id, item_type, item_id]
-    )
+        Apply all pending deltas using conn and evaluate thresholds.
+        On failure the deltas are put back so nothing is lost.
+        Returns the number of items flushed.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
 
+            by_type = {}
+            for (item_type, item_id), (up, down) in batch.items():
+                if up or down:
+                    by_type.setdefault(item_type, []).append((item_id, up, down))
 
-def apply_vote_count_change(conn, item_type, item_id, previous_vote, new_vote):
-    table, id_col = _table_for_item_type(item_type)
-    curs = dbi.cursor(conn)
+            curs = instrument.cursor(conn)
+            removed = {}
+            try:
+                for item_type, rows in by_type.items():
+                    self._apply_deltas(curs, item_type, rows)
+                    removed[item_type] = _apply_thresholds_many(
+                        conn, item_type, [r[0] for r in rows]
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                self.flush_errors += 1
+                self._requeue(batch)
+                raise
 
-    if previous_vote is None:
-        if new_vote == "up":
-            curs.execute(
-                f"UPDATE {table} SET upvotes = upvotes + 1 WHERE {id_col}=%s",
-                [item_id]
-            )
-        else:
-            curs.execute(
-                f"UPDATE {table} SET downvotes = downvotes + 1 WHERE {id_col}=%s",
-                [item_id]
+            for item_type, item_id in batch:
+                cache.invalidate_item(item_type, item_id)
+            for item_type, item_ids in removed.items():
+                purge_db.invalidate_removed(item_type, item_ids)
+            self.flushes += 1
+            self.flushed_items += len(batch)
+            return len(batch)
+
+    def start(self):
+        """Start the background flusher thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="vote-buffer-flusher", daemon=True
             )
-        return
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher after one final flush."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        """Return buffer counters for monitoring."""
+        return {
+            "pending_items": self.pending(),
+            "flushes": self.flushes,
+            "flushed_items": self.flushed_items,
+            "flush_errors": self.flush_errors,
+        }
+
+    @staticmethod
+    def _apply_deltas(curs, item_type, rows):
+        """One UPDATE for all buffered items of a type, via CASE on the id."""
+        table, id_col = _table_for_item_type(item_type)
+        cases = " ".join(["WHEN %s THEN %s"] * len(rows))
+        placeholders = ", ".join(["%s"] * len(rows))
+
+        params = []
+        for item_id, up, _ in rows:
+            params.extend([item_id, up])
+        for item_id, _, down in rows:
+            params.extend([item_id, down])
+        params.extend(item_id for item_id, _, _ in rows)
 
-    if previous_vote == "up" and new_vote == "down":
-        curs.execute(
-            f"""
-            UPDATE {table}
-            SET upvotes = upvotes - 1,
-                downvotes = downvotes + 1
-            WHERE {id_col}=%s
-            """,
-            [item_id]
-        )
-    elif previous_vote == "down" and new_vote == "up":
         curs.execute(
             f"""
             UPDATE {table}
-            SET downvotes = downvotes - 1,
-                upvotes = upvotes + 1
-            WHERE {id_col}=%s
+            SET upvotes = upvotes + CASE {id_col} {cases} ELSE 0 END,
+                downvotes = downvotes + CASE {id_col} {cases} ELSE 0 END
+            WHERE {id_col} IN ({placeholders})
             """,
-            [item_id]
+            params
         )
 
+    def _requeue(self, batch):
+        with self._lock:
+            for key, (up, down) in batch.items():
+                counts = self._pending.setdefault(key, [0, 0])
+                counts[0] += up
+                counts[1] += down
 
-def get_vote_counts(conn, item_type, item_id):
-    table, id_col = _table_for_item_type(item_type)
-    curs = dbi.dict_cursor(conn)
-    curs.execute(
-        f"""
-        SELECT upvotes, downvotes
-        FROM {table}
-        WHERE {id_col}=%s
-        """,
-        [item_id]
-    )
-    return curs.fetchone()
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            stopping = self._stopped.is_set()
+            if self.pending():
+                try:
+                    conn = self.pool.acquire()
+                except Exception:
+                    self.flush_errors += 1
+                    logger.exception("vote buffer could not get a connection")
+                else:
+                    try:
+                        self.flush(conn)
+                    except Exception:
+                        # The deltas were re-queued; retry next round
+                        logger.exception("vote buffer flush failed")
+                    finally:
+                        self.pool.release(conn)
+            if stopping:
+                return
 
 
-def apply_status_or_delete(conn, item_type, item_id):
+def cast_vote_buffered(conn, buffer, user_id, item_type, item_id, vote_type):
     """
-    - 50+ downvotes → delete item + dependencies
-    - 20+ downvotes → flag item
+    Buffered counterpart of cast_vote: the vote row is committed right
+    away, the counter change is handed to `buffer`.
+
+    Returns:
+        dict: {"result": "recorded" | "unchanged" | "missing"}
     """
-    table, id_col = _table_for_item_type(item_type)
-    curs = dbi.cursor(conn)
+    if not item_exists(conn, item_type, item_id):
+        return {"result": "missing"}
 
-    counts = get_vote_counts(conn, item_type, item_id)
-    if not counts:
-        return None
+    curs = instrument.cursor(conn)
+    try:
+        curs.execute(VOTE_UPSERT_SQL, [user_id, item_type, item_id, vote_type])
+        changed = curs.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
-    upvotes = counts["upvotes"]
-    downvotes = counts["downvotes"]
+    if changed == 0:
+        return {"result": "unchanged"}
 
-    if downvotes >= 50:
-        if item_type == "event":
-            curs.execute("DELETE FROM rsvp WHERE event_id=%s", [item_id])
-            curs.execute("DELETE FROM comments WHERE event_id=%s", [item_id])
-        else:
-            curs.execute("DELETE FROM comments WHERE resource_id=%s", [item_id])
+    buffer.add(item_type, item_id, *_vote_deltas(vote_type, switched=(changed == 2)))
+    return {"result": "recorded"}
 
-        curs.execute(f"DELETE FROM {table} WHERE {id_col}=%s", [item_id])
-        return "deleted"
 
-    status = "flagged" if downvotes >= 20 else "active"
-    curs.execute(
-        f"UPDATE {table} SET status=%s WHERE {id_col}=%s",
-        [status, item_id]
-    )
-    return status
+def reconcile_vote_counts(conn, item_type):
+    """
+    Recompute upvotes/downvotes for every item of a type from the votes
+    table, then re-apply moderation thresholds to items past FLAG_THRESHOLD.
 
-def update_item_status(conn, item_type, item_id, status):
+    Run after a crash in buffered mode, and only while no VoteBuffer holds
+    unflushed deltas (e.g. at deploy time), or those deltas are applied twice.
+    Returns the number of item rows whose counters changed.
+    """
     table, id_col = _table_for_item_type(item_type)
-    curs = dbi.cursor(conn)
-    curs.execute(
-        f"UPDATE {table} SET status=%s WHERE {id_col}=%s",
-        [status, item_id]
-    )
\ No newline at end of file
+    curs = instrument.cursor(conn)
+    try:
+        curs.execute(
+            f"""
+            UPDATE {table} t
+            LEFT JOIN (
+                SELECT item_id,
+                       SUM(vote = 'up') AS up,
+                       SUM(vote = 'down') AS down
+                FROM votes
+                WHERE item_type = %s
+                GROUP BY item_id
+            ) v ON v.item_id = t.{id_col}
+            SET t.upvotes = COALESCE(v.up, 0),
+                t.downvotes = COALESCE(v.down, 0)
+            """,
+            [item_type]
+        )
+        changed = curs.rowcount
+
+        curs.execute(
+            f"SELECT {id_col} FROM {table} WHERE downvotes >= %s OR status = 'flagged'",
+            [FLAG_THRESHOLD]
+        )
+        removed = _apply_thresholds_many(conn, item_type, [row[0] for row in curs.fetchall()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    purge_db.invalidate_removed(item_type, removed)
+    return changed
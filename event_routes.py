@@ -6,11 +6,15 @@ from flask import (
 import cs304dbi as dbi
 import datetime
 import os
+import uuid
 from werkzeug.utils import secure_filename
 
 from auth_utils import login_required
-from db import event_db
-from PIL import Image
+from conn_utils import get_conn
+from db import event_db, job_db, login_db, purge_db, routing
+import image_utils
+import metrics
+import render_cache
 
 dbi.conf('cs304jas_db')
 
@@ -35,29 +39,95 @@ EVENT_CATEGORIES = [
     "Other"
 ]
 
+# Upper bound on entries per bulk RSVP call
+MAX_BULK_RSVPS = 500
+
 
 def getConn():
-    return dbi.connect()
+    """Return this request's pooled database connection."""
+    return get_conn()
+
+
+def _queue_event_image(conn, event_id, file):
+    """
+    Stage an uploaded event image and queue it for background processing
+    (validation, re-encoding and variants run in worker.py). Only the
+    extension is checked here. Returns an error message, or None.
+    """
+    ext = image_utils.allowed_extension(file.filename)
+    if ext is None:
+        return "Invalid image type."
+
+    staging_dir = os.path.join(current_app.config['UPLOADS'], 'incoming')
+    os.makedirs(staging_dir, exist_ok=True)
+    staged_path = os.path.join(staging_dir, f"event_{event_id}_{uuid.uuid4().hex}.{ext}")
+    file.save(staged_path)
+    metrics.UPLOAD_BYTES.labels("event_image").inc(os.path.getsize(staged_path))
+
+    job_db.enqueue(
+        conn, 'process_event_image',
+        {
+            "event_id": event_id,
+            "staged_path": staged_path,
+            "original_name": secure_filename(file.filename),
+        },
+        created_by=session.get('user_id')
+    )
+    return None
 
 
 @event_bp.route('/')
+@render_cache.cached_page('event')
 def list_events():
     conn = getConn()
     q = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip()
 
-    events = event_db.list_events(conn, q=q, category=category)
+    # Date window: upcoming events unless asked otherwise; the date
+    # windows list soonest first by default, 'all' newest-created first
+    when = request.args.get('when', 'upcoming')
+    if when not in event_db.EVENT_WINDOWS:
+        when = 'upcoming'
+    sort = request.args.get('sort') or ('created' if when == 'all' else 'date')
+    if sort not in event_db.EVENT_SORTS:
+        sort = 'date'
+
+    date_from = date_to = None
+    if when == 'range':
+        try:
+            date_from = _parse_date(request.args.get('from'))
+            date_to = _parse_date(request.args.get('to'))
+        except ValueError:
+            flash("Dates must be in YYYY-MM-DD format.")
+    start, end = event_db.event_window(when, start=date_from, end=date_to)
+
+    page = event_db.list_events(
+        conn, q=q, category=category,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        start=start, end=end, sort=sort
+    )
     categories = sorted(EVENT_CATEGORIES)
 
     return render_template(
         'events/list.html',
-        events=events,
+        events=page['items'],
+        page=page,
         q=q,
         categories=categories,
-        selected_category=category
+        selected_category=category,
+        when=when,
+        sort=sort,
+        date_from=date_from,
+        date_to=date_to
     )
 
 
+def _parse_date(value):
+    """A YYYY-MM-DD query parameter as a date, or None if empty."""
+    return datetime.date.fromisoformat(value) if value else None
+
+
 @event_bp.route('/add', methods=['GET', 'POST'])
 @login_required
 def add_event():
@@ -89,32 +159,11 @@ def add_event():
 
         file = request.files.get('image')
         if file and file.filename:
-            ext = file.filename.rsplit('.', 1)[1].lower()
-            if ext not in ['jpg', 'jpeg', 'png', 'gif']:
-                flash("Invalid image type.")
-                return redirect(url_for('event_bp.add_event'))
-
-            # Validate actual image content
-            try:
-                Image.open(file).verify()
-                file.seek(0)  
-            except Exception:
-                flash("Uploaded file is not a valid image.")
+            error = _queue_event_image(conn, event_id, file)
+            if error:
+                flash(error)
                 return redirect(url_for('event_bp.add_event'))
 
-            filename = secure_filename(f"event_{event_id}.{ext}")
-            path = os.path.join(current_app.config['UPLOADS'], filename)
-
-            file.save(path)
-            os.chmod(path, 0o644)
-
-            curs = conn.cursor()
-            curs.execute(
-                "UPDATE events SET image_filename=%s WHERE event_id=%s",
-                (filename, event_id)
-            )
-            conn.commit()
-
         flash("Event created successfully!")
         return redirect(url_for('event_bp.list_events'))
 
@@ -125,16 +174,18 @@ def add_event():
 @event_bp.route('/<int:event_id>')
 def event_details(event_id):
     conn = getConn()
-    event = event_db.get_event_by_id(conn, event_id)
+    # Old links still work once the event has been archived
+    event = event_db.get_event_by_id(conn, event_id, include_archived=True)
 
     if not event:
         flash("Event not found.")
         return redirect(url_for('event_bp.list_events'))
 
-    rsvps = event_db.list_rsvps_yes_maybe(conn, event_id)
+    archived = 'archived_at' in event
+    rsvps = event_db.list_rsvps_yes_maybe(conn, event_id, archived=archived)
 
     user_rsvp = None
-    if 'user_id' in session:
+    if 'user_id' in session and not archived:
         user_rsvp = event_db.get_user_rsvp(conn, event_id, session['user_id'])
 
     return render_template(
@@ -177,32 +228,11 @@ def edit_event(event_id):
 
         file = request.files.get('image')
         if file and file.filename:
-            ext = file.filename.rsplit('.', 1)[1].lower()
-            if ext not in ['jpg', 'jpeg', 'png', 'gif']:
-                flash("Invalid image type.")
-                return redirect(url_for('event_bp.edit_event', event_id=event_id))
-
-            # Validate actual image content
-            try:
-                Image.open(file).verify()
-                file.seek(0)  
-            except Exception:
-                flash("Uploaded file is not a valid image.")
+            error = _queue_event_image(conn, event_id, file)
+            if error:
+                flash(error)
                 return redirect(url_for('event_bp.edit_event', event_id=event_id))
 
-            filename = secure_filename(f"event_{event_id}.{ext}")
-            path = os.path.join(current_app.config['UPLOADS'], filename)
-
-            file.save(path)
-            os.chmod(path, 0o644)
-
-            curs = conn.cursor()
-            curs.execute(
-                "UPDATE events SET image_filename=%s WHERE event_id=%s",
-                (filename, event_id)
-            )
-            conn.commit()
-
         flash("Event updated successfully!")
         return redirect(url_for('event_bp.list_events'))
 
@@ -231,7 +261,8 @@ def delete_event(event_id):
         flash("You can only delete events you created.")
         return redirect(url_for('event_bp.list_events'))
 
-    event_db.delete_event_and_rsvps(conn, event_id)
+    # Hidden now; comments/RSVPs/votes are purged in the background
+    purge_db.remove_item(conn, 'event', event_id, created_by=session['user_id'])
     flash("Event deleted.")
     return redirect(url_for('event_bp.list_events'))
 
@@ -240,44 +271,95 @@ def delete_event(event_id):
 @login_required
 def rsvp(event_id):
     conn = getConn()
-   
-    event = event_db.get_event_by_id(conn, event_id)
-    if not event:
+
+    if not event_db.event_exists(conn, event_id):
         flash("This event no longer exists.")
         return redirect(url_for("event_bp.list_events"))
 
     user_id = session['user_id']
     status = request.form.get('status')
 
-    if not status:
+    if status not in event_db.RSVP_STATUSES:
         flash("Please choose an RSVP option.")
         return redirect(url_for('event_bp.event_details', event_id=event_id))
 
-    created_at = datetime.datetime.now()
-    existing = event_db.get_existing_rsvp(conn, event_id, user_id)
-
-    if existing:
-        event_db.update_rsvp(conn, event_id, user_id, status, created_at)
-    else:
-        event_db.insert_rsvp(conn, event_id, user_id, status, created_at)
+    event_db.upsert_rsvp(conn, event_id, user_id, status, datetime.datetime.now())
 
     return redirect(url_for('event_bp.event_details', event_id=event_id))
 
 
-@event_bp.route('/api/events')
-def events_json():
+@event_bp.route('/<int:event_id>/rsvps', methods=['POST'])
+def bulk_rsvp(event_id):
+    """
+    Record many RSVPs for an event in one call (for organizers' tools).
+    Only the event's creator may use it. Expects JSON:
+    {"rsvps": [{"user_id": 12, "status": "yes"}, ...]}, at most
+    MAX_BULK_RSVPS entries, one per user.
+    """
+    if 'user_id' not in session:
+        return jsonify({"error": "login required"}), 403
+
     conn = getConn()
-    records = event_db.list_events_for_calendar(conn)
+    owner = event_db.get_event_owner(conn, event_id)
+    if not owner:
+        return jsonify({"error": "event not found"}), 404
+    if owner['created_by'] != session['user_id']:
+        return jsonify({"error": "only the event's creator can submit RSVPs"}), 403
 
-    return jsonify([
-        {
-            "id": r["event_id"],
-            "title": r["title"],
-            "start": r["date_of_event"].isoformat() if r["date_of_event"] else None,
-            "description": r["description"]
-        }
-        for r in records
-    ])
+    entries = (request.get_json(silent=True) or {}).get("rsvps")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "rsvps must be a non-empty list"}), 400
+    if len(entries) > MAX_BULK_RSVPS:
+        return jsonify({"error": f"at most {MAX_BULK_RSVPS} rsvps per call"}), 400
+
+    rsvps = {}
+    for entry in entries:
+        user_id = entry.get("user_id") if isinstance(entry, dict) else None
+        status = entry.get("status") if isinstance(entry, dict) else None
+        if (not isinstance(user_id, int) or isinstance(user_id, bool)
+                or status not in event_db.RSVP_STATUSES):
+            return jsonify({"error": "each rsvp needs an integer user_id and a "
+                                     "status of yes, no or maybe"}), 400
+        rsvps[user_id] = status  # last entry wins for repeated users
+
+    unknown = login_db.missing_user_ids(conn, list(rsvps))
+    if unknown:
+        return jsonify({"error": "unknown user_id", "user_ids": unknown}), 400
+
+    counts = event_db.upsert_rsvps(conn, event_id, list(rsvps.items()),
+                                   datetime.datetime.now())
+    return jsonify({"event_id": event_id, "submitted": len(rsvps), **counts})
+
+
+@event_bp.route('/api/events')
+def events_json():
+    """
+    Calendar feed for FullCalendar. Honors the start/end range it sends,
+    serves repeat windows from event_db.calendar_cache and answers
+    If-None-Match revalidation with 304 when nothing changed.
+    """
+    try:
+        start = event_db.parse_calendar_bound(request.args.get('start'))
+        end = event_db.parse_calendar_bound(request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start/end must be ISO 8601 dates"}), 400
+
+    key = (start, end)
+    cached = event_db.calendar_cache.get(key)
+    if cached is None:
+        with routing.ReplicaReads() as reads:
+            records = event_db.list_events_for_calendar(getConn(), start=start, end=end)
+        cached = event_db.calendar_feed(records)
+        # A lagging replica's rows would outlive the write that cleared the cache
+        if not reads.used:
+            event_db.calendar_cache.set(key, cached)
+
+    body, etag = cached
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Let browsers keep the feed but revalidate it on every navigation
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @event_bp.route('/calendar')
 def calendar_view():
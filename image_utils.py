@@ -0,0 +1,212 @@
+"""
+Image processing for event uploads.
+
+Uploads are validated with Pillow, re-encoded (which drops EXIF and other
+metadata) and saved alongside a set of resized variants plus WebP copies.
+Names carry a hash of the re-encoded image, so a new upload never reuses
+an old URL and browsers may cache every file forever:
+
+  event_12_3f9a0c1b2d4e5f60_full.jpg   re-encoded original
+  event_12_3f9a0c1b2d4e5f60_sm.jpg     320px wide (+ _sm.webp)
+  event_12_3f9a0c1b2d4e5f60_md.jpg     640px wide (+ _md.webp)
+  event_12_3f9a0c1b2d4e5f60_lg.jpg     1280px wide (+ _lg.webp)
+
+Only the "_full" name is stored in events.image_filename; variant names
+are derived from it. Images uploaded before this pipeline existed have
+no variants and are served as-is.
+"""
+
+import hashlib
+import io
+import os
+import re
+
+from flask import url_for
+from PIL import Image, ImageOps
+
+ALLOWED_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif']
+
+# Variant name -> target width in pixels (never upscaled)
+VARIANT_WIDTHS = {
+    'sm': 320,
+    'md': 640,
+    'lg': 1280,
+}
+
+FULL_SUFFIX = '_full'
+HASH_LENGTH = 16
+
+# Files whose names embed a content hash (safe to cache as immutable)
+CONTENT_ADDRESSED = re.compile(
+    r'^[a-z]+_\d+_[0-9a-f]{%d}_(full|%s)\.[a-z]+$'
+    % (HASH_LENGTH, '|'.join(VARIANT_WIDTHS))
+)
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+
+class InvalidImage(Exception):
+    """Raised when an upload is not an image we accept."""
+
+
+def process_upload(file, upload_dir, basename, filename=None):
+    """
+    Validate, re-encode and resize an uploaded image.
+
+    Args:
+        file: Uploaded file (werkzeug FileStorage or any binary file object)
+        upload_dir (str): Directory to write images into
+        basename (str): Name stem, e.g. "event_12" (the hash is appended)
+        filename (str, optional): Original upload name, if file has none
+
+    Returns:
+        str: Filename of the re-encoded original (store this in the DB)
+
+    Raises:
+        InvalidImage: If the extension or content is not an accepted image
+    """
+    filename = filename or getattr(file, 'filename', '') or ''
+    if allowed_extension(filename) is None:
+        raise InvalidImage("Invalid image type.")
+
+    # Validate actual image content before decoding it for real
+    try:
+        Image.open(file).verify()
+        file.seek(0)
+        img = Image.open(file)
+        img.load()
+    except Exception:
+        raise InvalidImage("Uploaded file is not a valid image.")
+
+    fmt = _output_format(img)
+    out_ext = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}[fmt]
+
+    # Encode the full-size image in memory first so its hash can name the files
+    encoded = io.BytesIO()
+    if fmt == 'GIF':
+        # Keep animation for the full-size image; variants use the first frame
+        _encode(img, encoded, 'GIF', save_all=True)
+        still = img.convert('RGBA')
+        variant_fmt, variant_ext = 'PNG', 'png'
+    else:
+        # Apply the camera orientation, since EXIF is dropped on re-encode
+        still = ImageOps.exif_transpose(img)
+        if fmt == 'JPEG' and still.mode != 'RGB':
+            still = still.convert('RGB')
+        _encode(still, encoded, fmt)
+        variant_fmt, variant_ext = fmt, out_ext
+
+    digest = hashlib.sha256(encoded.getvalue()).hexdigest()[:HASH_LENGTH]
+    basename = f"{basename}_{digest}"
+    full_name = f"{basename}{FULL_SUFFIX}.{out_ext}"
+    _write(os.path.join(upload_dir, full_name), encoded.getvalue())
+
+    for size, width in VARIANT_WIDTHS.items():
+        variant = _resize_to_width(still, width)
+        _save(variant, os.path.join(upload_dir, f"{basename}_{size}.{variant_ext}"), variant_fmt)
+        _save(variant, os.path.join(upload_dir, f"{basename}_{size}.webp"), 'WEBP')
+
+    return full_name
+
+
+def allowed_extension(filename):
+    """Return the lower-cased extension if it is an accepted image type, else None."""
+    if '.' not in filename:
+        return None
+    ext = filename.rsplit('.', 1)[1].lower()
+    return ext if ext in ALLOWED_EXTENSIONS else None
+
+
+def is_content_addressed(filename):
+    """True if filename embeds a content hash (its bytes never change)."""
+    return CONTENT_ADDRESSED.match(filename) is not None
+
+
+def remove_image(upload_dir, filename):
+    """Delete a stored image and, for processed images, all its variants."""
+    names = [filename]
+    if has_variants(filename):
+        for size in VARIANT_WIDTHS:
+            names.append(variant_filename(filename, size))
+            names.append(variant_filename(filename, size, webp=True))
+    for name in names:
+        try:
+            os.remove(os.path.join(upload_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+def has_variants(filename):
+    """True if filename came from process_upload (so variants exist)."""
+    stem = filename.rsplit('.', 1)[0]
+    return stem.endswith(FULL_SUFFIX)
+
+
+def variant_filename(filename, size, webp=False):
+    """
+    Return the filename of a resized variant of a processed image.
+    GIF originals have PNG variants.
+    """
+    stem, ext = filename.rsplit('.', 1)
+    base = stem[:-len(FULL_SUFFIX)]
+    if webp:
+        ext = 'webp'
+    elif ext == 'gif':
+        ext = 'png'
+    return f"{base}_{size}.{ext}"
+
+
+def srcset(filename, webp=False):
+    """
+    Build an <img>/<source> srcset value listing every variant of a
+    processed image with its width descriptor. Used from templates.
+    """
+    return ", ".join(
+        f"{url_for('uploaded_file', filename=variant_filename(filename, size, webp))} {width}w"
+        for size, width in VARIANT_WIDTHS.items()
+    )
+
+
+def _output_format(img):
+    """Pick the re-encode format: keep PNG/GIF (transparency), else JPEG."""
+    if img.format in ('PNG', 'GIF'):
+        return img.format
+    return 'JPEG'
+
+
+def _resize_to_width(img, width):
+    """Scale img down to width (keeping aspect ratio); never upscales."""
+    if img.width <= width:
+        return img.copy()
+    height = max(1, round(img.height * width / img.width))
+    return img.resize((width, height), Image.LANCZOS)
+
+
+def _encode(img, out, fmt, **options):
+    """Encode img into a file object with per-format quality settings."""
+    if fmt == 'JPEG':
+        options.update(quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == 'WEBP':
+        options.update(quality=WEBP_QUALITY, method=4)
+    elif fmt == 'PNG':
+        options.update(optimize=True)
+    img.save(out, fmt, **options)
+
+
+def _save(img, path, fmt, **options):
+    """Encode img to path, world-readable."""
+    buf = io.BytesIO()
+    _encode(img, buf, fmt, **options)
+    _write(path, buf.getvalue())
+
+
+def _write(path, data):
+    """
+    Write bytes via a temp file + rename, so a URL never serves a
+    half-written image.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
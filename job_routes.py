@@ -0,0 +1,34 @@
+from flask import Blueprint, jsonify, session
+
+from conn_utils import get_conn
+from db import job_db
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+
+@jobs_bp.route('/<int:job_id>')
+def job_status(job_id):
+    """
+    Return the status of a background job as JSON.
+    Only the user whose action queued the job may see it.
+    """
+    # Enforce login
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    job = job_db.get_job(get_conn(), job_id)
+
+    # Hide other users' jobs entirely
+    if job is None or job['created_by'] != session['user_id']:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify({
+        "job_id": job['job_id'],
+        "kind": job['kind'],
+        "status": job['status'],
+        "attempts": job['attempts'],
+        "max_attempts": job['max_attempts'],
+        "last_error": job['last_error'],
+        "created_at": job['created_at'].isoformat(),
+        "updated_at": job['updated_at'].isoformat(),
+    }), 200
@@ -1,14 +1,23 @@
+import math
+
 from flask import Blueprint, render_template, request, redirect, flash, session, url_for
-import bcrypt
-import cs304dbi as dbi
+import conn_utils
+import password_utils
+import throttle
 from db import login_db
 
 auth_bp = Blueprint('auth', __name__)
 
 
 def get_conn():
-    """Return a database connection."""
-    return dbi.connect()
+    """Return this request's pooled database connection."""
+    return conn_utils.get_conn()
+
+
+def _busy(template, page_title):
+    """503 response for when password hashing is saturated."""
+    flash('The site is busy right now. Please try again in a few seconds.')
+    return render_template(template, page_title=page_title), 503, {'Retry-After': '2'}
 
 @auth_bp.route('/')
 def index():
@@ -58,10 +67,10 @@ def join():
         return redirect(url_for('auth.index'))
 
     # Hash the password before storing it in the database
-    hashed = bcrypt.hashpw(
-        passwd1.encode('utf-8'),
-        bcrypt.gensalt()
-    ).decode('utf-8')
+    try:
+        hashed = password_utils.get_hasher().hash(passwd1)
+    except password_utils.HasherBusy:
+        return _busy('signup.html', 'Campus Connect: Sign Up')
 
     # Insert the new user into the database
     conn = get_conn()
@@ -101,6 +110,13 @@ def login():
         flash('Please supply both email and password')
         return redirect(url_for('auth.index'))
 
+    # Refuse bursts per client and per account before spending CPU on bcrypt
+    wait = throttle.get_login_throttle().check(request.remote_addr or '', email)
+    if wait:
+        flash('Too many login attempts. Please wait a moment and try again.')
+        retry_after = {'Retry-After': str(math.ceil(wait))}
+        return render_template('login.html', page_title='Login'), 429, retry_after
+
     # Look up user by email
     conn = get_conn()
     row = login_db.get_login_row_by_email(conn, email)
@@ -109,9 +125,22 @@ def login():
         flash('Login incorrect. Try again or join.')
         return redirect(url_for('auth.index'))
 
-    # Verify password hash using bcrypt
+    # Verify password hash using bcrypt (in the hashing process pool)
+    hasher = password_utils.get_hasher()
     stored = row['password_hash']
-    if bcrypt.checkpw(passwd.encode('utf-8'), stored.encode('utf-8')):
+    try:
+        matched = hasher.verify(passwd, stored)
+    except password_utils.HasherBusy:
+        return _busy('login.html', 'Login')
+
+    if matched:
+        # Upgrade hashes made at an older cost while we have the password
+        if hasher.needs_rehash(stored):
+            try:
+                login_db.update_password_hash(conn, row['user_id'], hasher.hash(passwd))
+            except password_utils.HasherBusy:
+                pass  # try again on a later login
+
         flash('Successfully logged in as ' + email)
 
         # Store user identity in the session for later authorization checks
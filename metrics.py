@@ -0,0 +1,162 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Request hooks registered by init_app() cover every blueprint:
+  - campus_connect_request_duration_seconds: histogram by endpoint,
+    method and status
+  - campus_connect_requests_in_flight: requests being handled now
+  - campus_connect_db_statement_duration_seconds: every statement run
+    through db/instrument.py, by operation (select, insert, ...)
+  - campus_connect_db_pool_*: connection pool gauges
+The routes count their own writes:
+  - campus_connect_votes_total (item_type, vote, result)
+  - campus_connect_comments_total (action)
+  - campus_connect_upload_bytes_total (kind)
+and the archival job (worker.archive_events) its moves:
+  - campus_connect_archived_rows_total (table)
+(async_api.py counts its votes and comments here too, but its request
+latency is not recorded.)
+
+Like /debug (profiler.py), /metrics answers only PROFILER_ADMINS and
+requests carrying PROFILER_TOKEN, so the scraper sends it, e.g.:
+
+    http_headers:
+      X-Profile-Token:
+        values: ["<token>"]
+
+With several worker processes (gunicorn), set PROMETHEUS_MULTIPROC_DIR to
+an empty directory before they start; each process then writes its
+samples there and /metrics adds them up, whichever worker answers the
+scrape. The server should call mark_process_dead() when a worker exits,
+e.g. in gunicorn.conf.py:
+
+    def child_exit(server, worker):
+        import metrics
+        metrics.mark_process_dead(worker.pid)
+"""
+
+import os
+import time
+
+from flask import Response, abort, current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+    REGISTRY, generate_latest, multiprocess,
+)
+
+import profiler
+from db import instrument
+
+REQUEST_LATENCY = Histogram(
+    'campus_connect_request_duration_seconds',
+    'Time to handle a request',
+    ['endpoint', 'method', 'status'],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'campus_connect_requests_in_flight',
+    'Requests currently being handled',
+    multiprocess_mode='livesum',
+)
+DB_STATEMENT_LATENCY = Histogram(
+    'campus_connect_db_statement_duration_seconds',
+    'Time to execute one SQL statement',
+    ['operation'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, float('inf')),
+)
+VOTES = Counter(
+    'campus_connect_votes',
+    'Votes cast',
+    ['item_type', 'vote', 'result'],
+)
+COMMENTS = Counter(
+    'campus_connect_comments',
+    'Comments written',
+    ['action'],
+)
+UPLOAD_BYTES = Counter(
+    'campus_connect_upload_bytes',
+    'Bytes of uploaded files accepted',
+    ['kind'],
+)
+ARCHIVED_ROWS = Counter(
+    'campus_connect_archived_rows',
+    'Rows moved from live tables to the archive tables',
+    ['table'],
+)
+
+# ConnectionPool.stats() key -> gauge
+POOL_GAUGES = {
+    key: Gauge(f'campus_connect_db_pool_{key}', description, multiprocess_mode='livesum')
+    for key, description in [
+        ('max_size', 'Connections the pool may open'),
+        ('open', 'Open connections'),
+        ('in_use', 'Connections lent to requests'),
+        ('idle', 'Open connections waiting in the pool'),
+        ('waits', 'Checkouts that had to wait for a connection'),
+        ('timeouts', 'Checkouts that gave up waiting'),
+    ]
+}
+
+_OPERATIONS = {'select', 'insert', 'update', 'delete', 'replace', 'show'}
+
+
+def init_app(app):
+    """Register the request hooks, the statement hook and /metrics."""
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.teardown_request(_end_request)
+    instrument.statement_hooks.append(_record_statement)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+def metrics_view():
+    """Prometheus text exposition of every metric (all worker processes)."""
+    if not profiler.is_authorized():
+        abort(404)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid):
+    """Drop a finished worker's live gauges (multiprocess mode only)."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+    pool = current_app.extensions.get('db_pool')
+    if pool is not None:
+        stats = pool.stats()
+        for key, gauge in POOL_GAUGES.items():
+            gauge.set(stats[key])
+
+
+def _record_request(response):
+    started = g.get('metrics_started')
+    if started is not None:
+        REQUEST_LATENCY.labels(
+            # Unmatched URLs share one label so 404 probes can't add series
+            endpoint=request.endpoint or 'unmatched',
+            method=request.method,
+            status=str(response.status_code),
+        ).observe(time.perf_counter() - started)
+    return response
+
+
+def _end_request(exc=None):
+    if g.pop('metrics_started', None) is not None:
+        REQUESTS_IN_FLIGHT.dec()
+
+
+def _record_statement(shape, seconds):
+    operation = shape.split(' ', 1)[0].lower()
+    if operation not in _OPERATIONS:
+        operation = 'other'
+    DB_STATEMENT_LATENCY.labels(operation=operation).observe(seconds)
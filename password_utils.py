@@ -0,0 +1,151 @@
+"""
+Password hashing off the request threads.
+
+bcrypt is deliberately slow (~250ms at cost 12), and running it in the
+request thread means a burst of logins ties up every web worker. Hashing
+and checking run in a small process pool instead:
+  - PasswordHasher: bounded process pool for bcrypt hashpw/checkpw
+  - HasherBusy: raised at once when the pool's queue is full, so callers
+                can answer 503 instead of letting requests pile up
+
+The cost factor comes from BCRYPT_ROUNDS. needs_rehash() tells login to
+re-hash a password whose stored hash used a different cost.
+"""
+
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from flask import current_app
+
+
+class HasherBusy(Exception):
+    """Raised when no hashing slot is free (or a hash took too long)."""
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _checkpw(password, stored):
+    return bcrypt.checkpw(password, stored)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in worker processes, with a cap on queued work.
+
+    Args:
+        workers (int): Hashing processes (0 = hash in the calling thread)
+        max_queue (int): Hashes allowed to wait for a free process
+        rounds (int): bcrypt cost for new hashes
+        timeout (float): Seconds a caller waits for its result
+    """
+
+    def __init__(self, workers=2, max_queue=16, rounds=12, timeout=10.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._rejected = 0
+
+    def start(self):
+        """
+        Start the worker processes now. Call before the app starts other
+        threads: the processes are forked, and forking a multi-threaded
+        process can copy locks another thread was holding.
+        """
+        if self.workers > 0:
+            self._get_executor().submit(int).result()
+
+    def hash(self, password):
+        """Return a new bcrypt hash (str) of password at the configured cost."""
+        hashed = self._run(_hashpw, password.encode('utf-8'), self.rounds)
+        return hashed.decode('utf-8')
+
+    def verify(self, password, stored):
+        """True if password matches the stored bcrypt hash."""
+        return self._run(_checkpw, password.encode('utf-8'), stored.encode('utf-8'))
+
+    def needs_rehash(self, stored):
+        """True if stored was hashed at a different cost than BCRYPT_ROUNDS."""
+        try:
+            return int(stored.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "rounds": self.rounds,
+            "rejected": self._rejected,
+        }
+
+    def _run(self, fn, *args):
+        if self.workers == 0:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            self._rejected += 1
+            raise HasherBusy("password hashing is saturated")
+        try:
+            future = self._get_executor().submit(fn, *args)
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy("password hashing timed out")
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool on the next call
+            self.shutdown()
+            raise HasherBusy("password hashing pool restarted")
+        finally:
+            self._slots.release()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=_fork_context()
+                )
+            return self._executor
+
+
+def _fork_context():
+    # fork starts workers without re-importing the app module (spawn
+    # would re-run app.py and its startup code in every worker)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def init_app(app):
+    """Create and start the app's PasswordHasher from BCRYPT_* config."""
+    app.config.setdefault('BCRYPT_ROUNDS', 12)
+    app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+    app.config.setdefault('PASSWORD_HASH_QUEUE', 16)
+
+    hasher = PasswordHasher(
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_queue=app.config['PASSWORD_HASH_QUEUE'],
+        rounds=app.config['BCRYPT_ROUNDS'],
+    )
+    hasher.start()
+    atexit.register(hasher.shutdown)
+    app.extensions['password_hasher'] = hasher
+
+
+def get_hasher():
+    """Return the PasswordHasher for the current app."""
+    return current_app.extensions['password_hasher']
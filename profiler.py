@@ -0,0 +1,318 @@
+"""
+Sampling profiler for live requests.
+
+A helper thread reads the profiled thread's stack from
+sys._current_frames() every PROFILER_INTERVAL seconds. The request thread
+runs untouched (no tracing hooks), so the overhead is a stack walk per
+sample, and the time shows up where it really goes: waiting on MySQL,
+rendering Jinja templates, or Python code.
+
+Profiles come out as collapsed stacks ("root;caller;callee count" per
+line), the input format of flamegraph.pl, speedscope and inferno:
+  - One request: add ?_profile=1 or an "X-Profile: 1" header; the
+    response carries X-Profile-Id, and the stacks are at
+    /debug/profiles/<id>
+  - A time window: GET /debug/profile?seconds=5 samples every thread for
+    that long and returns the stacks
+  - Background: with PROFILER_SAMPLE_RATE = N, one request in N is
+    profiled and the PROFILER_KEEP slowest are kept (/debug/profiles)
+
+Only PROFILER_ADMINS (user ids) and requests with an X-Profile-Token
+header equal to PROFILER_TOKEN may use it. The signup form lets anyone
+pick the admin role, so users.role is not trusted here. Everyone else
+gets a 404 from the /debug routes, and their profile flags are ignored.
+is_authorized() gates app.py's monitoring endpoints the same way.
+"""
+
+import functools
+import heapq
+import hmac
+import itertools
+import math
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from flask import Response, abort, current_app, g, jsonify, request, session
+
+_SAMPLER_NAME = 'profiler-sampler'
+
+
+@functools.lru_cache(maxsize=4096)
+def _frame_label(code):
+    """'qualname (dir/file.py:line)' for a code object."""
+    path = code.co_filename.split(os.sep)
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def _stack(frame):
+    """Root-first frame labels for a frame and its callers."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class Sampler:
+    """
+    Samples stacks on a helper thread until stopped.
+
+    Args:
+        thread_id (int): Thread to sample; None samples every thread
+                         (each stack rooted at the thread's name)
+        interval (float): Seconds between samples
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=_SAMPLER_NAME, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and return the stack counts."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frame = frames.get(self.thread_id)
+                if frame is not None:
+                    self.stacks[";".join(_stack(frame))] += 1
+            else:
+                for ident, frame in frames.items():
+                    if ident not in names:
+                        names.update((t.ident, t.name) for t in threading.enumerate())
+                    name = names.get(ident, ident)
+                    # Skip this and any per-request samplers
+                    if name == _SAMPLER_NAME:
+                        continue
+                    self.stacks[";".join([f"thread:{name}", *_stack(frame)])] += 1
+            self.samples += 1
+
+
+class Profile:
+    """The result of one sampling run."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, label, seconds, stacks, samples, interval):
+        self.id = f"{next(self._ids)}-{secrets.token_hex(4)}"
+        self.label = label
+        self.started_at = time.time() - seconds
+        self.seconds = seconds
+        self.stacks = stacks
+        self.samples = samples
+        self.interval = interval
+
+    def collapsed(self):
+        """Collapsed-stack text, heaviest stacks first."""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "label": self.label,
+            "started_at": round(self.started_at, 3),
+            "seconds": round(self.seconds, 4),
+            "samples": self.samples,
+            "interval": self.interval,
+        }
+
+
+class ProfileStore:
+    """
+    Keeps the last `recent` requested profiles and the `slowest`
+    background-sampled ones.
+    """
+
+    def __init__(self, slowest=20, recent=20):
+        self.keep_slowest = slowest
+        self._recent = deque(maxlen=recent)
+        self._slowest = []   # min-heap of (seconds, id, profile)
+        self._lock = threading.Lock()
+
+    def add_recent(self, profile):
+        with self._lock:
+            self._recent.append(profile)
+
+    def add_sampled(self, profile):
+        """Keep profile if it is among the slowest seen."""
+        entry = (profile.seconds, profile.id, profile)
+        with self._lock:
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def get(self, profile_id):
+        with self._lock:
+            for profile in itertools.chain(self._recent, (e[2] for e in self._slowest)):
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def listing(self):
+        with self._lock:
+            return {
+                "recent": [p.summary() for p in reversed(self._recent)],
+                "slowest": [e[2].summary() for e in sorted(self._slowest, reverse=True)],
+            }
+
+
+def init_app(app):
+    """Register the profiling hooks and /debug routes from PROFILER_* config."""
+    app.config.setdefault('PROFILER_TOKEN', None)
+    app.config.setdefault('PROFILER_ADMINS', ())
+    app.config.setdefault('PROFILER_INTERVAL', 0.005)
+    app.config.setdefault('PROFILER_SAMPLE_RATE', 0)
+    app.config.setdefault('PROFILER_KEEP', 20)
+    app.config.setdefault('PROFILER_MAX_ACTIVE', 4)
+    app.config.setdefault('PROFILER_MAX_WINDOW', 30.0)
+
+    app.extensions['profiler'] = {
+        'store': ProfileStore(slowest=app.config['PROFILER_KEEP']),
+        'slots': threading.BoundedSemaphore(app.config['PROFILER_MAX_ACTIVE']),
+    }
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abandon_profile)
+    app.add_url_rule('/debug/profile', 'profile_window', profile_window)
+    app.add_url_rule('/debug/profiles', 'list_profiles', list_profiles)
+    app.add_url_rule('/debug/profiles/<profile_id>', 'get_profile', get_profile)
+
+
+def is_authorized():
+    """True for PROFILER_ADMINS and requests carrying PROFILER_TOKEN."""
+    token = current_app.config['PROFILER_TOKEN']
+    offered = request.headers.get('X-Profile-Token')
+    if token and offered and hmac.compare_digest(offered.encode(), token.encode()):
+        return True
+    return session.get('user_id') in current_app.config['PROFILER_ADMINS']
+
+
+def _state():
+    return current_app.extensions['profiler']
+
+
+def _start_profile():
+    config = current_app.config
+    if request.args.get('_profile') == '1' or request.headers.get('X-Profile') == '1':
+        if not is_authorized():
+            return
+        keep = 'recent'
+    elif config['PROFILER_SAMPLE_RATE'] and random.random() * config['PROFILER_SAMPLE_RATE'] < 1:
+        keep = 'sampled'
+    else:
+        return
+
+    # Bounded so profiling can't add unbounded sampler threads
+    if not _state()['slots'].acquire(blocking=False):
+        return
+    sampler = Sampler(threading.get_ident(), config['PROFILER_INTERVAL'])
+    g.profile = (sampler, keep, time.perf_counter())
+    sampler.start()
+
+
+def _stop_profile():
+    """Stop this request's sampler, if any, and return (profile, keep)."""
+    running = g.pop('profile', None)
+    if running is None:
+        return None, None
+    sampler, keep, started = running
+    try:
+        stacks = sampler.stop()
+    finally:
+        _state()['slots'].release()
+    label = f"{request.method} {request.full_path.rstrip('?')}"
+    profile = Profile(label, time.perf_counter() - started, stacks,
+                      sampler.samples, sampler.interval)
+    return profile, keep
+
+
+def _finish_profile(response):
+    profile, keep = _stop_profile()
+    if profile is None:
+        return response
+    store = _state()['store']
+    if keep == 'recent':
+        store.add_recent(profile)
+        response.headers['X-Profile-Id'] = profile.id
+    else:
+        store.add_sampled(profile)
+    return response
+
+
+def _abandon_profile(exc=None):
+    # The request failed before after_request ran: just stop sampling
+    _stop_profile()
+
+
+def _collapsed_response(profile):
+    response = Response(profile.collapsed(), mimetype='text/plain')
+    response.headers['Content-Disposition'] = f'inline; filename="profile-{profile.id}.collapsed"'
+    return response
+
+
+def profile_window():
+    """Sample every thread for ?seconds= (default 5) and return the stacks."""
+    if not is_authorized():
+        abort(404)
+    config = current_app.config
+    try:
+        seconds = min(float(request.args.get('seconds', 5)), config['PROFILER_MAX_WINDOW'])
+    except ValueError:
+        abort(400)
+    # min() passes NaN through, and time.sleep() rejects it
+    if not math.isfinite(seconds):
+        abort(400)
+
+    if not _state()['slots'].acquire(blocking=False):
+        return jsonify({"error": "profiler busy"}), 503
+    try:
+        sampler = Sampler(None, config['PROFILER_INTERVAL'])
+        sampler.start()
+        time.sleep(max(seconds, 0))
+        stacks = sampler.stop()
+    finally:
+        _state()['slots'].release()
+
+    profile = Profile(f"window {seconds:g}s", seconds, stacks,
+                      sampler.samples, sampler.interval)
+    _state()['store'].add_recent(profile)
+    return _collapsed_response(profile)
+
+
+def list_profiles():
+    """Stored profiles: recent requested ones and the slowest sampled ones."""
+    if not is_authorized():
+        abort(404)
+    return jsonify(_state()['store'].listing())
+
+
+def get_profile(profile_id):
+    """One stored profile as collapsed stacks."""
+    if not is_authorized():
+        abort(404)
+    profile = _state()['store'].get(profile_id)
+    if profile is None:
+        abort(404)
+    return _collapsed_response(profile)
@@ -0,0 +1,138 @@
+"""
+Rendered HTML caches for the events, resources and services list pages.
+
+Most visitors to the list pages are anonymous and see the same HTML for
+a given q/category/page, and each page renders up to a page of cards:
+  - card(): a Jinja global that renders one item's card template
+    (events/_card.html, ...) and caches the HTML by item id and
+    cache.item_version(), which every write to the item bumps (update,
+    vote, comment, RSVP, image, removal). The only per-viewer inputs a
+    card template gets are `owned` and `logged_in`, and both are part of
+    the key.
+  - cached_page(item_type): a view decorator caching whole responses for
+    visitors with an empty session (anonymous, no pending flash), keyed by
+    endpoint, query string and cache.type_generation(item_type), which
+    any write to an item of that type bumps (inserts too). The responses
+    are marked public for PAGE_CACHE_MAX_AGE seconds, with Vary: Cookie,
+    so a reverse proxy can cache them too. Everyone else gets
+    Cache-Control: private.
+
+Write counters are per process, like cache.entity_cache: other processes
+see a write once their copy expires (FRAGMENT_CACHE_TTL, PAGE_CACHE_TTL),
+and proxies once PAGE_CACHE_MAX_AGE passes.
+
+Nothing rendered in a request that read from the read replica is cached:
+the replica may not have a write yet whose counter is already bumped, so
+the stale HTML would be stored under the new version or generation.
+"""
+
+import functools
+
+from flask import current_app, g, make_response, render_template, request, session
+from markupsafe import Markup
+
+import conn_utils
+from db import cache
+
+# (template, item_type, item_id, version, owned, logged_in) -> HTML
+fragment_cache = cache.LRUCache(maxsize=4096, ttl=300.0)
+# (endpoint, query, generation) -> (body, mimetype)
+page_cache = cache.LRUCache(maxsize=256, ttl=60.0)
+
+
+def init_app(app):
+    """Configure the caches from *_CACHE* config and expose card()."""
+    app.config.setdefault('FRAGMENT_CACHE', True)
+    app.config.setdefault('FRAGMENT_CACHE_SIZE', 4096)
+    app.config.setdefault('FRAGMENT_CACHE_TTL', 300.0)
+    app.config.setdefault('PAGE_CACHE', True)
+    app.config.setdefault('PAGE_CACHE_SIZE', 256)
+    app.config.setdefault('PAGE_CACHE_TTL', 60.0)
+    app.config.setdefault('PAGE_CACHE_MAX_AGE', 30)
+
+    fragment_cache.configure(
+        enabled=app.config['FRAGMENT_CACHE'],
+        maxsize=app.config['FRAGMENT_CACHE_SIZE'],
+        ttl=app.config['FRAGMENT_CACHE_TTL'],
+    )
+    page_cache.configure(
+        enabled=app.config['PAGE_CACHE'],
+        maxsize=app.config['PAGE_CACHE_SIZE'],
+        ttl=app.config['PAGE_CACHE_TTL'],
+    )
+    app.jinja_env.globals['card'] = card
+    app.before_request(_note_generations)
+
+
+def _note_generations():
+    # A card rendered from rows read before a write must not be cached
+    # under the version that write produced; see card()
+    g.render_generations = cache.type_generations()
+
+
+def card(template, item_type, item):
+    """
+    Render template with the item (as `item`), `owned` and `logged_in`,
+    from fragment_cache when possible.
+    """
+    item_id = item[f"{item_type}_id"]
+    user_id = session.get('user_id')
+    owned = user_id is not None and item.get('created_by') == user_id
+    logged_in = bool(session.get('logged_in'))
+
+    # Only cache when no item of this type was written during the request
+    # (the rows may predate the write, the version would not), and the
+    # rows came from the primary
+    generation = cache.type_generation(item_type)
+    cacheable = (g.get('render_generations', {}).get(item_type, 0) == generation
+                 and not conn_utils.read_from_replica())
+
+    key = (template, item_type, item_id, cache.item_version(item_type, item_id),
+           owned, logged_in)
+    html = fragment_cache.get(key) if cacheable else None
+    if html is None:
+        html = Markup(render_template(template, item=item, owned=owned,
+                                      logged_in=logged_in))
+        if cacheable:
+            fragment_cache.set(key, html)
+    return html
+
+
+def cached_page(item_type):
+    """
+    Cache a list view's responses for anonymous visitors; see the module
+    docstring. Apply below the route decorator.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if session:
+                return _private(make_response(view(*args, **kwargs)))
+
+            key = (request.endpoint,
+                   tuple(sorted(request.args.items(multi=True))),
+                   cache.type_generation(item_type))
+            cached = page_cache.get(key)
+            if cached is not None:
+                body, mimetype = cached
+                response = current_app.response_class(body, mimetype=mimetype)
+            else:
+                response = make_response(view(*args, **kwargs))
+                # The view may have written to the session (e.g. a flash)
+                if response.status_code != 200 or session:
+                    return _private(response)
+                if not conn_utils.read_from_replica():
+                    page_cache.set(key, (response.get_data(), response.mimetype))
+
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['PAGE_CACHE_MAX_AGE']
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+
+def _private(response):
+    response.cache_control.private = True
+    response.vary.add('Cookie')
+    return response
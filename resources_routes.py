@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from cs304dbi import connect
+from conn_utils import get_conn
 from auth_utils import login_required
-from db import resources_db
+from db import purge_db, resources_db
+import render_cache
 
 resource_bp = Blueprint('resources', __name__, url_prefix='/resources')
 
@@ -27,11 +28,12 @@ RESOURCE_CATEGORIES = [
 
 
 def getConn():
-    """Return a database connection."""
-    return connect()
+    """Return this request's pooled database connection."""
+    return get_conn()
 
 
 @resource_bp.route('/')
+@render_cache.cached_page('resource')
 def list_resources():
     """
     Display the list of community resources, optionally filtered
@@ -45,15 +47,21 @@ def list_resources():
     q = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip()
 
-    # Fetch resources from the database applying any provided filters
-    resources = resources_db.list_resources(conn, q=q, category=category)
+    # Fetch one page of resources applying any provided filters;
+    # after/before are the cursors from the previous page's links
+    page = resources_db.list_resources(
+        conn, q=q, category=category,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
 
     # Sort categories for consistent display in the UI
     categories = sorted(RESOURCE_CATEGORIES)
 
     return render_template(
         'resources/list.html',
-        resources=resources,
+        resources=page['items'],
+        page=page,
         q=q,
         categories=categories,
         selected_category=category,
@@ -169,7 +177,7 @@ def delete_resource(resource_id):
         flash("You can only delete resources you created!", "warning")
         return redirect(url_for('resources.list_resources'))
 
-    # Perform the delete operation
-    resources_db.delete_resource(conn, resource_id)
+    # Hide it now; its comments and votes are purged in the background
+    purge_db.remove_item(conn, 'resource', resource_id, created_by=session.get('user_id'))
     flash("Resource deleted successfully!")
     return redirect(url_for('resources.list_resources'))
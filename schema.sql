@@ -24,8 +24,22 @@ CREATE TABLE events (
     postal_code VARCHAR(10),
     upvotes INT NOT NULL DEFAULT 0,
     downvotes INT NOT NULL DEFAULT 0,
+    -- Counters maintained by comment_db/event_db writes
+    -- (recompute with `flask reconcile-counters`)
+    comment_count INT NOT NULL DEFAULT 0,
+    rsvp_yes INT NOT NULL DEFAULT 0,
+    rsvp_maybe INT NOT NULL DEFAULT 0,
     status ENUM('active','flagged','removed') DEFAULT 'active',
-    FOREIGN KEY (created_by) REFERENCES users(user_id)
+    FOREIGN KEY (created_by) REFERENCES users(user_id),
+    -- Keyset pagination: newest-first seeks on (created_at, event_id)
+    INDEX idx_events_created (created_at, event_id),
+    INDEX idx_events_category_created (category, created_at, event_id),
+    -- Calendar feed and events list date windows; InnoDB appends
+    -- event_id, so these also serve the (date_of_event, event_id) seek
+    INDEX idx_events_date_of_event (date_of_event),
+    INDEX idx_events_category_date (category, date_of_event),
+    -- Full-text search (db/search_db.py)
+    FULLTEXT INDEX ft_events_text (title, description)
 );
 
 -- RESOURCES
@@ -45,7 +59,14 @@ CREATE TABLE resources (
     postal_code VARCHAR(10),
     upvotes INT NOT NULL DEFAULT 0,
     downvotes INT NOT NULL DEFAULT 0,
-    FOREIGN KEY (created_by) REFERENCES users(user_id)
+    -- Maintained by comment_db writes (see events.comment_count)
+    comment_count INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (created_by) REFERENCES users(user_id),
+    -- Keyset pagination: newest-first seeks on (created_at, resource_id)
+    INDEX idx_resources_created (created_at, resource_id),
+    INDEX idx_resources_category_created (category, created_at, resource_id),
+    -- Full-text search (db/search_db.py)
+    FULLTEXT INDEX ft_resources_text (title, description, category)
 );
 
 -- COMMENTS
@@ -56,9 +77,13 @@ CREATE TABLE comments (
     resource_id INT,
     created_by INT,
     created_at DATETIME,
-    FOREIGN KEY (event_id) REFERENCES events(event_id),
-    FOREIGN KEY (resource_id) REFERENCES resources(resource_id),
-    FOREIGN KEY (created_by) REFERENCES users(user_id)
+    -- Cascades catch stragglers when db/purge_db.py deletes the item
+    FOREIGN KEY (event_id) REFERENCES events(event_id) ON DELETE CASCADE,
+    FOREIGN KEY (resource_id) REFERENCES resources(resource_id) ON DELETE CASCADE,
+    FOREIGN KEY (created_by) REFERENCES users(user_id),
+    -- Per-item threads and batch IN (...) lookups, newest first
+    INDEX idx_comments_event (event_id, created_at),
+    INDEX idx_comments_resource (resource_id, created_at)
 );
 
 -- RSVP
@@ -68,8 +93,12 @@ CREATE TABLE rsvp (
     event_id INT,
     created_by INT,
     created_at DATETIME,
-    FOREIGN KEY (event_id) REFERENCES events(event_id),
-    FOREIGN KEY (created_by) REFERENCES users(user_id)
+    FOREIGN KEY (event_id) REFERENCES events(event_id) ON DELETE CASCADE,
+    FOREIGN KEY (created_by) REFERENCES users(user_id),
+    -- One RSVP per user per event (event_db.upsert_rsvp relies on it).
+    -- Existing databases: delete duplicate (event_id, created_by) rows,
+    -- keeping the newest, before adding this key.
+    UNIQUE KEY uq_rsvp_event_user (event_id, created_by)
 );
 
 -- VOTES
@@ -80,7 +109,10 @@ CREATE TABLE votes (
     item_id INT NOT NULL,
     vote ENUM('up','down') NOT NULL,
     UNIQUE (user_id, item_type, item_id),
-    FOREIGN KEY (user_id) REFERENCES users(user_id)
+    FOREIGN KEY (user_id) REFERENCES users(user_id),
+    -- Per-item aggregates for vote_db.reconcile_vote_counts; also used by
+    -- purge_db to delete an item's votes (no FK: item_id is polymorphic)
+    INDEX idx_votes_item (item_type, item_id, vote)
 );
 
 -- SERVICES
@@ -98,5 +130,84 @@ CREATE TABLE IF NOT EXISTS services (
     created_by INT,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
 
-    FOREIGN KEY (created_by) REFERENCES users(user_id)
-);
\ No newline at end of file
+    FOREIGN KEY (created_by) REFERENCES users(user_id),
+    -- Keyset pagination: newest-first seeks on (created_at, service_id)
+    INDEX idx_services_created (created_at, service_id),
+    INDEX idx_services_category_created (category, created_at, service_id),
+    -- Full-text search (db/search_db.py)
+    FULLTEXT INDEX ft_services_text (service_name, description)
+);
+
+-- JOBS (background work queue, see worker.py)
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INT PRIMARY KEY AUTO_INCREMENT,
+    kind VARCHAR(60) NOT NULL,
+    payload TEXT NOT NULL,
+    status ENUM('queued','running','done','failed') NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    last_error TEXT,
+    created_by INT,
+    run_after DATETIME NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+
+    FOREIGN KEY (created_by) REFERENCES users(user_id),
+    -- Workers claim the oldest runnable job
+    INDEX idx_jobs_claim (status, run_after)
+);
+
+-- ARCHIVE (cold storage for past events, see db/archive_db.py)
+-- Same columns as the live tables; no foreign keys, and only the indexes
+-- the archive read paths use
+CREATE TABLE IF NOT EXISTS events_archive (
+    event_id INT PRIMARY KEY,
+    title VARCHAR(140),
+    date_of_event DATETIME,
+    category VARCHAR(80),
+    created_by INT,
+    created_at DATETIME,
+    description TEXT NOT NULL,
+    contact_info VARCHAR(255),
+    address1 VARCHAR(120),
+    address2 VARCHAR(120),
+    city VARCHAR(60),
+    state CHAR(2),
+    postal_code VARCHAR(10),
+    upvotes INT NOT NULL DEFAULT 0,
+    downvotes INT NOT NULL DEFAULT 0,
+    comment_count INT NOT NULL DEFAULT 0,
+    rsvp_yes INT NOT NULL DEFAULT 0,
+    rsvp_maybe INT NOT NULL DEFAULT 0,
+    status ENUM('active','flagged','removed') DEFAULT 'active',
+    image_filename VARCHAR(255),
+    archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_events_archive_date (date_of_event)
+);
+
+CREATE TABLE IF NOT EXISTS rsvp_archive (
+    rsvp_id INT PRIMARY KEY,
+    status ENUM('yes','no','maybe'),
+    event_id INT,
+    created_by INT,
+    created_at DATETIME,
+    INDEX idx_rsvp_archive_event (event_id)
+);
+
+CREATE TABLE IF NOT EXISTS comments_archive (
+    comment_id INT PRIMARY KEY,
+    content TEXT NOT NULL,
+    event_id INT,
+    created_by INT,
+    created_at DATETIME,
+    INDEX idx_comments_archive_event (event_id, created_at)
+);
+
+CREATE TABLE IF NOT EXISTS votes_archive (
+    vote_id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    item_type ENUM('event','resource') NOT NULL,
+    item_id INT NOT NULL,
+    vote ENUM('up','down') NOT NULL,
+    INDEX idx_votes_archive_item (item_type, item_id)
+);
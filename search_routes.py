@@ -0,0 +1,42 @@
+from flask import Blueprint, render_template, request, jsonify
+
+from conn_utils import get_conn
+from db import search_db
+
+search_bp = Blueprint('search', __name__, url_prefix='/search')
+
+# Upper bound on results returned by one search
+MAX_RESULTS = 50
+
+
+@search_bp.route('/')
+def search():
+    """
+    Search events, resources and services at once, best matches first.
+    Returns JSON when called with ?format=json, otherwise the results page.
+    """
+    q = request.args.get('q', '').strip()
+
+    results = []
+    if q:
+        results = search_db.search_all(get_conn(), q, limit=MAX_RESULTS)
+
+    if request.args.get('format') == 'json':
+        return jsonify([
+            {
+                "type": r["item_type"],
+                "id": r["item_id"],
+                "title": r["title"],
+                "snippet": r["snippet"],
+                "category": r["category"],
+                "score": float(r["score"]),
+            }
+            for r in results
+        ])
+
+    return render_template(
+        'search.html',
+        page_title='Search',
+        q=q,
+        results=results
+    )
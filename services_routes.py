@@ -1,12 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from auth_utils import login_required
 
-import cs304dbi as dbi
+from conn_utils import get_conn
 from db import services_db
+import render_cache
 
 def getConn():
-    """Return a database connection."""
-    return dbi.connect()
+    """Return this request's pooled database connection."""
+    return get_conn()
 
 services_bp = Blueprint('services', __name__, url_prefix='/services')
 
@@ -27,6 +28,7 @@ SERVICE_CATEGORIES = [
 
 
 @services_bp.route('/')
+@render_cache.cached_page('service')
 def list_services():
     """
     Display the list of services, optionally filtered by
@@ -40,15 +42,21 @@ def list_services():
     q = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip()
 
-    # Fetch services applying any provided filters
-    services = services_db.list_services(conn, q=q, category=category)
+    # Fetch one page of services applying any provided filters;
+    # after/before are the cursors from the previous page's links
+    page = services_db.list_services(
+        conn, q=q, category=category,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
 
     # Sort categories for consistent display in the UI
     categories = sorted(SERVICE_CATEGORIES)
 
     return render_template(
         'services/list.html',
-        services=services,
+        services=page['items'],
+        page=page,
         q=q,
         categories=categories,
         selected_category=category,
@@ -0,0 +1,39 @@
+"""
+Concurrent votes on one item must leave its counters equal to the votes
+table (see bench/stress.py).
+
+Needs a scratch MySQL database loaded with schema.sql and seeded users
+(python -m bench seed); name it in CAMPUS_CONNECT_TEST_DB:
+
+    CAMPUS_CONNECT_TEST_DB=bench_db python -m pytest tests
+"""
+
+import os
+
+import pytest
+
+TEST_DB = os.environ.get("CAMPUS_CONNECT_TEST_DB")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DB, reason="set CAMPUS_CONNECT_TEST_DB to a scratch database"
+)
+
+
+@pytest.fixture
+def connect():
+    dbi = pytest.importorskip("cs304dbi")
+    dbi.conf(TEST_DB)
+    return dbi.connect
+
+
+def test_concurrent_votes_match_votes_table(connect):
+    from bench import stress
+
+    report = stress.vote_stress(connect, threads=16, votes=2000, users=40)
+
+    assert report["errors"] == []
+    assert report["counters"]["upvotes"] == report["aggregates"]["up"]
+    assert report["counters"]["downvotes"] == report["aggregates"]["down"]
+    # Switches and repeats both happened, not just fresh votes
+    assert report["outcomes"].get("unchanged", 0) > 0
+    assert report["aggregates"]["up"] + report["aggregates"]["down"] == report["users"]
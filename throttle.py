@@ -0,0 +1,100 @@
+"""
+Token-bucket rate limiting for login attempts.
+
+Every client key (an IP address or an email) gets a bucket of `capacity`
+tokens that refills continuously over `per_seconds`; each attempt takes
+one token. A burst of logins from one address, or against one account,
+is refused before it reaches bcrypt.
+
+Buckets live in process memory, so with several web processes each one
+enforces its own limit.
+
+LOGIN_THROTTLE = False turns the limits off, for load tests that log in
+many users from one address (python -m bench compare).
+"""
+
+import threading
+import time
+
+from flask import current_app
+
+
+class TokenBucket:
+    """
+    Per-key token buckets.
+
+    Args:
+        capacity (int): Attempts allowed in a burst
+        per_seconds (float): Seconds to refill a full bucket
+        max_keys (int): Buckets kept before full (idle) ones are dropped
+    """
+
+    def __init__(self, capacity, per_seconds, max_keys=10000):
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, last_refill)
+        self._lock = threading.Lock()
+
+    def consume(self, key):
+        """
+        Take one token for key. Returns 0 if allowed, else the seconds
+        until a token is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.rate
+
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return 0
+
+    def _prune(self, now):
+        """Drop buckets that have refilled completely (they hold no state)."""
+        full_after = self.capacity / self.rate
+        for key, (_, last) in list(self._buckets.items()):
+            if now - last >= full_after:
+                del self._buckets[key]
+
+
+class LoginThrottle:
+    """Separate buckets for client IPs and for target emails."""
+
+    def __init__(self, per_ip, per_email, enabled=True):
+        self.ip = TokenBucket(*per_ip)
+        self.email = TokenBucket(*per_email)
+        self.enabled = enabled
+
+    def check(self, ip, email):
+        """
+        Record a login attempt. Returns 0 if it may proceed, else the
+        seconds to wait (for a Retry-After header).
+        """
+        if not self.enabled:
+            return 0
+        wait = self.ip.consume(ip)
+        if wait:
+            return wait
+        return self.email.consume(email.strip().lower())
+
+
+def init_app(app):
+    """Create the login throttle from LOGIN_THROTTLE and LOGIN_RATE_* config."""
+    app.config.setdefault('LOGIN_THROTTLE', True)
+    app.config.setdefault('LOGIN_RATE_PER_IP', (20, 60))
+    app.config.setdefault('LOGIN_RATE_PER_EMAIL', (5, 300))
+    app.extensions['login_throttle'] = LoginThrottle(
+        app.config['LOGIN_RATE_PER_IP'],
+        app.config['LOGIN_RATE_PER_EMAIL'],
+        enabled=app.config['LOGIN_THROTTLE'],
+    )
+
+
+def get_login_throttle():
+    """Return the LoginThrottle for the current app."""
+    return current_app.extensions['login_throttle']
@@ -1,13 +1,14 @@
-from flask import Blueprint, request, jsonify, session
-import cs304dbi as dbi
+from flask import Blueprint, request, jsonify, session, current_app
+from conn_utils import get_conn
 from db import vote_db
+import metrics
 
 votes_bp = Blueprint('votes_bp', __name__, url_prefix='/votes')
 
 
 def getConn():
-    """Return a database connection."""
-    return dbi.connect()
+    """Return this request's pooled database connection."""
+    return get_conn()
 
 
 @votes_bp.route('/<item_type>/<int:item_id>', methods=['POST'])
@@ -36,45 +37,32 @@ def vote(item_type, item_id):
 
     conn = getConn()
 
-    # Ensure the target item exists
-    if not vote_db.item_exists(conn, item_type, item_id):
-        return jsonify({"error": "item not found"}), 404
+    # Buffered mode: record the vote now, apply counters on the next flush.
+    # Otherwise: vote row, counters and thresholds in one transaction.
+    buffer = current_app.extensions.get('vote_buffer')
+    if buffer is not None:
+        outcome = vote_db.cast_vote_buffered(conn, buffer, user_id, item_type, item_id, vote_type)
+    else:
+        outcome = vote_db.cast_vote(conn, user_id, item_type, item_id, vote_type)
+    metrics.VOTES.labels(item_type, vote_type, outcome["result"]).inc()
 
-    # Check for an existing vote by this user
-    previous = vote_db.get_previous_vote(conn, user_id, item_type, item_id)
+    if outcome["result"] == "missing":
+        return jsonify({"error": "item not found"}), 404
 
     # Same vote twice → no change
-    if previous and previous["vote"] == vote_type:
+    if outcome["result"] == "unchanged":
         return jsonify({"message": "already voted"}), 200
 
-    # Insert or update vote record
-    if previous:
-        vote_db.update_vote(conn, user_id, item_type, item_id, vote_type)
-    else:
-        vote_db.insert_vote(conn, user_id, item_type, item_id, vote_type)
-
-    # Update aggregate vote counts
-    vote_db.apply_vote_count_change(
-        conn,
-        item_type,
-        item_id,
-        previous_vote=(previous["vote"] if previous else None),
-        new_vote=vote_type
-    )
-
-    # Fetch updated counts
-    counts = vote_db.get_vote_counts(conn, item_type, item_id)
-    dnv = counts["downvotes"]
-
-    # Hard delete threshold
-    if dnv >= 50:
-        vote_db.delete_item_and_dependencies(conn, item_type, item_id)
-        conn.commit()
+    # Hard delete threshold reached
+    if outcome["result"] == "deleted":
         return jsonify({"message": "item deleted", "deleted": True}), 200
 
-    # Soft status update
-    status = "flagged" if dnv >= 20 else "active"
-    vote_db.update_item_status(conn, item_type, item_id, status)
+    # Buffered votes don't know the new counts until the next flush
+    if buffer is not None:
+        return jsonify({"message": "vote recorded", "buffered": True}), 200
 
-    conn.commit()
-    return jsonify({"message": "vote recorded", "status": status}), 200
+    return jsonify({
+        "message": "vote recorded",
+        "status": outcome["status"],
+        "downvotes": outcome["downvotes"]
+    }), 200
@@ -0,0 +1,275 @@
+"""
+Background job workers.
+
+Slow side effects (image processing, moderation cascades) are queued in
+the jobs table by the routes (db/job_db.py) and executed here, off the
+request path. Workers are threads that share the app's connection pool;
+they run standalone:
+
+    python worker.py [threads]   (threads is used when JOB_WORKERS is 0)
+
+or inside every process that imports app with JOB_WORKERS > 0
+(CAMPUS_CONNECT_JOB_WORKERS=N), which should only be set for the web
+server's processes: CLI commands and scripts import app too.
+
+A failing job is retried with exponential backoff until its
+max_attempts is used up. Handlers raise PermanentJobError for failures
+that retrying can't fix.
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+
+from flask import current_app
+
+import image_utils
+import metrics
+from db import archive_db, event_db, job_db, purge_db
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(conn, payload)
+TASKS = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when the job should fail without retrying."""
+
+
+def task(kind):
+    """Register a handler function for a job kind."""
+    def register(f):
+        TASKS[kind] = f
+        return f
+    return register
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt: 5s, 10s, 20s, ... up to 5 min."""
+    return min(5 * 2 ** (attempts - 1), 300)
+
+
+class Worker:
+    """
+    A small pool of threads that claim and run queued jobs.
+
+    Args:
+        app: Flask app (handlers run inside its app context)
+        threads (int): Number of worker threads
+        poll_interval (float): Seconds to sleep when the queue is empty
+        stale_after (float): Seconds before a 'running' job is presumed lost
+    """
+
+    def __init__(self, app, threads=2, poll_interval=1.0, stale_after=600):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads in the background."""
+        for n in range(self.threads):
+            t = threading.Thread(target=self._run, args=(n,), name=f"job-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        """Ask the threads to exit after their current job."""
+        self._stopped.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def run_once(self):
+        """
+        Claim and run one job. Returns True if a job was run,
+        False if the queue was empty.
+        """
+        with self.app.app_context():
+            pool = current_app.extensions['db_pool']
+            conn = pool.acquire()
+            try:
+                job = job_db.claim_next(conn)
+                if job is None:
+                    return False
+                self._execute(conn, job)
+                return True
+            finally:
+                pool.release(conn)
+
+    def _execute(self, conn, job):
+        handler = TASKS.get(job["kind"])
+        if handler is None:
+            job_db.mark_failed(conn, job["job_id"], f"unknown job kind {job['kind']!r}")
+            return
+
+        try:
+            handler(conn, job["payload"])
+        except PermanentJobError as err:
+            conn.rollback()
+            job_db.mark_failed(conn, job["job_id"], str(err))
+            logger.warning("job %s (%s) failed: %s", job["job_id"], job["kind"], err)
+        except Exception as err:
+            conn.rollback()
+            job_db.mark_failed(conn, job["job_id"], repr(err), retry_in=retry_delay(job["attempts"]))
+            logger.exception("job %s (%s) attempt %s failed",
+                             job["job_id"], job["kind"], job["attempts"])
+        else:
+            job_db.mark_done(conn, job["job_id"])
+
+    def _requeue_stale(self):
+        with self.app.app_context():
+            pool = current_app.extensions['db_pool']
+            conn = pool.acquire()
+            try:
+                job_db.requeue_stale(conn, self.stale_after)
+            finally:
+                pool.release(conn)
+
+    def _run(self, n):
+        last_sweep = 0.0
+        while not self._stopped.is_set():
+            try:
+                # One thread also sweeps for jobs orphaned by a crash
+                if n == 0 and time.monotonic() - last_sweep > 60:
+                    self._requeue_stale()
+                    last_sweep = time.monotonic()
+                if not self.run_once():
+                    self._stopped.wait(self.poll_interval)
+            except Exception:
+                logger.exception("job worker error")
+                self._stopped.wait(self.poll_interval)
+
+
+def init_app(app):
+    """Start in-process workers if JOB_WORKERS > 0 (default 0)."""
+    app.config.setdefault('JOB_WORKERS', 0)
+    app.config.setdefault('PURGE_BATCH_SIZE', purge_db.PURGE_BATCH_SIZE)
+    if app.config['JOB_WORKERS'] > 0:
+        worker = Worker(app, threads=app.config['JOB_WORKERS'])
+        worker.start()
+        app.extensions['job_worker'] = worker
+
+
+# ---------------------------------------------------------------------------
+# Task handlers
+# ---------------------------------------------------------------------------
+
+@task('process_event_image')
+def process_event_image(conn, payload):
+    """
+    Re-encode a staged event upload, write its variants and attach it to
+    the event. payload: event_id, staged_path, original_name.
+    """
+    staged_path = payload["staged_path"]
+    if not os.path.exists(staged_path):
+        raise PermanentJobError(f"staged upload {staged_path} is gone")
+
+    try:
+        with open(staged_path, 'rb') as f:
+            filename = image_utils.process_upload(
+                f,
+                current_app.config['UPLOADS'],
+                f"event_{int(payload['event_id'])}",
+                filename=payload["original_name"]
+            )
+    except image_utils.InvalidImage as err:
+        os.remove(staged_path)
+        raise PermanentJobError(str(err))
+
+    upload_dir = current_app.config['UPLOADS']
+    before = event_db.set_event_image(conn, payload["event_id"], filename)
+    os.remove(staged_path)
+    if before is None:
+        image_utils.remove_image(upload_dir, filename)
+        raise PermanentJobError(f"event {payload['event_id']} no longer exists")
+
+    # Content-addressed names change with every upload. Cached rows, cards
+    # and pages (here, in other processes and in proxies) still link the
+    # old files for a while, so they are deleted once those have expired.
+    previous = before["image_filename"]
+    if previous and previous != filename:
+        job_db.enqueue(conn, 'remove_event_image',
+                       {"event_id": payload["event_id"], "filename": previous},
+                       delay=image_removal_delay())
+
+
+def image_removal_delay():
+    """
+    Seconds until no cache can still hold HTML linking a replaced image:
+    a stale row can feed a card, a card a page, and a page a proxy.
+    """
+    config = current_app.config
+    return sum(config.get(key, 0) for key in (
+        'ENTITY_CACHE_TTL', 'FRAGMENT_CACHE_TTL', 'PAGE_CACHE_TTL', 'PAGE_CACHE_MAX_AGE'
+    ))
+
+
+@task('remove_event_image')
+def remove_event_image(conn, payload):
+    """
+    Delete an event's replaced image and its variants, queued by
+    process_event_image. payload: event_id, filename. Kept if the event
+    shows it again (re-uploading the same image gives the same name).
+    """
+    if event_db.event_image_in_use(conn, payload["event_id"], payload["filename"]):
+        return
+    image_utils.remove_image(current_app.config['UPLOADS'], payload["filename"])
+
+
+@task('delete_item')
+def delete_item(conn, payload):
+    """
+    Purge a removed item with its votes, comments and RSVPs, in batches
+    of PURGE_BATCH_SIZE rows. payload: item_type, item_id.
+    """
+    deleted = purge_db.purge_item(
+        conn, payload["item_type"], payload["item_id"],
+        batch_size=current_app.config['PURGE_BATCH_SIZE']
+    )
+    if deleted is None:
+        raise PermanentJobError(f"{payload['item_type']} {payload['item_id']} is not removed")
+    logger.info("purged %s %s: %s", payload["item_type"], payload["item_id"], deleted)
+
+
+@task('archive_events')
+def archive_events(conn, payload):
+    """
+    Move events older than ARCHIVE_AFTER_DAYS (or payload "days") and
+    their RSVPs, comments and votes into the archive tables, in batches of
+    ARCHIVE_BATCH_SIZE events. Returns rows moved per table.
+    """
+    days = payload.get("days", current_app.config['ARCHIVE_AFTER_DAYS'])
+    before = datetime.datetime.now() - datetime.timedelta(days=days)
+    moved = archive_db.archive_events(
+        conn, before, batch_size=current_app.config['ARCHIVE_BATCH_SIZE']
+    )
+    for table, rows in moved.items():
+        metrics.ARCHIVED_ROWS.labels(table).inc(rows)
+    logger.info("archived events dated before %s: %s", before, moved)
+    return moved
+
+
+if __name__ == '__main__':
+    import sys
+
+    from app import app
+
+    logging.basicConfig(level=logging.INFO)
+
+    # Importing app may already have started in-process workers
+    standalone = app.extensions.get('job_worker')
+    if standalone is None:
+        threads = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+        standalone = Worker(app, threads=threads)
+        standalone.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        standalone.stop()